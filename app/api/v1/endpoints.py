@@ -1,10 +1,114 @@
-from fastapi import APIRouter
-from app.models.rag import QueryRequest, QueryResponse
-from app.services.llm_generator import generate_answer
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.core.config import RETRIEVAL_TOP_K, CHAT_BATCH_MAX_QUESTIONS, CHAT_BATCH_LLM_CONCURRENCY
+from app.models.rag import QueryRequest, QueryResponse, BatchChatRequest, BatchChatItem, BatchChatResponse
+from app.services.retriever import corpus, retrieve_relevant_chunks_batch, UnknownDocumentError
+from app.services.retrieval_scheduler import retrieval_scheduler
+from app.services.embedding import get_query_embeddings_async
+from app.services.llm_generator import generate_answer_with_context
+from app.services.answer_cache import answer_cache
+from app.services.admission import AdmissionError, Deadline, client_id, llm_limiter, rate_limiter, retrieval_limiter
+
+logger = logging.getLogger(__name__)
 
 rag_router = APIRouter()
 
+
+def _check_ready(documents: Optional[List[str]]):
+    if not corpus.is_built:
+        raise HTTPException(status_code=503, detail="RAG system not initialized properly.")
+    try:
+        corpus.select(documents)
+    except UnknownDocumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @rag_router.post("/rag", response_model=QueryResponse)
-async def rag_handler(query: QueryRequest):
-    answer = await generate_answer(query.question)
+async def rag_handler(query: QueryRequest, http_request: Request):
+    _check_ready(query.documents)
+    rate_limiter.acquire(client_id(http_request))
+    deadline = Deadline.from_headers(http_request.headers)
+    async with retrieval_limiter.admit(deadline):
+        chunks = await retrieval_scheduler.retrieve(query.question, k=RETRIEVAL_TOP_K, doc_ids=query.documents)
+    deadline.check(llm_limiter.expected_seconds(), "llm")
+    async with llm_limiter.admit(deadline):
+        answer = await deadline.run(generate_answer_with_context(query.question, chunks), "llm")
     return QueryResponse(answer=answer)
+
+
+@rag_router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """
+    Answers many questions in one call (e.g. to pre-generate answer keys).
+
+    All questions are embedded in one batched call and retrieved with one
+    multi-query FAISS search per shard; answers are then generated
+    concurrently, at most CHAT_BATCH_LLM_CONCURRENCY at a time. Results come
+    back in request order, and a failed question carries an `error` instead
+    of failing the whole batch.
+
+    Admission control: the batch costs one rate-limit token per question
+    and its retrieval goes through the shared retrieval limiter; shedding
+    there fails the whole batch with 429/503/504 and Retry-After like /chat.
+    Each LLM call is then admitted on its own, so a question shed at the LLM
+    stage gets an `error` ("overloaded" or "deadline exceeded") while the
+    answers already produced are still returned.
+    """
+    if len(request.questions) > CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many questions ({len(request.questions)}); the limit is {CHAT_BATCH_MAX_QUESTIONS}.",
+        )
+    _check_ready(request.documents)
+
+    results = [BatchChatItem(question=question) for question in request.questions]
+    todo = [i for i, question in enumerate(request.questions) if question.strip()]
+    for i in set(range(len(results))) - set(todo):
+        results[i].error = "Empty question."
+    if not todo:
+        return BatchChatResponse(results=results)
+
+    questions = [request.questions[i] for i in todo]
+    rate_limiter.acquire(client_id(http_request), cost=len(questions))
+    deadline = Deadline.from_headers(http_request.headers)
+    loop = asyncio.get_running_loop()
+    async with retrieval_limiter.admit(deadline):
+        # Already a batch, so it bypasses the micro-batching scheduler
+        contexts = await loop.run_in_executor(None, retrieve_relevant_chunks_batch, questions, RETRIEVAL_TOP_K, request.documents)
+        query_embeddings = None
+        if answer_cache is not None:
+            # Served from the embedding cache filled by retrieval
+            query_embeddings = await get_query_embeddings_async(questions)
+
+    semaphore = asyncio.Semaphore(CHAT_BATCH_LLM_CONCURRENCY)
+
+    async def answer_one(position: int, i: int):
+        item, chunks = results[i], contexts[position]
+        if query_embeddings is not None:
+            cached_answer = answer_cache.lookup(query_embeddings[position], chunks)
+            if cached_answer is not None:
+                item.answer, item.cached = cached_answer, True
+                return
+        async with semaphore:
+            try:
+                deadline.check(llm_limiter.expected_seconds(), "llm")
+                async with llm_limiter.admit(deadline):
+                    answer = await deadline.run(generate_answer_with_context(item.question, chunks, fallback=False), "llm")
+            except AdmissionError as e:
+                item.error = e.reason
+                return
+            except Exception as e:
+                item.error = f"{type(e).__name__}: {e}"
+                return
+        item.answer = answer
+        if query_embeddings is not None:
+            answer_cache.store(item.question, query_embeddings[position], chunks, answer)
+
+    await asyncio.gather(*(answer_one(position, i) for position, i in enumerate(todo)))
+    failed = sum(1 for item in results if item.error)
+    logger.info("Batch of %d questions answered (%d failed).", len(results), failed)
+    return BatchChatResponse(results=results)
@@ -6,3 +6,116 @@ load_dotenv()
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 VECTOR_DB_PATH = "vectorstore/chroma_db"
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Bulk embedding (index builds)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_NUM_WORKERS = int(os.getenv("EMBEDDING_NUM_WORKERS", "1"))  # >1 spawns worker processes
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))  # 0 keeps torch's default
+EMBEDDING_STREAM_BATCH_SIZE = int(os.getenv("EMBEDDING_STREAM_BATCH_SIZE", "512"))  # chunks embedded at a time while the source is still being read
+
+# Micro-batching of concurrent /chat retrievals
+RETRIEVAL_BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "10"))  # only waited for when requests are queueing up
+RETRIEVAL_MAX_BATCH_SIZE = int(os.getenv("RETRIEVAL_MAX_BATCH_SIZE", "32"))
+
+# In-process caches for repeated questions (size 0 disables a cache)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))  # seconds
+RESULTS_CACHE_SIZE = int(os.getenv("RESULTS_CACHE_SIZE", "10000"))
+RESULTS_CACHE_TTL = float(os.getenv("RESULTS_CACHE_TTL", "600"))  # seconds
+
+# Semantic answer cache: reuse answers for near-duplicate questions over the same context
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "5000"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")  # .npz file; unset keeps the cache in memory only
+
+# FAISS index backend: "flat", "hnsw", "ivf_flat" or "ivf_pq"; metric: "l2", "ip" or "cosine"
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_METRIC = os.getenv("INDEX_METRIC", "l2")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "1024"))  # IVF cells (capped for small corpora)
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))  # IVF cells visited per query
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_EF_CONSTRUCTION = int(os.getenv("INDEX_EF_CONSTRUCTION", "200"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "48"))  # PQ sub-quantizers; must divide the dimension
+INDEX_PQ_NBITS = int(os.getenv("INDEX_PQ_NBITS", "8"))
+
+# LLM backend: "gemini", or "fake" to stream canned tokens locally (tests, benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "20"))
+
+# Shared LLM client: concurrency limit, retries with backoff, per-call timeout
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))  # seconds
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # seconds per attempt / per streamed piece
+LLM_COALESCE_REQUESTS = os.getenv("LLM_COALESCE_REQUESTS", "true").lower() == "true"  # identical concurrent prompts share one call
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8001")  # used by LLM_BACKEND=http
+
+# Retrieval depth and context packing before generation
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))  # estimated prompt tokens for context
+CONTEXT_MIN_OVERLAP = int(os.getenv("CONTEXT_MIN_OVERLAP", "20"))  # shortest chunk overlap merged, in chars
+CONTEXT_MAX_OVERLAP = int(os.getenv("CONTEXT_MAX_OVERLAP", "400"))  # at least the chunk_overlap used for indexing
+
+# Startup: run a dummy encode + search in the background before reporting ready
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+# Embedding inference backend: "torch", "onnx" or "onnx-int8" (dynamic int8 quantization)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/onnx")  # exported ONNX models are kept in one subdirectory per model
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "avx2")  # arm64, avx2, avx512 or avx512_vnni
+
+# Sharded multi-document corpus: one index shard per text file in CORPUS_DIR
+CORPUS_DIR = os.getenv("CORPUS_DIR")  # unset serves the single default text file
+CORPUS_INDEX_DIR = os.getenv("CORPUS_INDEX_DIR", "corpus_index")  # shard artifacts are <dir>/<document id>.*
+CORPUS_BUILD_WORKERS = int(os.getenv("CORPUS_BUILD_WORKERS", "2"))  # shards built in parallel
+CORPUS_SEARCH_WORKERS = int(os.getenv("CORPUS_SEARCH_WORKERS", "4"))  # shards searched in parallel
+
+# Logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# /chat/batch
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "1000"))
+CHAT_BATCH_LLM_CONCURRENCY = int(os.getenv("CHAT_BATCH_LLM_CONCURRENCY", "8"))  # LLM calls in flight per batch request
+
+# Embedding service: "inprocess" encodes in the API process, "pool" in separate worker processes
+EMBEDDING_SERVICE_MODE = os.getenv("EMBEDDING_SERVICE_MODE", "inprocess")
+EMBEDDING_POOL_WORKERS = int(os.getenv("EMBEDDING_POOL_WORKERS", "2"))  # processes, each holding the model once
+EMBEDDING_POOL_MAX_BATCH = int(os.getenv("EMBEDDING_POOL_MAX_BATCH", "64"))  # texts per encode call in a worker
+EMBEDDING_POOL_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_POOL_BATCH_WAIT_MS", "5"))  # how long a worker collects requests
+EMBEDDING_POOL_MAX_PENDING = int(os.getenv("EMBEDDING_POOL_MAX_PENDING", "256"))  # queued requests before submitters block
+EMBEDDING_POOL_THREADS = int(os.getenv("EMBEDDING_POOL_THREADS", "1"))  # torch threads per worker; 0 keeps torch's default
+EMBEDDING_POOL_START_TIMEOUT = float(os.getenv("EMBEDDING_POOL_START_TIMEOUT", "300"))  # seconds to wait for a loaded model
+EMBEDDING_POOL_REQUEST_TIMEOUT = float(os.getenv("EMBEDDING_POOL_REQUEST_TIMEOUT", "120"))  # seconds before a caller gives up on a request
+
+# Server-side chat sessions: bounded LRU/TTL store, windowed history, reuse of recent retrievals
+SESSION_STORE_SIZE = int(os.getenv("SESSION_STORE_SIZE", "10000"))  # sessions kept in memory
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))  # seconds since the last turn
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH")  # SQLite file; unset keeps sessions in memory only
+SESSION_HISTORY_TURNS = int(os.getenv("SESSION_HISTORY_TURNS", "6"))  # question/answer pairs kept per session
+SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "800"))  # estimated prompt tokens for history
+SESSION_REUSE_TURNS = int(os.getenv("SESSION_REUSE_TURNS", "2"))  # recent turns whose retrieval can be reused
+SESSION_REUSE_THRESHOLD = float(os.getenv("SESSION_REUSE_THRESHOLD", "0.8"))  # cosine similarity to an earlier question
+
+# Index chunking: "recursive" (langchain RecursiveCharacterTextSplitter) or "sentence" (Bangla sentence/page aware)
+CHUNKER = os.getenv("CHUNKER", "recursive")
+CHUNK_SIZE_UNIT = os.getenv("CHUNK_SIZE_UNIT", "chars")  # "chars" or "tokens" (estimated); sentence chunker only
+
+# Hot index reload: POST /admin/reload, or poll the corpus sources for changes every INDEX_WATCH_INTERVAL seconds
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "0"))  # 0 disables the watcher
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # required in X-Admin-Token by /admin endpoints when set
+
+# Admission control for the chat endpoints (0 disables a limit)
+ADMISSION_RETRIEVAL_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_RETRIEVAL_MAX_IN_FLIGHT", "64"))  # retrievals running at once
+ADMISSION_RETRIEVAL_MAX_QUEUE = int(os.getenv("ADMISSION_RETRIEVAL_MAX_QUEUE", "256"))  # retrievals waiting; more get 503
+ADMISSION_LLM_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_LLM_MAX_IN_FLIGHT", os.getenv("LLM_MAX_CONCURRENCY", "8")))
+ADMISSION_LLM_MAX_QUEUE = int(os.getenv("ADMISSION_LLM_MAX_QUEUE", "32"))
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))  # sustained requests per second per client
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))  # token buckets kept in memory
+# Only behind a reverse proxy that sets them: rate-limit clients by X-Client-Id / X-Forwarded-For instead of the peer address
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "0"))  # default per-request deadline in seconds; X-Request-Timeout overrides
@@ -1,94 +1,526 @@
 
 
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-import uvicorn
+from app.utils.timing import startup_timer
+
+with startup_timer.phase("import:fastapi"):
+    from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from pydantic import BaseModel, Field
+    import uvicorn
 import os
 import asyncio
-from typing import List, Dict, Any, Optional
+import json
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
 
 # Import your modules
-from app.services.retriever import initialize_retriever_from_text, retrieve_relevant_chunks, rag_vector_store
-from app.services.llm_generator import generate_answer_with_context
-from app.models.rag import ChatMessage, ChatResponse, ChatRequest
+with startup_timer.phase("import:app.services.retriever"):
+    from app.services.retriever import ensure_retriever_initialized, warmup, retrieve_relevant_chunks, corpus, results_cache, UnknownDocumentError
+    from app.services.embedding import (
+        embedding_cache, get_query_embeddings_async,
+        start_embedding_pool, stop_embedding_pool, embedding_pool_stats,
+    )
+    from app.services.retrieval_scheduler import retrieval_scheduler
+with startup_timer.phase("import:app.services.llm_generator"):
+    from app.services.llm_generator import generate_answer_with_context, stream_answer_with_context, FALLBACK_ANSWER, get_llm_client
+with startup_timer.phase("import:app.services.answer_cache"):
+    from app.services.answer_cache import answer_cache
+from app.services.session_store import ChatSession, session_store
+from app.services.admission import (
+    AdmissionError, Deadline, admission_stats, client_id, llm_limiter, rate_limiter, retrieval_limiter,
+)
+from app.api.v1.endpoints import rag_router
+from app.core.config import ANSWER_CACHE_PATH, RETRIEVAL_TOP_K, WARMUP_ON_STARTUP, CORPUS_DIR, LOG_LEVEL, EMBEDDING_SERVICE_MODE
+from app.core.config import INDEX_WATCH_INTERVAL, ADMIN_TOKEN
+from app.models.rag import ChatMessage, ChatResponse, ChatRequest, SessionResponse, SessionTurn
+from app.utils.metrics import (
+    CacheStatsCollector,
+    LLMStatsCollector,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_SECONDS,
+    RETRIEVED_CHUNKS,
+    render_metrics,
+    span,
+)
+from prometheus_client import REGISTRY
+
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 TEXT_PATH = "/Users/asif/vscode/Multilingual_AI_Assistant_RAG/app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt"
 RAG_INDEX_PATH = "rag_index"
+# With CORPUS_DIR set, every .txt file in it is served as its own document shard instead of TEXT_PATH
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Multilingual RAG Chatbot",
     description="A chatbot that answers questions in multiple languages based on a text knowledge base using RAG and LLM, with short-term memory."
 )
+app.include_router(rag_router)  # /rag and /chat/batch
+
+# Progress of the background initialization, reported by /health/ready
+startup_state: Dict[str, Any] = {"phase": "starting", "ready": False, "error": None}
+
+
+def _cache_stats() -> List[Dict[str, Any]]:
+    caches = [embedding_cache.stats(), results_cache.stats(), session_store.stats()]
+    return caches + ([answer_cache.stats()] if answer_cache is not None else [])
+
+
+# Cache and LLM client counters are read at scrape time by /metrics
+REGISTRY.register(CacheStatsCollector(_cache_stats))
+REGISTRY.register(LLMStatsCollector(lambda: get_llm_client().stats() if startup_state["ready"] else None))
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (not raw path) to keep label cardinality bounded
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, path).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(request.method, path, str(status)).inc()
+
+
+def _initialize_components():
+    """Blocking initialization run in a worker thread: index, models, optional warmup."""
+    if EMBEDDING_SERVICE_MODE == "pool":
+        startup_state["phase"] = "starting_embedding_pool"
+        with startup_timer.phase("startup:embedding_pool"):
+            start_embedding_pool()
+
+    startup_state["phase"] = "loading_index"
+    with startup_timer.phase("startup:index"):
+        if CORPUS_DIR:
+            corpus.add_directory(CORPUS_DIR)
+        else:
+            if not os.path.exists(TEXT_PATH):
+                raise FileNotFoundError(f"Text file not found at {TEXT_PATH}")
+            ensure_retriever_initialized(text_path=TEXT_PATH, index_path=RAG_INDEX_PATH)
+
+    startup_state["phase"] = "loading_llm_client"
+    with startup_timer.phase("startup:llm_client"):
+        get_llm_client()
+
+    if answer_cache is not None and ANSWER_CACHE_PATH:
+        startup_state["phase"] = "loading_answer_cache"
+        with startup_timer.phase("startup:answer_cache"):
+            answer_cache.load(ANSWER_CACHE_PATH)
+
+    if WARMUP_ON_STARTUP:
+        startup_state["phase"] = "warmup"
+        with startup_timer.phase("startup:warmup"):
+            warmup()
+
+
+async def _background_startup():
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _initialize_components)
+    except Exception as e:
+        startup_state.update(phase="failed", error=str(e))
+        logger.exception("Failed to initialize RAG components on startup: %s", e)
+        return
+    startup_state.update(phase="ready", ready=True)
+    logger.info("RAG initialized successfully from text.")
+    startup_timer.print_report()
+
 
 # --- Startup Event Handler ---
 @app.on_event("startup")
 async def startup_event():
     """
-    Initializes the RAG retriever when the FastAPI application starts up,
-    using extracted text instead of PDF.
+    Starts initializing the RAG retriever in the background, using extracted
+    text instead of PDF. The app answers liveness probes right away and
+    reports ready on /health/ready once the index and models are loaded.
     """
-    print("FastAPI application startup: Initializing RAG from extracted text...")
+    logger.info("FastAPI application startup: Initializing RAG from extracted text...")
+    retrieval_scheduler.start()
+    app.state.startup_task = asyncio.create_task(_background_startup())
+    app.state.watch_task = asyncio.create_task(_watch_corpus()) if INDEX_WATCH_INTERVAL > 0 else None
+
+
+async def _watch_corpus():
+    """Polls the corpus sources and hot-reloads changed documents while the old shards keep serving."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(INDEX_WATCH_INTERVAL)
+        if not startup_state["ready"]:
+            continue
+        try:
+            # wait=False: skip this round if an admin-triggered reload is running
+            await loop.run_in_executor(None, lambda: corpus.reload(wait=False))
+        except Exception as e:
+            logger.exception("Corpus watcher reload failed: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if app.state.watch_task is not None:
+        app.state.watch_task.cancel()
+    await retrieval_scheduler.stop()
+    stop_embedding_pool()
+    if answer_cache is not None and ANSWER_CACHE_PATH:
+        answer_cache.save(ANSWER_CACHE_PATH)
+
+def _check_documents(documents: Optional[List[str]]):
+    """404 if the request scopes retrieval to documents the corpus does not hold."""
     try:
-        if not os.path.exists(TEXT_PATH):
-            raise FileNotFoundError(f"Text file not found at {TEXT_PATH}")
+        corpus.select(documents)
+    except UnknownDocumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, exc: AdmissionError):
+    """Shed requests get a fast 429/503/504 with Retry-After instead of queueing."""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=exc.headers)
+
+
+def _admit(http_request: Request) -> Deadline:
+    """Applies the per-client rate limit and returns the request's deadline."""
+    rate_limiter.acquire(client_id(http_request))
+    return Deadline.from_headers(http_request.headers)
+
+
+def _server_timing(timings: Dict[str, float], start: float) -> str:
+    """Formats per-stage durations as a Server-Timing header value (milliseconds)."""
+    stages = {**timings, "total": time.perf_counter() - start}
+    return ", ".join(f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in stages.items())
+
+
+def _request_session(request: ChatRequest) -> Optional[ChatSession]:
+    """The session named by the request; only POST /sessions creates them, so unknown or expired ids are a 404."""
+    if not request.session_id:
+        return None
+    session = session_store.get(request.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session '{request.session_id}'.")
+    return session
+
+
+def _request_history(request: ChatRequest, session: Optional[ChatSession]) -> List[Dict[str, Any]]:
+    """The session's history when the request names a session, else the client-sent chat_history."""
+    if session is not None:
+        return session.messages()
+    return [{"role": msg.role, "parts": msg.parts} for msg in request.chat_history]
+
+
+async def _retrieve_context(
+    request: ChatRequest,
+    session: Optional[ChatSession],
+    timings: Optional[Dict[str, float]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[List[str], List[Dict[str, Any]], Any, bool]:
+    """
+    Retrieves the chunks for a chat question. A follow-up in a session that
+    is close enough to one of its recent questions reuses that turn's chunks
+    instead. Returns (chunks, their sources, the query embedding if already
+    computed, reused). Runs under the retrieval stage's admission limit.
+    """
+    async with retrieval_limiter.admit(deadline):
+        return await _retrieve_or_reuse(request, session, timings)
+
+
+async def _retrieve_or_reuse(
+    request: ChatRequest, session: Optional[ChatSession], timings: Optional[Dict[str, float]]
+) -> Tuple[List[str], List[Dict[str, Any]], Any, bool]:
+    query_embedding = None
+    if session is not None and session.turns:
+        with span("embed", timings):
+            query_embedding = (await get_query_embeddings_async([request.question]))[0]
+        reused = session_store.reusable_context(session, query_embedding, request.documents)
+        if reused is not None:
+            logger.debug("Session %s: reusing the context of an earlier turn", session.id)
+            return (*reused, query_embedding, True)
+    chunks = await retrieval_scheduler.retrieve(
+        request.question, k=RETRIEVAL_TOP_K, doc_ids=request.documents, timings=timings, with_sources=True
+    )
+    return [chunk.text for chunk in chunks], [chunk.source() for chunk in chunks], query_embedding, False
+
+
+async def _record_turn(
+    session: Optional[ChatSession], request: ChatRequest, answer: str, chunks: List[str], sources: List[Dict[str, Any]], query_embedding
+):
+    if session is None:
+        return
+    if query_embedding is None:
+        # Served from the embedding cache filled by retrieval
+        query_embedding = (await get_query_embeddings_async([request.question]))[0]
+    session_store.append_turn(session, request.question, answer, chunks, request.documents, query_embedding, sources)
 
-        initialize_retriever_from_text(text_path=TEXT_PATH, index_path=RAG_INDEX_PATH)
-        print("RAG initialized successfully from text.")
-    except Exception as e:
-        print(f"Failed to initialize RAG components on startup: {e}")
-        raise
 
 # --- API Endpoint ---
 @app.post("/chat", response_model=ChatResponse)
-async def chat_with_pdf(request: ChatRequest):
+async def chat_with_pdf(request: ChatRequest, response: Response, http_request: Request):
     """
     Receives a question, retrieves relevant context from the knowledge base,
     and generates an answer using the LLM, considering chat history.
+
+    With a `session_id` (from POST /sessions; unknown or expired ids get a
+    404) the history is kept server-side, windowed to the
+    most recent turns, and a follow-up close to a recent question reuses
+    that turn's retrieved context. Per-stage durations (queue, embed,
+    search, llm, total) are returned in the Server-Timing response header.
+
+    Over capacity, requests are shed early: 429 past the client's rate limit,
+    503 when a stage's queue is full, and 504 when the deadline (the
+    X-Request-Timeout header or REQUEST_DEADLINE) can no longer be met,
+    checked before the LLM call. All carry a Retry-After header.
     """
-    if rag_vector_store is None or not rag_vector_store.is_built:
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    if not corpus.is_built:
         msg = "RAG system not initialized properly."
-        print(msg)
+        logger.warning(msg)
         raise HTTPException(status_code=503, detail=msg)
+    _check_documents(request.documents)
+    session = _request_session(request)
+    deadline = _admit(http_request)
 
     try:
-        print(f"Received question: {request.question}")
+        logger.debug("Received question: %s", request.question)
 
-        relevant_chunks = retrieve_relevant_chunks(request.question, k=3)
-        print(f"Retrieved {len(relevant_chunks)} chunks")
+        history = _request_history(request, session)
+        relevant_chunks, sources, query_embedding, reused = await _retrieve_context(request, session, timings, deadline)
+        RETRIEVED_CHUNKS.observe(len(relevant_chunks))
+        logger.debug("Retrieved %d chunks", len(relevant_chunks))
 
+        # Answers to follow-ups depend on the conversation, so only standalone questions use the answer cache
+        use_answer_cache = answer_cache is not None and not history
+        if use_answer_cache:
+            if query_embedding is None:
+                # Hits the embedding cache populated by retrieval, so no extra forward pass
+                query_embedding = (await get_query_embeddings_async([request.question]))[0]
+            cached_answer = answer_cache.lookup(query_embedding, relevant_chunks)
+            if cached_answer is not None:
+                logger.debug("Answer served from semantic cache")
+                await _record_turn(session, request, cached_answer, relevant_chunks, sources, query_embedding)
+                response.headers["Server-Timing"] = _server_timing(timings, start)
+                return ChatResponse(
+                    answer=cached_answer, cached=True, session_id=session.id if session else None,
+                    reused_context=reused, sources=sources,
+                )
 
-        gemini_chat_history = []
-        if request.chat_history:
-            for msg in request.chat_history:
-                gemini_chat_history.append({"role": msg.role, "parts": msg.parts})
+        # Drop the request now rather than spend an LLM call on an answer nobody will wait for
+        deadline.check(llm_limiter.expected_seconds(), "llm")
+        async with llm_limiter.admit(deadline):
+            answer = await deadline.run(generate_answer_with_context(
+                question=request.question,
+                context_chunks=relevant_chunks,
+                chat_history=history,
+                timings=timings,
+            ), "llm")
+        logger.debug("Generated answer: %s", answer)
 
-        answer = await generate_answer_with_context(
-            question=request.question,
-            context_chunks=relevant_chunks,
-            chat_history=gemini_chat_history
-        )
-        print(f"Generated answer: {answer}")
+        if answer != FALLBACK_ANSWER:
+            if use_answer_cache:
+                answer_cache.store(request.question, query_embedding, relevant_chunks, answer)
+            await _record_turn(session, request, answer, relevant_chunks, sources, query_embedding)
 
-        return ChatResponse(answer=answer, retrieved_context=relevant_chunks)
+        response.headers["Server-Timing"] = _server_timing(timings, start)
+        return ChatResponse(answer=answer, session_id=session.id if session else None, reused_context=reused, sources=sources)
 
+    except AdmissionError:
+        raise
     except Exception as e:
-        print(f"Error during chat: {e}")
+        logger.exception("Error during chat: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming variant of /chat over Server-Sent Events.
+
+    Sends a `context` event with the retrieved chunks and their sources
+    (document and page range) first, then one `token` event per generated
+    piece of text, and finally `done` (or `error`). If the client
+    disconnects, the upstream generation is closed.
+
+    Admission works as in /chat; once the stream has started, shedding at the
+    LLM stage is reported as an `error` event with `status` and `retry_after`.
+    """
+    if not corpus.is_built:
+        msg = "RAG system not initialized properly."
+        logger.warning(msg)
+        raise HTTPException(status_code=503, detail=msg)
+    _check_documents(request.documents)
+    session = _request_session(request)
+    deadline = _admit(http_request)
+
+    logger.debug("Received streaming question: %s", request.question)
+    history = _request_history(request, session)
+    relevant_chunks, sources, query_embedding, reused = await _retrieve_context(request, session, deadline=deadline)
+    RETRIEVED_CHUNKS.observe(len(relevant_chunks))
+
+    async def event_stream():
+        yield _sse_event("context", {
+            "retrieved_context": relevant_chunks,
+            "sources": sources,
+            "session_id": session.id if session else None,
+            "reused_context": reused,
+        })
+
+        embedding = query_embedding
+        use_answer_cache = answer_cache is not None and not history
+        if use_answer_cache:
+            if embedding is None:
+                embedding = (await get_query_embeddings_async([request.question]))[0]
+            cached_answer = answer_cache.lookup(embedding, relevant_chunks)
+            if cached_answer is not None:
+                await _record_turn(session, request, cached_answer, relevant_chunks, sources, embedding)
+                yield _sse_event("token", {"text": cached_answer})
+                yield _sse_event("done", {"cached": True})
+                return
+
+        answer_parts = []
+        try:
+            deadline.check(llm_limiter.expected_seconds(), "llm")
+            async with llm_limiter.admit(deadline):
+                tokens = stream_answer_with_context(request.question, relevant_chunks, chat_history=history)
+                try:
+                    async for token in tokens:
+                        if await http_request.is_disconnected():
+                            logger.info("Client disconnected; cancelling generation.")
+                            return
+                        answer_parts.append(token)
+                        yield _sse_event("token", {"text": token})
+                finally:
+                    await tokens.aclose()
+        except AdmissionError as e:
+            yield _sse_event("error", {"detail": str(e), "status": e.status_code, "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            logger.exception("Error during streaming chat: %s", e)
+            yield _sse_event("error", {"detail": FALLBACK_ANSWER})
+            return
+
+        answer = "".join(answer_parts)
+        if answer:
+            if use_answer_cache:
+                answer_cache.store(request.question, embedding, relevant_chunks, answer)
+            await _record_turn(session, request, answer, relevant_chunks, sources, embedding)
+        yield _sse_event("done", {"cached": False})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, errors, cache and LLM counters, size histograms."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/documents")
+async def list_documents():
+    """Document ids that /chat requests can scope retrieval to, with their chunk counts."""
+    return {"documents": corpus.stats()}
+
+def _check_admin(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid or missing admin token.")
+
+@app.post("/admin/reload", status_code=202)
+async def reload_index(
+    documents: Optional[List[str]] = Query(None),
+    force: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Rebuilds the index of changed documents (only `documents` if given) in
+    the background. With `force` every selected document is rebuilt from
+    scratch, ignoring its saved index and cached embeddings, e.g. to recover
+    from a corrupt index. The current index keeps serving
+    until the new one is complete, then both are swapped atomically.
+    Poll GET /admin/reload for progress.
+    """
+    _check_admin(x_admin_token)
+    if not startup_state["ready"]:
+        raise HTTPException(status_code=503, detail="RAG system not initialized yet.")
+    try:
+        started = corpus.reload_in_background(doc_ids=documents, force=force)
+    except UnknownDocumentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not started:
+        raise HTTPException(status_code=409, detail="A reload is already running.")
+    return {"status": "started", "generation": corpus.generation}
+
+@app.get("/admin/reload")
+async def reload_status(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return {"reloading": corpus.reloading, "generation": corpus.generation, "last_reload": corpus.last_reload}
+
+@app.post("/sessions", response_model=SessionResponse)
+async def create_session():
+    """Starts a server-side chat session; pass its id as `session_id` to /chat."""
+    return SessionResponse(session_id=session_store.create().id)
+
+@app.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str):
+    """The turns a session still keeps (the most recent SESSION_HISTORY_TURNS)."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session '{session_id}'.")
+    turns = [SessionTurn(question=turn["question"], answer=turn["answer"]) for turn in session.turns]
+    return SessionResponse(session_id=session.id, turns=turns)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    session_store.delete(session_id)
+    return {"deleted": session_id}
+
 # --- Health Check Endpoint ---
 @app.get("/health")
 async def health_check():
-    if rag_vector_store is None:
-        return {"status": "error", "rag_initialized": False, "message": "rag_vector_store is None"}
-    return {"status": "ok", "rag_initialized": rag_vector_store.is_built}
+    return {
+        "status": "ok",
+        "rag_initialized": corpus.is_built,
+        "documents": len(corpus.shards),
+        "caches": _cache_stats(),
+        "llm": get_llm_client().stats() if startup_state["ready"] else None,
+        "embedding_pool": embedding_pool_stats(),
+        "admission": admission_stats(),
+    }
+
+@app.get("/health/live")
+async def liveness_probe():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_probe():
+    """Readiness: index built, models loaded and warmup done; 503 until then."""
+    body = {
+        "ready": startup_state["ready"] and corpus.is_built,
+        "phase": startup_state["phase"],
+        "error": startup_state["error"],
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/health/startup")
+async def startup_report():
+    """Import-time and startup-phase timings."""
+    return {**startup_timer.report(), "phase": startup_state["phase"]}
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    if not os.path.exists(TEXT_PATH):
-        print(f"Error: The text file '{TEXT_PATH}' was not found.")
+    if not CORPUS_DIR and not os.path.exists(TEXT_PATH):
+        logger.error("The text file '%s' was not found.", TEXT_PATH)
     else:
         uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
@@ -9,6 +9,45 @@ class ChatRequest(BaseModel):
     question: str
     context_chunks: Optional[List[str]] = None  # Optional; generated internally
     chat_history: List[ChatMessage] = []
+    documents: Optional[List[str]] = None  # Restrict retrieval to these document ids; all by default
+    session_id: Optional[str] = None  # Server-side history (see POST /sessions); replaces chat_history
+
+class ChunkSource(BaseModel):
+    document: str
+    page: Optional[int] = None  # First page of the chunk; None when the chunker does not track pages
+    page_end: Optional[int] = None
 
 class ChatResponse(BaseModel):
     answer: str
+    cached: bool = False  # True when served from the semantic answer cache
+    session_id: Optional[str] = None
+    reused_context: bool = False  # True when a follow-up reused an earlier turn's retrieval
+    sources: List[ChunkSource] = []  # Where each retrieved chunk came from, in context order
+
+class SessionTurn(BaseModel):
+    question: str
+    answer: str
+
+class SessionResponse(BaseModel):
+    session_id: str
+    turns: List[SessionTurn] = []
+
+class QueryRequest(BaseModel):
+    question: str
+    documents: Optional[List[str]] = None
+
+class QueryResponse(BaseModel):
+    answer: str
+
+class BatchChatRequest(BaseModel):
+    questions: List[str] = Field(..., example=["অনুপমের ভাষায় সুপুরুষ কাকে বলা হয়েছে?", "Who is Anupam?"])
+    documents: Optional[List[str]] = None  # Restrict retrieval to these document ids; all by default
+
+class BatchChatItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    error: Optional[str] = None  # Set instead of answer when this question failed
+    cached: bool = False
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]  # Same order as the request's questions
@@ -1,5 +1,13 @@
 # rag_evaluation.py
-from typing import List, Tuple
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
 def evaluate_groundedness(answer: str, retrieved_chunks: List[str], expected: str) -> bool:
@@ -33,3 +41,268 @@ def run_sample_tests(
         print(f"Generated Answer: {answer}")
         print(f"Expected: {expected}")
         print(f"✅ Grounded: {is_grounded}")
+
+
+# --- Batched evaluation engine ---
+
+# Bangla test cases from the README / app/rag_test.py
+SAMPLE_TEST_CASES = [
+    ("অনুপমের ভাষায় সুপুরুষ কাকে বলা হয়েছে?", "শুম্ভুনাথ"),
+    ("কাকে অনুপমের ভাগ্য দেবতা বলে উল্লেখ করা হয়েছে?", "মামাকে"),
+    ("বিয়ের সময় কল্যাণীর প্রকৃত বয়স কত ছিল?", "১৫ বছর"),
+]
+
+
+class GenerationCache:
+    """
+    Persistent prompt -> answer cache (JSON), keyed by the LLM backend, model
+    and prompt hash, so evaluation re-runs only call the LLM for prompts that
+    changed.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.answers: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.answers = json.load(f)
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        from app.core.config import LLM_BACKEND, LLM_MODEL
+
+        return hashlib.sha256(f"{LLM_BACKEND}\0{LLM_MODEL}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        return self.answers.get(self.key(prompt))
+
+    def set(self, prompt: str, answer: str):
+        self.answers[self.key(prompt)] = answer
+
+    def save(self):
+        if not self.path:
+            return
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.answers, f, ensure_ascii=False)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def hit_matrix(expected: Sequence[str], retrieved: List[List[str]], k: int) -> np.ndarray:
+    """(n_questions, k) bool matrix: whether the expected answer occurs in the chunk at each rank."""
+    hits = np.zeros((len(expected), k), dtype=bool)
+    for i, (answer, chunks) in enumerate(zip(expected, retrieved)):
+        for rank, chunk in enumerate(chunks[:k]):
+            hits[i, rank] = answer in chunk
+    return hits
+
+
+def retrieval_metrics(hits: np.ndarray, ks: Sequence[int]) -> Dict[str, float]:
+    """recall@k (share of questions with a relevant chunk in the top k) and MRR, from a hit matrix."""
+    metrics = {f"recall@{k}": float(hits[:, :k].any(axis=1).mean()) for k in ks if k <= hits.shape[1]}
+    first = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, np.inf)
+    metrics["mrr"] = float(np.mean(1.0 / first))
+    return metrics
+
+
+def batch_relevance(query_embeddings: np.ndarray, chunk_embeddings: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    Mean cosine similarity between each query and its retrieved chunks, using
+    the chunk embeddings already stored in the vector store (no re-encoding).
+    `positions` is (n_questions, k) with -1 for missing results.
+    """
+    queries = query_embeddings / np.maximum(np.linalg.norm(query_embeddings, axis=1, keepdims=True), 1e-12)
+    valid = positions >= 0
+    chunks = np.asarray(chunk_embeddings)[np.where(valid, positions, 0)]  # (n, k, d)
+    chunks = chunks / np.maximum(np.linalg.norm(chunks, axis=2, keepdims=True), 1e-12)
+    cosines = np.einsum("nd,nkd->nk", queries, chunks)
+    return np.where(valid, cosines, 0.0).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+
+
+async def generate_answers(
+    questions: List[str],
+    contexts: List[List[str]],
+    cache: GenerationCache,
+    concurrency: int = 8,
+) -> List[Optional[str]]:
+    """Generates answers concurrently (at most `concurrency` LLM calls at once), serving cached prompts first."""
+    from app.services.llm_generator import build_rag_prompt, get_llm_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(question: str, chunks: List[str]) -> Optional[str]:
+        prompt = build_rag_prompt(question, chunks)
+        cached = cache.get(prompt)
+        if cached is not None:
+            return cached
+        async with semaphore:
+            try:
+                text = await get_llm_client().generate(prompt)
+            except Exception as e:
+                print(f"❌ Generation failed for '{question}': {e}")
+                return None
+        cache.set(prompt, text)
+        return text
+
+    return list(await asyncio.gather(*(answer(q, c) for q, c in zip(questions, contexts))))
+
+
+async def evaluate_store(
+    store,
+    test_cases: List[Tuple[str, str]],
+    query_embeddings: np.ndarray,
+    ks: Sequence[int] = (1, 3, 5),
+    context_k: int = 3,
+    generation_cache: Optional[GenerationCache] = None,
+    concurrency: int = 8,
+) -> Dict:
+    """
+    Evaluates one built vector store on a labelled set in a single batch:
+    one multi-query search, vectorized recall@k / MRR / groundedness /
+    relevance, and (if `generation_cache` is given) concurrent generation
+    over the top `context_k` chunks with answer accuracy.
+    """
+    questions = [question for question, _ in test_cases]
+    expected = [answer for _, answer in test_cases]
+    max_k = max(max(ks), context_k)
+
+    start = time.perf_counter()
+    _, positions = store.search_positions(query_embeddings, max_k)
+    search_seconds = time.perf_counter() - start
+    retrieved = [[store.documents[p] for p in row if p >= 0] for row in positions]
+
+    hits = hit_matrix(expected, retrieved, max_k)
+    relevance = batch_relevance(query_embeddings, store.chunk_embeddings, positions[:, :context_k])
+    report = {
+        **retrieval_metrics(hits, ks),
+        # Same definition as evaluate_groundedness: the expected answer is in the context given to the LLM
+        "groundedness": float(hits[:, :context_k].any(axis=1).mean()),
+        "relevance": float(relevance.mean()),
+        "chunks": len(store.documents),
+        "search_seconds": round(search_seconds, 4),
+    }
+    rows = [
+        {"question": q, "expected": e, "grounded": bool(h[:context_k].any()), "relevance": round(float(r), 4)}
+        for q, e, h, r in zip(questions, expected, hits, relevance)
+    ]
+
+    if generation_cache is not None:
+        contexts = [chunks[:context_k] for chunks in retrieved]
+        answers = await generate_answers(questions, contexts, generation_cache, concurrency)
+        correct = np.array([a is not None and e in a for a, e in zip(answers, expected)])
+        report["answer_accuracy"] = float(correct.mean())
+        report["generation_errors"] = sum(a is None for a in answers)
+        for row, answer, ok in zip(rows, answers, correct):
+            row.update(answer=answer, correct=bool(ok))
+
+    return {"metrics": report, "questions": rows}
+
+
+async def compare_configurations(
+    test_cases: List[Tuple[str, str]],
+    text_path: str,
+    configs: List[Dict],
+    work_dir: str = "eval_indexes",
+    ks: Sequence[int] = (1, 3, 5),
+    context_k: int = 3,
+    generation_cache: Optional[GenerationCache] = None,
+    concurrency: int = 8,
+) -> List[Dict]:
+    """
+    Builds (or reloads) one index per configuration and evaluates them side
+    by side. A config is {"name", "chunk_size", "chunk_overlap", "index": {IndexConfig fields}}.
+    Indexes and chunk embeddings are kept in `work_dir`, so re-runs only
+    rebuild what changed; configs with the same chunking share embeddings,
+    and the questions are embedded once for all configs.
+
+    Runs in the caller's event loop: the shared LLM client's semaphore and
+    HTTP client are bound to the loop they were first used in, so all
+    configs must generate in the same one.
+    """
+    from app.scripts.vector_store import IndexConfig, InMemoryVectorStore
+    from app.services.embedding import get_query_embeddings
+    from app.services.retriever import build_store_from_text
+
+    os.makedirs(work_dir, exist_ok=True)
+    query_embeddings = np.asarray(get_query_embeddings([question for question, _ in test_cases]), dtype='float32')
+
+    results = []
+    for config in configs:
+        chunk_size = config.get("chunk_size", 1000)
+        chunk_overlap = config.get("chunk_overlap", 200)
+        store = InMemoryVectorStore(IndexConfig(**config.get("index", {})))
+        start = time.perf_counter()
+        build_store_from_text(
+            store,
+            text_path,
+            os.path.join(work_dir, config["name"]),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            chunk_cache_path=os.path.join(work_dir, f"chunks_{chunk_size}_{chunk_overlap}.npz"),
+        )
+        build_seconds = time.perf_counter() - start
+        evaluation = await evaluate_store(store, test_cases, query_embeddings, ks, context_k, generation_cache, concurrency)
+        evaluation["metrics"]["build_seconds"] = round(build_seconds, 3)
+        results.append({"name": config["name"], "config": config, **evaluation})
+    return results
+
+
+def print_comparison(results: List[Dict]):
+    columns = [key for key in results[0]["metrics"] if key not in ("chunks",)] if results else []
+    header = f"{'config':<20} {'chunks':>7} " + " ".join(f"{c:>14}" for c in columns)
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        metrics = result["metrics"]
+        values = " ".join(f"{metrics[c]:>14.4f}" if isinstance(metrics[c], float) else f"{metrics[c]:>14}" for c in columns)
+        print(f"{result['name']:<20} {metrics['chunks']:>7} {values}")
+
+
+DEFAULT_CONFIGS = [
+    {"name": "flat_1000_200", "chunk_size": 1000, "chunk_overlap": 200, "index": {"index_type": "flat"}},
+    {"name": "flat_500_100", "chunk_size": 500, "chunk_overlap": 100, "index": {"index_type": "flat"}},
+    {"name": "hnsw_1000_200", "chunk_size": 1000, "chunk_overlap": 200, "index": {"index_type": "hnsw"}},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched RAG evaluation and side-by-side config comparison.")
+    parser.add_argument("--text", default="app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt")
+    parser.add_argument("--test-cases", help="JSON list of [question, expected_answer] pairs. Defaults to the README samples.")
+    parser.add_argument("--configs", help="JSON list of configurations (see compare_configurations).")
+    parser.add_argument("--work-dir", default="eval_indexes")
+    parser.add_argument("--ks", default="1,3,5")
+    parser.add_argument("--context-k", type=int, default=3, help="Chunks given to the LLM (and used for groundedness/relevance).")
+    parser.add_argument("--generate", action="store_true", help="Also generate answers (cached) and score answer accuracy.")
+    parser.add_argument("--generation-cache", default="eval_generation_cache.json")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", help="Write the full results to this JSON file.")
+    args = parser.parse_args()
+
+    test_cases = SAMPLE_TEST_CASES
+    if args.test_cases:
+        with open(args.test_cases, "r", encoding="utf-8") as f:
+            test_cases = [tuple(case) for case in json.load(f)]
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+
+    generation_cache = GenerationCache(args.generation_cache) if args.generate else None
+    results = asyncio.run(compare_configurations(
+        test_cases, args.text, configs, args.work_dir,
+        ks=[int(k) for k in args.ks.split(",")], context_k=args.context_k,
+        generation_cache=generation_cache, concurrency=args.concurrency,
+    ))
+    if generation_cache is not None:
+        generation_cache.save()
+
+    print(f"\n{len(test_cases)} test cases")
+    print_comparison(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmarks the sentence/page-aware chunker against the RecursiveCharacterTextSplitter
+used by chunk_text, on our corpus.
+
+Reported per chunker:
+- median chunking time over --repeats runs
+- chunk count, mean/max chunk length (characters and estimated tokens)
+- embedded text: total characters over all chunks relative to the corpus
+  (everything above 1.0x is overlap we pay to embed and send to the LLM)
+- share of chunks that end at a sentence boundary (the rest stop mid-sentence)
+
+Usage:
+    python -m app.scripts.benchmark_chunkers --text app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt
+"""
+import argparse
+import json
+import statistics
+import time
+
+from app.services.context_packer import estimate_tokens
+from app.utils.data_preprocess import chunk_text, clean_text, is_sentence_final, sentence_chunk_text
+
+
+def _measure(name: str, chunker, text: str, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        timings.append(time.perf_counter() - start)
+
+    lengths = [len(chunk) for chunk in chunks]
+    tokens = [estimate_tokens(chunk) for chunk in chunks]
+    return {
+        "chunker": name,
+        "median_ms": round(statistics.median(timings) * 1000.0, 3),
+        "chunks": len(chunks),
+        "mean_chars": round(statistics.mean(lengths), 1) if chunks else 0,
+        "max_chars": max(lengths, default=0),
+        "mean_tokens": round(statistics.mean(tokens), 1) if chunks else 0,
+        "max_tokens": max(tokens, default=0),
+        "embedded_chars": sum(lengths),
+        "embedded_ratio": round(sum(lengths) / max(len(text), 1), 3),
+        "embedded_tokens": sum(tokens),
+        "sentence_final": round(sum(map(is_sentence_final, chunks)) / max(len(chunks), 1), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed and chunk statistics of the recursive vs. sentence chunkers.")
+    parser.add_argument("--text", default="app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Characters (token runs use --token-chunk-size).")
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--token-chunk-size", type=int, default=300)
+    parser.add_argument("--token-chunk-overlap", type=int, default=60)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    with open(args.text, "r", encoding="utf-8") as f:
+        text = clean_text(f.read())
+
+    size, overlap = args.chunk_size, args.chunk_overlap
+    token_size, token_overlap = args.token_chunk_size, args.token_chunk_overlap
+    chunkers = [
+        ("recursive", lambda t: chunk_text(t, chunk_size=size, chunk_overlap=overlap)),
+        ("sentence", lambda t: [c.text for c in sentence_chunk_text(t, size, overlap)]),
+        ("sentence-spanning", lambda t: [c.text for c in sentence_chunk_text(t, size, overlap, respect_pages=False)]),
+        ("sentence-tokens", lambda t: [
+            c.text for c in sentence_chunk_text(t, token_size, token_overlap, length_function=estimate_tokens)
+        ]),
+    ]
+    print(f"{len(text)} characters, chunk size {size}/{overlap} chars, {token_size}/{token_overlap} tokens, {args.repeats} repeats")
+
+    results = [_measure(name, chunker, text, args.repeats) for name, chunker in chunkers]
+
+    header = (
+        f"{'chunker':<18} {'ms':>8} {'chunks':>7} {'mean_ch':>8} {'max_ch':>7} {'mean_tok':>9} "
+        f"{'embedded':>9} {'ratio':>6} {'sent_end':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['chunker']:<18} {row['median_ms']:>8.2f} {row['chunks']:>7} {row['mean_chars']:>8} {row['max_chars']:>7} "
+            f"{row['mean_tokens']:>9} {row['embedded_chars']:>9} {row['embedded_ratio']:>6.2f} {row['sentence_final']:>9.1%}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"text": args.text, "characters": len(text), "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmarks the embedding backends (torch, onnx, onnx-int8) on our corpus and
+checks their parity with the torch reference.
+
+Each backend runs in its own process so load time and peak RSS are measured
+in isolation. Reported per backend:
+- model load time, single-query p50/p99 latency, batch throughput, peak RSS
+- cosine drift of chunk embeddings against torch (mean / min cosine)
+- retrieval overlap@k: share of the torch top-k chunks also returned by the backend
+
+Usage:
+    python -m app.scripts.benchmark_embedding_backends --text app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+# Bangla sample questions from the README, used as real queries next to chunk-derived ones
+SAMPLE_QUESTIONS = [
+    "অনুপমের ভাষায় সুপুরুষ কাকে বলা হয়েছে?",
+    "কাকে অনুপমের ভাগ্য দেবতা বলে উল্লেখ করা হয়েছে?",
+    "বিয়ের সময় কল্যাণীর প্রকৃত বয়স কত ছিল?",
+]
+
+
+def _run_backend(backend: str, chunks, queries, batch_size: int, out_dir: str) -> dict:
+    """Runs inside a fresh process: loads `backend`, times it and saves its embeddings."""
+    from app.services.embedding import load_embedding_model
+
+    start = time.perf_counter()
+    model = load_embedding_model(backend)
+    load_seconds = time.perf_counter() - start
+
+    model.encode(queries[:1]) # Warmup
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    chunk_embeddings = model.encode(chunks, batch_size=batch_size, convert_to_numpy=True)
+    encode_seconds = time.perf_counter() - start
+    query_embeddings = model.encode(queries, batch_size=batch_size, convert_to_numpy=True)
+
+    np.save(os.path.join(out_dir, f"{backend}.chunks.npy"), chunk_embeddings.astype('float32'))
+    np.save(os.path.join(out_dir, f"{backend}.queries.npy"), query_embeddings.astype('float32'))
+
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "query_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "query_p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "chunks_per_sec": round(len(chunks) / encode_seconds, 1) if encode_seconds > 0 else None,
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1), # KiB on Linux
+    }
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def _top_k(chunk_embeddings: np.ndarray, query_embeddings: np.ndarray, k: int) -> np.ndarray:
+    # Same ranking as the default IndexFlatL2
+    distances = (
+        (query_embeddings ** 2).sum(axis=1, keepdims=True)
+        - 2 * query_embeddings @ chunk_embeddings.T
+        + (chunk_embeddings ** 2).sum(axis=1)
+    )
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def parity(reference: str, backend: str, out_dir: str, k: int) -> dict:
+    ref_chunks = np.load(os.path.join(out_dir, f"{reference}.chunks.npy"))
+    ref_queries = np.load(os.path.join(out_dir, f"{reference}.queries.npy"))
+    chunks = np.load(os.path.join(out_dir, f"{backend}.chunks.npy"))
+    queries = np.load(os.path.join(out_dir, f"{backend}.queries.npy"))
+
+    cosines = (_normalize(ref_chunks) * _normalize(chunks)).sum(axis=1)
+    ref_top = _top_k(ref_chunks, ref_queries, k)
+    top = _top_k(chunks, queries, k)
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, top)])
+    return {
+        "cosine_mean": round(float(cosines.mean()), 6),
+        "cosine_min": round(float(cosines.min()), 6),
+        f"overlap@{k}": round(float(overlap), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput/RSS and parity benchmark for embedding backends.")
+    parser.add_argument("--text", default="app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--queries", type=int, default=100, help="Chunk-derived queries added to the sample questions.")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    from app.utils.data_preprocess import chunk_text, clean_text
+
+    with open(args.text, "r", encoding="utf-8") as f:
+        chunks = chunk_text(clean_text(f.read()), chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(chunks), size=min(args.queries, len(chunks)), replace=False)
+    # A sentence-sized slice of a chunk stands in for a question about it
+    queries = SAMPLE_QUESTIONS + [chunks[i][:120] for i in picks]
+    backends = args.backends.split(",")
+    print(f"{len(chunks)} chunks, {len(queries)} queries, backends: {', '.join(backends)}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        ctx = multiprocessing.get_context("spawn")
+        for backend in backends:
+            with ctx.Pool(1) as pool:
+                results.append(pool.apply(_run_backend, (backend, chunks, queries, args.batch_size, out_dir)))
+        reference = backends[0]
+        for row in results:
+            row.update(parity(reference, row["backend"], out_dir, args.k))
+
+    print(f"\nParity reference: {reference}")
+    header = f"{'backend':<10} {'load_s':>7} {'p50_ms':>8} {'p99_ms':>8} {'chunks/s':>9} {'rss_MiB':>8} {'cos_mean':>9} {'cos_min':>8} {'overlap@' + str(args.k):>10}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['backend']:<10} {row['load_seconds']:>7.2f} {row['query_p50_ms']:>8.2f} {row['query_p99_ms']:>8.2f} "
+            f"{row['chunks_per_sec']:>9} {row['peak_rss_mib']:>8} {row['cosine_mean']:>9.5f} {row['cosine_min']:>8.5f} "
+            f"{row[f'overlap@{args.k}']:>10.3f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"reference": reference, "chunks": len(chunks), "queries": len(queries), "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compares FAISS index backends against the exact flat baseline.
+
+For each backend it reports build time, recall@k against IndexFlat with the
+same metric, p50/p99 single-query search latency and the serialized index
+size as a memory footprint estimate.
+
+Usage:
+    python -m app.scripts.benchmark_index --embeddings rag_index.embeddings.npy
+    python -m app.scripts.benchmark_index --synthetic 100000 --dimension 384 --json results.json
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from app.scripts.vector_store import IndexConfig, InMemoryVectorStore
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.embeddings:
+        return np.ascontiguousarray(np.load(args.embeddings, mmap_mode='r'), dtype='float32')
+    rng = np.random.default_rng(args.seed)
+    return rng.standard_normal((args.synthetic, args.dimension), dtype='float32')
+
+
+def sample_queries(vectors: np.ndarray, n_queries: int, seed: int) -> np.ndarray:
+    """Perturbed copies of random corpus vectors, so queries resemble real traffic."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    noise = rng.standard_normal((len(picks), vectors.shape[1]), dtype='float32') * vectors.std() * 0.1
+    return np.ascontiguousarray(vectors[picks] + noise, dtype='float32')
+
+
+def benchmark_backend(config: IndexConfig, vectors: np.ndarray, queries: np.ndarray, k: int, baseline_ids: np.ndarray) -> Dict:
+    store = InMemoryVectorStore(config)
+    store.add_documents([""] * len(vectors), vectors)
+
+    start = time.perf_counter()
+    store.build_index()
+    build_seconds = time.perf_counter() - start
+
+    prepared = store.prepare_vectors(queries)
+    latencies = []
+    found_ids = np.empty((len(queries), k), dtype='int64')
+    for i in range(len(prepared)):
+        start = time.perf_counter()
+        _, ids = store.index.search(prepared[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        found_ids[i] = ids[0]
+
+    recall = np.mean([
+        len(set(found[found >= 0]) & set(expected)) / k
+        for found, expected in zip(found_ids, baseline_ids)
+    ])
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        **config.build_params(),
+        "nprobe": config.nprobe,
+        "ef_search": config.ef_search,
+        "build_seconds": round(build_seconds, 4),
+        f"recall@{k}": round(float(recall), 4),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+        "index_bytes": int(faiss.serialize_index(store.index).nbytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency/memory benchmark for FAISS index backends.")
+    parser.add_argument("--embeddings", help="Path to a saved .embeddings.npy matrix (default: synthetic data).")
+    parser.add_argument("--synthetic", type=int, default=20000, help="Number of synthetic vectors when --embeddings is not given.")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default="l2", choices=["l2", "ip", "cosine"])
+    parser.add_argument("--backends", default="flat,hnsw,ivf_flat,ivf_pq")
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", default="1,8,32", help="Comma-separated nprobe values for IVF backends.")
+    parser.add_argument("--ef-search", default="16,64,256", help="Comma-separated efSearch values for HNSW.")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    queries = sample_queries(vectors, args.queries, args.seed)
+    k = min(args.k, len(vectors))
+    print(f"Benchmarking {len(vectors)} vectors (dim {vectors.shape[1]}), {len(queries)} queries, k={k}, metric={args.metric}")
+
+    baseline = InMemoryVectorStore(IndexConfig(index_type="flat", metric=args.metric))
+    baseline.add_documents([""] * len(vectors), vectors)
+    baseline.build_index()
+    _, baseline_ids = baseline.index.search(baseline.prepare_vectors(queries), k)
+
+    results: List[Dict] = []
+    for backend in args.backends.split(","):
+        base = dict(index_type=backend, metric=args.metric, nlist=args.nlist, hnsw_m=args.hnsw_m, pq_m=args.pq_m, pq_nbits=args.pq_nbits)
+        if backend in ("ivf_flat", "ivf_pq"):
+            sweep = [IndexConfig(**base, nprobe=int(n)) for n in args.nprobe.split(",")]
+        elif backend == "hnsw":
+            sweep = [IndexConfig(**base, ef_search=int(ef)) for ef in args.ef_search.split(",")]
+        else:
+            sweep = [IndexConfig(**base)]
+        for config in sweep:
+            results.append(benchmark_backend(config, vectors, queries, k, baseline_ids))
+
+    header = f"{'backend':<10} {'nprobe':>6} {'efS':>5} {'build_s':>9} {'recall@' + str(k):>10} {'p50_ms':>8} {'p99_ms':>8} {'MiB':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['index_type']:<10} {row['nprobe']:>6} {row['ef_search']:>5} {row['build_seconds']:>9.3f} "
+            f"{row[f'recall@{k}']:>10.4f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['index_bytes'] / 2**20:>8.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "dimension": int(vectors.shape[1]), "k": k, "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
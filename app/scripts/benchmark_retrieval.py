@@ -0,0 +1,416 @@
+"""
+Retrieval microbenchmarks: how the embedding path and InMemoryVectorStore
+scale with corpus size, batch size and k.
+
+Stages (each measured in a fresh process, so RSS numbers are not polluted by
+earlier stages):
+- embedding: get_text_embeddings throughput per batch size, get_text_embedding
+  single-text p50/p99 latency and model load time
+- build: build_index time for synthetic corpora (default 1k to 1M vectors)
+- search: search_positions QPS and p50/p99 latency per call across k and
+  query batch sizes
+- save/load: save_index time and artifact size, load_index time in a new
+  process and the latency of the first (cold, page-faulting) search after it
+
+Every row carries the process RSS after the step and its peak RSS so far.
+
+Runs offline: "--model cached" loads the configured model from the local
+Hugging Face cache only, and "--model random" builds a randomly initialized
+model of the same shape as paraphrase-multilingual-MiniLM-L12-v2 (with a
+per-character tokenizer, so long chunks are truncated at 128 tokens as with the
+real one). Vectors are random, so recall is not measured here; see
+benchmark_index for recall of the approximate backends.
+
+The JSON report records the environment and settings next to the results,
+and --baseline compares a run against an earlier report.
+
+Usage:
+    python -m app.scripts.benchmark_retrieval --json retrieval.json
+    python -m app.scripts.benchmark_retrieval --sizes 1000,100000 --stages build,search --baseline retrieval.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Shape of paraphrase-multilingual-MiniLM-L12-v2, used for the random model
+RANDOM_MODEL_SHAPE = dict(
+    hidden_size=384, num_hidden_layers=12, num_attention_heads=12, intermediate_size=1536,
+    vocab_size=250037, max_position_embeddings=512,
+)
+RANDOM_MODEL_MAX_SEQ_LENGTH = 128
+
+STAGES = ("embedding", "build", "search", "save_load")
+
+# Timing metrics compared against --baseline; lower is better except for the throughputs
+TIMING_METRICS = ("load_seconds", "build_seconds", "save_seconds", "p50_ms", "p99_ms", "cold_search_ms")
+THROUGHPUT_METRICS = ("texts_per_sec", "qps")
+
+
+def _rss_mib() -> float:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return _peak_rss_mib()  # No /proc (macOS): the peak is the best we have
+
+
+def _peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024.0, 1)  # Bytes on macOS, KiB on Linux
+
+
+def _memory() -> Dict[str, float]:
+    return {"rss_mib": _rss_mib(), "peak_rss_mib": _peak_rss_mib()}
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+    }
+
+
+def _random_model(texts: List[str], seed: int):
+    """A randomly initialized SentenceTransformer with the production model's shape; needs no download."""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from tokenizers import Regex, Tokenizer, models as tokenizer_models, pre_tokenizers, processors
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+    torch.manual_seed(seed)
+    specials = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab = {token: i for i, token in enumerate(specials + sorted(set("".join(texts)) - set(" \n\t")))}
+    tokenizer = Tokenizer(tokenizer_models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Sequence([
+        pre_tokenizers.WhitespaceSplit(), pre_tokenizers.Split(Regex("."), behavior="isolated"),
+    ])
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+    )
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]",
+        sep_token="[SEP]", mask_token="[MASK]", model_max_length=RANDOM_MODEL_MAX_SEQ_LENGTH,
+    )
+    shape = {**RANDOM_MODEL_SHAPE, "vocab_size": max(RANDOM_MODEL_SHAPE["vocab_size"], len(vocab))}
+    with tempfile.TemporaryDirectory() as model_dir:
+        BertModel(BertConfig(**shape)).save_pretrained(model_dir)
+        fast_tokenizer.save_pretrained(model_dir)
+        transformer = models.Transformer(model_dir, max_seq_length=RANDOM_MODEL_MAX_SEQ_LENGTH)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), "mean")
+    return SentenceTransformer(modules=[transformer, pooling], device="cpu")
+
+
+def _run_embedding(model_kind: str, backend: str, texts: List[str], queries: List[str], batch_sizes: List[int], seed: int) -> List[Dict]:
+    """Runs inside a fresh process: loads the model and times the embedding functions with it."""
+    # Never reach out to the Hub; a missing cached model fails instead of downloading
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    from app.services import embedding
+
+    rss_before = _rss_mib()
+    start = time.perf_counter()
+    model = embedding.load_embedding_model(backend) if model_kind == "cached" else _random_model(texts + queries, seed)
+    load_seconds = time.perf_counter() - start
+    embedding.embedding_model = model  # Used by get_text_embeddings / get_text_embedding from here on
+    base = {"stage": "embedding", "model": model_kind, "backend": backend}
+    rows = [{**base, "step": "load", "load_seconds": round(load_seconds, 3), "model_mib": round(_rss_mib() - rss_before, 1), **_memory()}]
+
+    embedding.get_text_embeddings(texts[:8], batch_size=8, num_workers=1)  # Warmup
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        embedding.get_text_embeddings(texts, batch_size=batch_size, num_workers=1)
+        seconds = time.perf_counter() - start
+        rows.append({
+            **base, "step": "batch", "batch_size": batch_size, "texts": len(texts),
+            "texts_per_sec": round(len(texts) / seconds, 1), **_memory(),
+        })
+
+    latencies = []
+    for query in queries:  # Distinct texts, so every call misses the embedding cache
+        start = time.perf_counter()
+        embedding.get_text_embedding(query)
+        latencies.append(time.perf_counter() - start)
+    rows.append({**base, "step": "single", "texts": len(queries), **_percentiles(latencies), **_memory()})
+    return rows
+
+
+def _synthetic_store(size: int, dimension: int, doc_chars: int, seed: int, index_type: str, metric: str):
+    """An unbuilt store with `size` random vectors and filler documents of about `doc_chars` characters."""
+    from app.scripts.vector_store import IndexConfig, InMemoryVectorStore
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dimension), dtype='float32')
+    filler = "x" * max(0, doc_chars - 16)
+    store = InMemoryVectorStore(IndexConfig(index_type=index_type, metric=metric))
+    store.add_documents([f"chunk {i:>9} {filler}" for i in range(size)], vectors)
+    return store
+
+
+def _run_index(
+    size: int, dimension: int, doc_chars: int, seed: int, index_type: str, metric: str,
+    ks: List[int], query_batches: List[int], n_queries: int, stages: List[str], out_prefix: str,
+) -> List[Dict]:
+    """Runs inside a fresh process: builds, searches and saves one synthetic corpus."""
+    from app.scripts.benchmark_index import sample_queries
+
+    base = {"vectors": size, "dimension": dimension, "index_type": index_type, "metric": metric}
+    rss_before = _rss_mib()
+    store = _synthetic_store(size, dimension, doc_chars, seed, index_type, metric)
+    rss_data = _rss_mib()
+    start = time.perf_counter()
+    store.build_index()
+    build_seconds = time.perf_counter() - start
+    rows = []
+    if "build" in stages:
+        rows.append({
+            **base, "stage": "build", "build_seconds": round(build_seconds, 4),
+            "data_mib": round(rss_data - rss_before, 1), "index_mib": round(_rss_mib() - rss_data, 1), **_memory(),
+        })
+
+    if "search" in stages:
+        queries = sample_queries(store.chunk_embeddings, n_queries, seed)
+        store.search_positions(queries[:1], k=max(ks))  # Warmup
+        for k in ks:
+            for batch in query_batches:
+                latencies = []
+                for start_row in range(0, len(queries) - batch + 1, batch):
+                    start = time.perf_counter()
+                    store.search_positions(queries[start_row:start_row + batch], k=k)
+                    latencies.append(time.perf_counter() - start)
+                searched = len(latencies) * batch
+                rows.append({
+                    **base, "stage": "search", "k": k, "query_batch": batch, "queries": searched,
+                    "qps": round(searched / max(sum(latencies), 1e-9), 1), **_percentiles(latencies), **_memory(),
+                })
+
+    if "save_load" in stages:
+        start = time.perf_counter()
+        store.save_index(out_prefix)
+        save_seconds = time.perf_counter() - start
+        files = {name: os.path.getsize(path) for name, path in store.artifact_paths(out_prefix).items()}
+        rows.append({
+            **base, "stage": "save", "save_seconds": round(save_seconds, 4),
+            "artifact_mib": round(sum(files.values()) / 2**20, 2),
+            "index_file_mib": round(files["index"] / 2**20, 2),
+            "embeddings_file_mib": round(files["embeddings"] / 2**20, 2), **_memory(),
+        })
+    return rows
+
+
+def _run_load(size: int, dimension: int, index_type: str, metric: str, k: int, seed: int, out_prefix: str) -> Dict:
+    """Runs inside a fresh process: loads a saved artifact and times the first searches against it."""
+    from app.scripts.vector_store import IndexConfig, InMemoryVectorStore
+
+    rss_before = _rss_mib()
+    store = InMemoryVectorStore(IndexConfig(index_type=index_type, metric=metric))
+    start = time.perf_counter()
+    store.load_index(out_prefix)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_mib()
+
+    rng = np.random.default_rng(seed + 1)
+    queries = rng.standard_normal((2, dimension), dtype='float32')
+    start = time.perf_counter()
+    store.search_positions(queries[:1], k=k)
+    cold_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    store.search_positions(queries[1:], k=k)
+    warm_seconds = time.perf_counter() - start
+    return {
+        "vectors": size, "dimension": dimension, "index_type": index_type, "metric": metric, "stage": "load",
+        "memory_mapped": store.index_is_mapped, "load_seconds": round(load_seconds, 4),
+        "cold_search_ms": round(cold_seconds * 1000.0, 4), "warm_search_ms": round(warm_seconds * 1000.0, 4),
+        "loaded_mib": round(rss_loaded - rss_before, 1), **_memory(),
+    }
+
+
+def _benchmark_texts(path: Optional[str], n_texts: int, n_queries: int, seed: int):
+    """Corpus chunks (and question-sized slices of them as queries) from `path`, or synthetic text."""
+    rng = np.random.default_rng(seed)
+    if path and os.path.exists(path):
+        from app.utils.data_preprocess import chunk_text, clean_text
+
+        with open(path, "r", encoding="utf-8") as f:
+            chunks = chunk_text(clean_text(f.read()))
+    else:
+        # Words from the Bengali block, chunk-sized like the default 1000-character chunks
+        letters = [chr(c) for c in range(0x0995, 0x09B9)]
+        words = ["".join(rng.choice(letters, size=rng.integers(2, 8))) for _ in range(2000)]
+        chunks = [" ".join(rng.choice(words, size=200)) for _ in range(256)]
+    texts = [chunks[i % len(chunks)] for i in range(n_texts)]
+    queries = [f"{chunks[i % len(chunks)][:120]} {i}" for i in range(n_queries)]
+    return texts, queries
+
+
+def _environment() -> Dict:
+    import faiss
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": faiss.__version__,
+    }
+
+
+def _row_key(row: Dict) -> tuple:
+    """Identity of a result row, used to match rows across reports."""
+    fields = ("stage", "step", "model", "backend", "batch_size", "vectors", "dimension", "index_type", "metric", "k", "query_batch")
+    return tuple(row.get(field) for field in fields)
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float = 0.1) -> List[Dict]:
+    """
+    Relative change of the timing/throughput metrics of each row present in
+    both reports; changes within `tolerance` count as noise ("same").
+    """
+    previous = {_row_key(row): row for row in baseline}
+    changes = []
+    for row in results:
+        old = previous.get(_row_key(row))
+        if old is None:
+            continue
+        for metric in TIMING_METRICS + THROUGHPUT_METRICS:
+            if row.get(metric) is None or not old.get(metric):
+                continue
+            change = row[metric] / old[metric] - 1.0
+            improvement = change if metric in THROUGHPUT_METRICS else -change
+            status = "same" if abs(change) <= tolerance else ("better" if improvement > 0 else "worse")
+            changes.append({"key": _row_key(row), "metric": metric, "baseline": old[metric], "value": row[metric],
+                            "change": round(change, 4), "status": status})
+    return changes
+
+
+def _print_rows(title: str, rows: List[Dict], columns: List[str]):
+    if not rows:
+        return
+    print(f"\n{title}")
+    widths = [max(len(column), *(len(str(row.get(column, ""))) for row in rows)) for column in columns]
+    header = " ".join(f"{column:>{width}}" for column, width in zip(columns, widths))
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(" ".join(f"{str(row.get(column, '')):>{width}}" for column, width in zip(columns, widths)))
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding and vector store microbenchmarks on synthetic corpora.")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of: {', '.join(STAGES)}.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Synthetic corpus sizes (vectors).")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--doc-chars", type=int, default=256, help="Length of the filler document stored per vector.")
+    parser.add_argument("--index-type", default="flat", choices=["flat", "hnsw", "ivf_flat", "ivf_pq"])
+    parser.add_argument("--metric", default="l2", choices=["l2", "ip", "cosine"])
+    parser.add_argument("--k", default="1,5,10,50")
+    parser.add_argument("--query-batches", default="1,8,64")
+    parser.add_argument("--queries", type=int, default=512, help="Queries searched per (k, batch) combination.")
+    parser.add_argument("--model", default="random", choices=["random", "cached"],
+                        help="Randomly initialized model, or the configured model from the local cache.")
+    parser.add_argument("--backend", default="torch", help="Embedding backend for --model cached.")
+    parser.add_argument("--text", default="app/data/extracted_text_from_HSC26_Bangla1st-Paper.txt",
+                        help="Texts to embed (synthetic Bengali text if the file is missing).")
+    parser.add_argument("--texts", type=int, default=512, help="Texts embedded per batch size.")
+    parser.add_argument("--embedding-batches", default="1,8,32,64,128")
+    parser.add_argument("--single-queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this JSON file.")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare this run against.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change treated as noise in the comparison.")
+    args = parser.parse_args()
+
+    stages = args.stages.split(",")
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    ks = _ints(args.k)
+    query_batches = _ints(args.query_batches)
+    results: List[Dict] = []
+    ctx = multiprocessing.get_context("spawn")
+
+    if "embedding" in stages:
+        texts, queries = _benchmark_texts(args.text, args.texts, args.single_queries, args.seed)
+        print(f"Embedding: {len(texts)} texts, {len(queries)} single queries, {args.model} model")
+        try:
+            with ctx.Pool(1) as pool:
+                results.extend(pool.apply(
+                    _run_embedding, (args.model, args.backend, texts, queries, _ints(args.embedding_batches), args.seed)
+                ))
+        except Exception as e:
+            print(f"Embedding benchmark failed: {type(e).__name__}: {e}")
+            results.append({"stage": "embedding", "model": args.model, "backend": args.backend, "error": f"{type(e).__name__}: {e}"})
+
+    index_stages = [stage for stage in stages if stage != "embedding"]
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in _ints(args.sizes) if index_stages else []:
+            print(f"Index: {size} vectors (dim {args.dimension}, {args.index_type}/{args.metric})")
+            out_prefix = os.path.join(out_dir, f"bench_{size}")
+            try:
+                with ctx.Pool(1) as pool:
+                    results.extend(pool.apply(_run_index, (
+                        size, args.dimension, args.doc_chars, args.seed, args.index_type, args.metric,
+                        ks, query_batches, args.queries, index_stages, out_prefix,
+                    )))
+                if "save_load" in index_stages:
+                    with ctx.Pool(1) as pool:
+                        results.append(pool.apply(
+                            _run_load, (size, args.dimension, args.index_type, args.metric, max(ks), args.seed, out_prefix)
+                        ))
+            except Exception as e:
+                print(f"Index benchmark for {size} vectors failed: {type(e).__name__}: {e}")
+                results.append({"stage": "index", "vectors": size, "error": f"{type(e).__name__}: {e}"})
+            finally:
+                for path in os.listdir(out_dir):
+                    os.remove(os.path.join(out_dir, path))
+
+    by_stage = lambda *names: [row for row in results if row["stage"] in names and "error" not in row]
+    _print_rows("Embedding", by_stage("embedding"), ["step", "batch_size", "texts", "texts_per_sec", "load_seconds", "p50_ms", "p99_ms", "rss_mib", "peak_rss_mib"])
+    _print_rows("Build", by_stage("build"), ["vectors", "build_seconds", "data_mib", "index_mib", "rss_mib", "peak_rss_mib"])
+    _print_rows("Search", by_stage("search"), ["vectors", "k", "query_batch", "qps", "p50_ms", "p99_ms", "rss_mib"])
+    _print_rows("Save", by_stage("save"), ["vectors", "save_seconds", "artifact_mib", "index_file_mib", "embeddings_file_mib", "peak_rss_mib"])
+    _print_rows("Load", by_stage("load"), ["vectors", "load_seconds", "memory_mapped", "cold_search_ms", "warm_search_ms", "loaded_mib", "rss_mib"])
+
+    report = {"environment": _environment(), "settings": vars(args), "results": results}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        changes = compare(results, baseline["results"], args.tolerance)
+        report["baseline"] = {"path": args.baseline, "environment": baseline.get("environment"), "changes": changes}
+        print(f"\nCompared with {args.baseline} ({baseline.get('environment', {}).get('git_commit')}):")
+        for change in changes:
+            print(f"  {'/'.join(str(v) for v in change['key'] if v is not None)} {change['metric']}: "
+                  f"{change['baseline']} -> {change['value']} ({change['change']:+.1%}, {change['status']})")
+        regressions = sum(change["status"] == "worse" for change in changes)
+        print(f"{regressions} of {len(changes)} metrics worse by more than {args.tolerance:.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
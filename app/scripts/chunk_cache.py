@@ -0,0 +1,57 @@
+import logging
+import numpy as np
+import os
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkEmbeddingCache:
+    """
+    Persistent chunk-hash -> embedding map used for incremental re-indexing.
+
+    Stored as a single .npz file holding the model name, the chunk hashes and
+    their embedding matrix. A cache written for another model is ignored.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        self.embeddings: Dict[str, np.ndarray] = {}
+
+    def load(self) -> "ChunkEmbeddingCache":
+        if not os.path.exists(self.path):
+            return self
+        with np.load(self.path, allow_pickle=False) as data:
+            if str(data["model_name"]) != self.model_name:
+                logger.warning("Ignoring chunk embedding cache at %s: built with model %s.", self.path, data["model_name"])
+                return self
+            self.embeddings = dict(zip(data["hashes"].tolist(), data["embeddings"]))
+        logger.info("Loaded %d cached chunk embeddings from %s", len(self.embeddings), self.path)
+        return self
+
+    def save(self):
+        hashes = list(self.embeddings)
+        matrix = np.vstack([self.embeddings[h] for h in hashes]) if hashes else np.empty((0, 0), dtype='float32')
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, model_name=np.array(self.model_name), hashes=np.array(hashes), embeddings=matrix.astype('float32'))
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, chunk_hash: str) -> bool:
+        return chunk_hash in self.embeddings
+
+    def get(self, chunk_hash: str) -> Optional[np.ndarray]:
+        return self.embeddings.get(chunk_hash)
+
+    def add_many(self, hashes: Iterable[str], embeddings: Iterable[np.ndarray]):
+        for chunk_hash, embedding in zip(hashes, embeddings):
+            self.embeddings[chunk_hash] = np.asarray(embedding, dtype='float32')
+
+    def matrix(self, hashes: List[str]) -> np.ndarray:
+        """Embeddings for `hashes`, in order, as one float32 matrix."""
+        return np.ascontiguousarray(np.vstack([self.embeddings[h] for h in hashes]), dtype='float32')
+
+    def retain(self, hashes: Iterable[str]):
+        """Drops every entry not in `hashes`, keeping the cache bounded to the current corpus."""
+        keep = set(hashes)
+        self.embeddings = {h: e for h, e in self.embeddings.items() if h in keep}
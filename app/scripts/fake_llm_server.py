@@ -0,0 +1,90 @@
+"""
+Local LLM stand-in server for tests and load benchmarks.
+
+Serves the protocol used by HTTPBackend (LLM_BACKEND=http):
+    POST /generate -> {"text": ...}
+    POST /stream   -> NDJSON lines {"text": ...}
+
+Latency, token rate and error injection are configurable through the
+environment or the command line.
+
+Usage:
+    python -m app.scripts.fake_llm_server --port 8001 --latency-ms 300 --tokens-per-sec 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import uvicorn
+
+from app.services.fake_llm import FAKE_ANSWER_TOKENS
+
+FIRST_TOKEN_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))  # fraction of requests answered with 503
+
+app = FastAPI(title="Fake LLM server")
+app.state.stats = {"requests": 0, "errors": 0}
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+
+
+def _maybe_fail():
+    app.state.stats["requests"] += 1
+    if ERROR_RATE > 0 and random.random() < ERROR_RATE:
+        app.state.stats["errors"] += 1
+        raise HTTPException(status_code=503, detail="Injected upstream error")
+
+
+async def _tokens():
+    await asyncio.sleep(FIRST_TOKEN_LATENCY_MS / 1000.0)
+    for i, token in enumerate(FAKE_ANSWER_TOKENS):
+        if i and TOKENS_PER_SEC > 0:
+            await asyncio.sleep(1.0 / TOKENS_PER_SEC)
+        yield token
+
+
+@app.post("/generate")
+async def generate(request: GenerateRequest):
+    _maybe_fail()
+    return {"text": "".join([token async for token in _tokens()])}
+
+
+@app.post("/stream")
+async def stream(request: GenerateRequest):
+    _maybe_fail()
+
+    async def lines():
+        async for token in _tokens():
+            yield json.dumps({"text": token}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/stats")
+async def stats():
+    return app.state.stats
+
+
+def main():
+    global FIRST_TOKEN_LATENCY_MS, TOKENS_PER_SEC, ERROR_RATE
+    parser = argparse.ArgumentParser(description="Local fake LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=FIRST_TOKEN_LATENCY_MS, help="Delay before the first token.")
+    parser.add_argument("--tokens-per-sec", type=float, default=TOKENS_PER_SEC)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    args = parser.parse_args()
+    FIRST_TOKEN_LATENCY_MS, TOKENS_PER_SEC, ERROR_RATE = args.latency_ms, args.tokens_per_sec, args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
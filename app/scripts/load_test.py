@@ -0,0 +1,343 @@
+"""
+End-to-end load test of the /chat endpoint.
+
+Starts the fake LLM server and the FastAPI app (LLM_BACKEND=http, pointed at
+the fake server) as subprocesses, or targets an already running app with
+--url. It then replays a question corpus at a fixed concurrency (closed
+loop) or at a fixed arrival rate (open loop, Poisson arrivals).
+
+Reported:
+- p50/p95/p99 latency per stage (queue, embed, search, llm, total), taken
+  from the Server-Timing header of /chat, plus the client-side latency
+- throughput (successful requests per second)
+- error rates by kind (HTTP status, transport error, LLM fallback answer)
+
+Results are written as JSON together with the git commit and the run
+settings, so runs can be compared across commits and configurations.
+
+The app started by the harness runs with the answer cache, the query
+embedding and retrieval results caches and LLM request coalescing turned
+off, so a small question set still exercises every stage on every request
+(see --answer-cache and --caches). Against --url they are whatever that
+app is configured with.
+
+Usage:
+    python -m app.scripts.load_test --concurrency 16 --requests 500 --json load.json
+    python -m app.scripts.load_test --rate 20 --duration 60 --llm-latency-ms 800 --llm-tokens-per-sec 40
+    python -m app.scripts.load_test --url http://127.0.0.1:8000 --concurrency 8 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from app.services.llm_generator import FALLBACK_ANSWER
+
+# Bangla test cases from the README / app/rag_test.py
+SAMPLE_QUESTIONS = [
+    "অনুপমের ভাষায় সুপুরুষ কাকে বলা হয়েছে?",
+    "কাকে অনুপমের ভাগ্য দেবতা বলে উল্লেখ করা হয়েছে?",
+    "বিয়ের সময় কল্যাণীর প্রকৃত বয়স কত ছিল?",
+]
+
+STAGES = ["queue", "embed", "search", "llm", "total"]
+
+
+def load_questions(path: Optional[str]) -> List[str]:
+    """Questions from a JSON list (strings or [question, expected] pairs) or a text file with one per line."""
+    if not path:
+        return list(SAMPLE_QUESTIONS)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            items = json.load(f)
+            return [item[0] if isinstance(item, (list, tuple)) else item for item in items]
+        return [line.strip() for line in f if line.strip()]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """'embed;dur=1.5, llm;dur=20' -> {'embed': 1.5, 'llm': 20.0} (milliseconds)."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and value:
+                timings[name] = float(value)
+    return timings
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "count": 0}
+    array = np.array(values)
+    return {
+        "p50": round(float(np.percentile(array, 50)), 2),
+        "p95": round(float(np.percentile(array, 95)), 2),
+        "p99": round(float(np.percentile(array, 99)), 2),
+        "count": len(values),
+    }
+
+
+class LoadTestRecorder:
+    """Collects per-request outcomes and stage timings."""
+
+    def __init__(self):
+        self.stage_ms: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.completed = 0
+        self.succeeded = 0
+
+    def record(self, kind: str, client_ms: float, timings: Optional[Dict[str, float]] = None):
+        self.completed += 1
+        if kind != "ok":
+            self.errors[kind] += 1
+            return
+        self.succeeded += 1
+        self.stage_ms["client"].append(client_ms)
+        for stage, ms in (timings or {}).items():
+            self.stage_ms[stage].append(ms)
+
+    def report(self, elapsed: float) -> Dict:
+        return {
+            "requests": self.completed,
+            "succeeded": self.succeeded,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round(self.succeeded / elapsed, 2) if elapsed > 0 else None,
+            "error_rate": round(sum(self.errors.values()) / self.completed, 4) if self.completed else 0.0,
+            "errors": dict(self.errors),
+            "latency_ms": {stage: percentiles(self.stage_ms.get(stage, [])) for stage in STAGES + ["client"]},
+        }
+
+
+async def send_question(client: httpx.AsyncClient, question: str, recorder: LoadTestRecorder, documents: Optional[List[str]]):
+    payload = {"question": question, "chat_history": []}
+    if documents:
+        payload["documents"] = documents
+    start = time.perf_counter()
+    try:
+        response = await client.post("/chat", json=payload)
+    except httpx.HTTPError as e:
+        recorder.record(f"transport:{type(e).__name__}", (time.perf_counter() - start) * 1000.0)
+        return
+    client_ms = (time.perf_counter() - start) * 1000.0
+    if response.status_code != 200:
+        recorder.record(f"http_{response.status_code}", client_ms)
+    elif response.json().get("answer") == FALLBACK_ANSWER:
+        # /chat answers 200 with a fallback text when the LLM call failed
+        recorder.record("llm_fallback", client_ms)
+    else:
+        recorder.record("ok", client_ms, parse_server_timing(response.headers.get("server-timing", "")))
+
+
+def _question_stream(questions: List[str], seed: int):
+    rng = random.Random(seed)
+    while True:
+        yield rng.choice(questions)
+
+
+async def run_closed_loop(client, questions, recorder, concurrency: int, total: Optional[int], duration: Optional[float], seed: int, documents):
+    """`concurrency` workers each send their next request as soon as the previous one finishes."""
+    stream = _question_stream(questions, seed)
+    deadline = time.perf_counter() + duration if duration else None
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        while True:
+            if total is not None and sent >= total:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            sent += 1
+            await send_question(client, next(stream), recorder, documents)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_open_loop(client, questions, recorder, rate: float, total: Optional[int], duration: Optional[float], seed: int, documents):
+    """Requests arrive as a Poisson process at `rate` per second, regardless of how fast they complete."""
+    stream = _question_stream(questions, seed)
+    rng = random.Random(seed + 1)
+    deadline = time.perf_counter() + duration if duration else None
+    tasks = []
+    while (total is None or len(tasks) < total) and (deadline is None or time.perf_counter() < deadline):
+        tasks.append(asyncio.create_task(send_question(client, next(stream), recorder, documents)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+
+
+def _wait_until_ready(url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = httpx.get(url, timeout=2.0)
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_services(args) -> List[subprocess.Popen]:
+    """Starts the fake LLM server and the app; returns the processes to stop afterwards."""
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    fake_llm = subprocess.Popen([
+        sys.executable, "-m", "app.scripts.fake_llm_server",
+        "--port", str(args.llm_port),
+        "--latency-ms", str(args.llm_latency_ms),
+        "--tokens-per-sec", str(args.llm_tokens_per_sec),
+        "--error-rate", str(args.llm_error_rate),
+    ])
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "http",
+        "LLM_STUB_URL": llm_url,
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+    }
+    if not args.caches:
+        # A size of 0 disables a QueryCache
+        env.update(EMBEDDING_CACHE_SIZE="0", RESULTS_CACHE_SIZE="0", LLM_COALESCE_REQUESTS="false")
+    if args.corpus_dir:
+        env["CORPUS_DIR"] = args.corpus_dir
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.app_port), "--log-level", "warning"],
+        env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+    )
+    processes = [fake_llm, app]
+    try:
+        _wait_until_ready(f"{llm_url}/stats", 30)
+        _wait_until_ready(f"http://127.0.0.1:{args.app_port}/health/ready", args.startup_timeout)
+    except Exception:
+        stop_services(processes)
+        raise
+    return processes
+
+
+def stop_services(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_load(args, base_url: str, questions: List[str]) -> Dict:
+    recorder = LoadTestRecorder()
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        if args.warmup:
+            await asyncio.gather(*(send_question(client, q, LoadTestRecorder(), args.documents) for q in questions[: args.warmup]))
+        start = time.perf_counter()
+        if args.rate:
+            await run_open_loop(client, questions, recorder, args.rate, args.requests, args.duration, args.seed, args.documents)
+        else:
+            await run_closed_loop(client, questions, recorder, args.concurrency, args.requests, args.duration, args.seed, args.documents)
+        return recorder.report(time.perf_counter() - start)
+
+
+def print_report(report: Dict):
+    print(f"\n{report['succeeded']}/{report['requests']} succeeded in {report['elapsed_seconds']:.1f}s "
+          f"-> {report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}")
+    if report["errors"]:
+        print("Errors: " + ", ".join(f"{kind}={count}" for kind, count in report["errors"].items()))
+    header = f"{'stage':<8} {'p50_ms':>10} {'p95_ms':>10} {'p99_ms':>10} {'n':>7}"
+    print(header)
+    print("-" * len(header))
+    for stage, row in report["latency_ms"].items():
+        if row["count"]:
+            print(f"{stage:<8} {row['p50']:>10.2f} {row['p95']:>10.2f} {row['p99']:>10.2f} {row['count']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of /chat against a fake LLM.")
+    parser.add_argument("--url", help="Target an already running app instead of starting one.")
+    parser.add_argument("--questions", help="JSON list or text file (one question per line). Defaults to the Bangla sample questions.")
+    parser.add_argument("--documents", nargs="*", help="Scope every request to these document ids.")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=8, help="Closed loop: requests in flight at once.")
+    load.add_argument("--rate", type=float, help="Open loop: arrivals per second (Poisson).")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests (default 200 unless --duration).")
+    parser.add_argument("--duration", type=float, help="Stop sending after this many seconds.")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests sent first.")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    # Services started by the harness
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--llm-port", type=int, default=8001)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Fake LLM delay before the first token.")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--corpus-dir", default="app/data", help="Passed to the app as CORPUS_DIR.")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the semantic answer cache on (off by default so every request reaches the LLM).")
+    parser.add_argument(
+        "--caches", action="store_true",
+        help="Leave the query embedding and retrieval results caches and LLM request coalescing on "
+             "(off by default so every request is embedded, searched and sent to the LLM).",
+    )
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the app's output.")
+    parser.add_argument("--json", help="Write the report to this JSON file.")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+
+    questions = load_questions(args.questions)
+    unique = len(set(questions))
+    if args.duration or unique * 10 <= args.requests:
+        planned = f"{args.requests} requests" if args.requests else f"{args.duration:.0f}s of requests"
+        print(
+            f"Warning: only {unique} unique questions for {planned}. Any cache or request coalescing left on "
+            "in the app turns most requests into hits, and the latencies then mostly measure those; "
+            "pass a larger --questions set for realistic numbers."
+        )
+    processes = []
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        print("Starting fake LLM server and app...")
+        processes = start_services(args)
+        base_url = f"http://127.0.0.1:{args.app_port}"
+
+    try:
+        mode = f"rate {args.rate}/s" if args.rate else f"concurrency {args.concurrency}"
+        print(f"Replaying {len(questions)} questions against {base_url} ({mode})...")
+        report = asyncio.run(run_load(args, base_url, questions))
+    finally:
+        stop_services(processes)
+
+    print_report(report)
+    if args.json:
+        settings = {key: value for key, value in vars(args).items() if key != "json"}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "settings": settings,
+                "questions": len(questions),
+                **report,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,331 @@
 import faiss
 import numpy as np
-from typing import List, Tuple
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import hashlib
+import json
+import logging
 import os
 import pickle
 
+from app.core.config import (
+    INDEX_TYPE,
+    INDEX_METRIC,
+    INDEX_NLIST,
+    INDEX_NPROBE,
+    INDEX_HNSW_M,
+    INDEX_EF_CONSTRUCTION,
+    INDEX_EF_SEARCH,
+    INDEX_PQ_M,
+    INDEX_PQ_NBITS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Version of the on-disk layout written by InMemoryVectorStore.save_index
+# (3: adds the per-chunk page ranges)
+INDEX_FORMAT_VERSION = 3
+
+
+class IndexManifestError(ValueError):
+    """Raised when a saved index was built with a different configuration."""
+
+
+class MappedDocuments:
+    """
+    Read-only sequence of documents backed by a memory-mapped UTF-8 blob.
+
+    Document i is blob[offsets[i]:offsets[i + 1]]; only the pages that are
+    actually accessed are read from disk.
+    """
+
+    def __init__(self, blob_path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        if os.path.getsize(blob_path) > 0:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            self.blob = np.empty(0, dtype=np.uint8) # Empty files cannot be mapped
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("document index out of range")
+        return self.blob[self.offsets[idx]:self.offsets[idx + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+@dataclass
+class IndexConfig:
+    """FAISS backend selection plus its build-time and search-time parameters."""
+    index_type: str = INDEX_TYPE
+    metric: str = INDEX_METRIC
+    nlist: int = INDEX_NLIST
+    hnsw_m: int = INDEX_HNSW_M
+    ef_construction: int = INDEX_EF_CONSTRUCTION
+    pq_m: int = INDEX_PQ_M
+    pq_nbits: int = INDEX_PQ_NBITS
+    # Search-time parameters; not part of the saved index identity
+    nprobe: int = INDEX_NPROBE
+    ef_search: int = INDEX_EF_SEARCH
+
+    def build_params(self) -> Dict[str, Any]:
+        """Parameters that determine the contents of a built index (recorded in the manifest)."""
+        params = asdict(self)
+        params.pop("nprobe")
+        params.pop("ef_search")
+        return params
+
+    @property
+    def faiss_metric(self) -> int:
+        if self.metric == "l2":
+            return faiss.METRIC_L2
+        if self.metric in ("ip", "cosine"):
+            return faiss.METRIC_INNER_PRODUCT
+        raise ValueError(f"Unknown index metric '{self.metric}'. Use 'l2', 'ip' or 'cosine'.")
+
+
+def _ivf_nlist(config: IndexConfig, n_vectors: int) -> int:
+    # k-means wants roughly 39+ training points per centroid
+    nlist = min(config.nlist, max(1, n_vectors // 39))
+    if nlist < config.nlist:
+        logger.info("Reducing IVF nlist from %d to %d for %d vectors.", config.nlist, nlist, n_vectors)
+    return nlist
+
+
+def _build_flat(dimension: int, n_vectors: int, config: IndexConfig):
+    return faiss.IndexFlat(dimension, config.faiss_metric)
+
+
+def _build_hnsw(dimension: int, n_vectors: int, config: IndexConfig):
+    index = faiss.IndexHNSWFlat(dimension, config.hnsw_m, config.faiss_metric)
+    index.hnsw.efConstruction = config.ef_construction
+    return index
+
+
+def _build_ivf_flat(dimension: int, n_vectors: int, config: IndexConfig):
+    quantizer = faiss.IndexFlat(dimension, config.faiss_metric)
+    return faiss.IndexIVFFlat(quantizer, dimension, _ivf_nlist(config, n_vectors), config.faiss_metric)
+
+
+def _build_ivf_pq(dimension: int, n_vectors: int, config: IndexConfig):
+    if dimension % config.pq_m != 0:
+        raise ValueError(f"INDEX_PQ_M={config.pq_m} must divide the embedding dimension {dimension}.")
+    if n_vectors < 2 ** config.pq_nbits:
+        raise ValueError(f"IVF-PQ with {config.pq_nbits} bits needs at least {2 ** config.pq_nbits} training vectors, got {n_vectors}.")
+    quantizer = faiss.IndexFlat(dimension, config.faiss_metric)
+    return faiss.IndexIVFPQ(quantizer, dimension, _ivf_nlist(config, n_vectors), config.pq_m, config.pq_nbits, config.faiss_metric)
+
+
+# index_type -> builder(dimension, n_vectors, config); register new backends here
+INDEX_BUILDERS: Dict[str, Callable[[int, int, IndexConfig], Any]] = {
+    "flat": _build_flat,
+    "hnsw": _build_hnsw,
+    "ivf_flat": _build_ivf_flat,
+    "ivf_pq": _build_ivf_pq,
+}
+
+
+def create_index(dimension: int, n_vectors: int, config: IndexConfig):
+    """Creates an empty (untrained) FAISS index for `config.index_type`."""
+    if config.index_type not in INDEX_BUILDERS:
+        raise ValueError(f"Unknown index type '{config.index_type}'. Available: {', '.join(INDEX_BUILDERS)}.")
+    return INDEX_BUILDERS[config.index_type](dimension, n_vectors, config)
+
+
+def _wrap_with_ids(index):
+    """Gives an index stable external IDs (IVF indexes support them natively)."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return index
+    return faiss.IndexIDMap2(index)
+
+
+def chunk_hash(chunk: str) -> str:
+    """Content hash identifying a chunk across rebuilds."""
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+def _page_array(pages: Optional[List[Tuple[Optional[int], Optional[int]]]], count: int) -> np.ndarray:
+    """(count, 2) int32 array of (page, page_end) rows; unknown pages (None, or no `pages` at all) are stored as -1."""
+    if pages is None:
+        return np.full((count, 2), -1, dtype=np.int32)
+    array = np.array([[-1 if page is None else page for page in row] for row in pages], dtype=np.int32).reshape(-1, 2)
+    if len(array) != count:
+        raise ValueError("Number of chunks and page ranges must be equal.")
+    return array
+
+
+def corpus_hash(documents) -> str:
+    """SHA-256 over the chunk texts, in order."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(doc.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
 class InMemoryVectorStore:
-    def __init__(self):
+    def __init__(self, index_config: Optional[IndexConfig] = None):
+        self.index_config = index_config or IndexConfig()
         self.index = None
         self.documents = [] # Stores the original text chunks
-        self.chunk_embeddings = [] # Stores the embeddings of the chunks
+        self.chunk_embeddings = None # float32 matrix (n_chunks, dimension) of the chunk embeddings
+        self.ids = np.empty(0, dtype=np.int64) # Sorted FAISS ids, parallel to documents
+        self.pages = np.empty((0, 2), dtype=np.int32) # (page, page_end) per document, -1 where unknown
         self.is_built = False
+        self.version = 0 # Bumped whenever the searchable contents change
+        self.manifest = None # Manifest of the artifact this store was loaded from / saved to
+        self.index_is_mapped = False # True while self.index is backed by a read-only file mapping
 
-    def add_documents(self, chunks: List[str], embeddings: List[List[float]]):
-        """Adds text chunks and their embeddings to the store."""
+    def add_documents(
+        self,
+        chunks: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        pages: Optional[List[Tuple[Optional[int], Optional[int]]]] = None,
+    ):
+        """Adds text chunks and their embeddings (and optionally their (page, page_end) ranges) to the store."""
         if len(chunks) != len(embeddings):
             raise ValueError("Number of chunks and embeddings must be equal.")
 
+        embeddings_np = np.ascontiguousarray(embeddings, dtype='float32')
+        if embeddings_np.ndim != 2:
+            raise ValueError("Embeddings must be a 2D (n_chunks, dimension) matrix.")
+
+        if not isinstance(self.documents, list):
+            self.documents = list(self.documents) # Materialize memory-mapped documents before mutating
         self.documents.extend(chunks)
-        self.chunk_embeddings.extend(embeddings)
+        if self.chunk_embeddings is None or len(self.chunk_embeddings) == 0:
+            self.chunk_embeddings = embeddings_np
+        else:
+            self.chunk_embeddings = np.vstack([self.chunk_embeddings, embeddings_np])
+        self.ids = np.concatenate([self.ids, self._next_ids(len(chunks))])
+        self.pages = np.concatenate([self.pages, _page_array(pages, len(chunks))])
         self.is_built = False # Mark for rebuilding the FAISS index
 
+    def _next_ids(self, count: int) -> np.ndarray:
+        start = int(self.ids[-1]) + 1 if len(self.ids) else 0
+        return np.arange(start, start + count, dtype=np.int64)
+
+    def clear(self):
+        """Drops all documents, embeddings and the index."""
+        self.index = None
+        self.documents = []
+        self.chunk_embeddings = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.pages = np.empty((0, 2), dtype=np.int32)
+        self.manifest = None
+        self.index_is_mapped = False
+        self.is_built = False
+        self.version += 1
+
+    @property
+    def supports_in_place_update(self) -> bool:
+        """Whether update_documents can modify the built index without a rebuild (HNSW cannot remove vectors)."""
+        return self.is_built and self.index is not None and self.index_config.index_type != "hnsw"
+
+    def update_documents(
+        self,
+        remove_ids: List[int],
+        chunks: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        pages: Optional[List[Tuple[Optional[int], Optional[int]]]] = None,
+    ) -> np.ndarray:
+        """
+        Removes the vectors with `remove_ids` and adds new chunks (with their
+        page ranges, if known), updating the built FAISS index in place where
+        the backend allows it and rebuilding it otherwise. Returns the ids
+        assigned to the new chunks.
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError("Number of chunks and embeddings must be equal.")
+        remove_ids = np.asarray(remove_ids, dtype=np.int64)
+        new_ids = self._next_ids(len(chunks))
+        embeddings_np = np.ascontiguousarray(embeddings, dtype='float32').reshape(len(chunks), -1)
+
+        keep = ~np.isin(self.ids, remove_ids)
+        documents = [doc for doc, kept in zip(self.documents, keep) if kept]
+        documents.extend(chunks)
+        kept_embeddings = np.asarray(self.chunk_embeddings)[keep]
+        self.chunk_embeddings = np.vstack([kept_embeddings, embeddings_np]) if len(chunks) else np.ascontiguousarray(kept_embeddings)
+        self.ids = np.concatenate([self.ids[keep], new_ids])
+        self.pages = np.concatenate([np.asarray(self.pages)[keep], _page_array(pages, len(chunks))])
+        self.documents = documents
+
+        if self.supports_in_place_update:
+            if self.index_is_mapped:
+                # A memory-mapped index is read-only; copy it into owned memory first
+                self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+                self.index_is_mapped = False
+                self.set_search_params()
+            if len(remove_ids):
+                self.index.remove_ids(remove_ids)
+            if len(chunks):
+                self.index.add_with_ids(self.prepare_vectors(embeddings_np), new_ids)
+            self.version += 1
+            logger.info("FAISS index updated in place: -%d +%d vectors (%d total).", len(remove_ids), len(chunks), self.index.ntotal)
+        else:
+            self.build_index()
+        return new_ids
+
     def build_index(self):
         """Builds the FAISS index from the stored embeddings."""
-        if not self.chunk_embeddings:
-            print("No embeddings to build index from.")
+        if self.chunk_embeddings is None or len(self.chunk_embeddings) == 0:
+            logger.warning("No embeddings to build index from.")
             return
 
-        # Convert list of lists to a 2D numpy array
-        embeddings_np = np.array(self.chunk_embeddings).astype('float32')
+        embeddings_np = self.prepare_vectors(self.chunk_embeddings)
 
         # Get embedding dimension
         dimension = embeddings_np.shape[1]
 
-        # Initialize a FAISS index (e.g., IndexFlatL2 for L2 distance)
-        # For small scale, IndexFlatL2 is fine. For larger scales, consider HNSW, IVF, etc.
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings_np)
+        # The backend (flat, HNSW, IVF, IVF-PQ) comes from self.index_config
+        index = _wrap_with_ids(create_index(dimension, len(embeddings_np), self.index_config))
+        if not index.is_trained:
+            index.train(embeddings_np)
+        index.add_with_ids(embeddings_np, np.ascontiguousarray(self.ids))
+        self.index = index
+        self.index_is_mapped = False
+        self.set_search_params()
         self.is_built = True
-        print(f"FAISS index built with {self.index.ntotal} vectors.")
+        self.version += 1
+        logger.info("FAISS %s index built with %d vectors.", self.index_config.index_type, self.index.ntotal)
+
+    def prepare_vectors(self, vectors) -> np.ndarray:
+        """Returns float32 vectors, L2-normalized (as a copy) when the metric is cosine."""
+        if self.index_config.metric == "cosine":
+            vectors = np.array(vectors, dtype='float32', copy=True)
+            faiss.normalize_L2(vectors)
+            return vectors
+        return np.ascontiguousarray(vectors, dtype='float32')
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Applies IVF nprobe / HNSW efSearch to the current index (defaults from index_config)."""
+        if nprobe is not None:
+            self.index_config.nprobe = nprobe
+        if ef_search is not None:
+            self.index_config.ef_search = ef_search
+        if self.index is None:
+            return
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.nprobe = self.index_config.nprobe
+        base = faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap2) else self.index
+        if hasattr(base, "hnsw"):
+            base.hnsw.efSearch = self.index_config.ef_search
+
+    def page_range(self, position: int) -> Tuple[Optional[int], Optional[int]]:
+        """(page, page_end) of the document at `position`, None where unknown."""
+        page, page_end = (int(value) for value in self.pages[position])
+        return (page if page >= 0 else None), (page_end if page_end >= 0 else None)
 
     def search(self, query_embedding: List[float], k: int = 3) -> List[Tuple[str, float]]:
         """
@@ -50,48 +338,197 @@ class InMemoryVectorStore:
         Returns:
             A list of tuples, where each tuple contains (document_text, similarity_score).
         """
+        return self.search_batch([query_embedding], k=k)[0]
+
+    def search_positions(self, query_embeddings: Union[np.ndarray, List[List[float]]], k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Multi-query FAISS search returning (scores, positions), both of shape
+        (n_queries, k). Positions index self.documents / self.chunk_embeddings;
+        -1 marks missing results.
+        """
         if not self.is_built or self.index is None:
             raise RuntimeError("FAISS index has not been built. Call build_index() first.")
-        if not self.documents:
-            return [] # No documents to search
 
-        query_embedding_np = np.array([query_embedding]).astype('float32')
+        query_embeddings_np = np.ascontiguousarray(query_embeddings, dtype='float32')
+        if query_embeddings_np.ndim == 1:
+            query_embeddings_np = query_embeddings_np.reshape(1, -1)
+        query_embeddings_np = self.prepare_vectors(query_embeddings_np)
+
+        # D: distances, I: ids of the nearest neighbors
+        distances, ids = self.index.search(query_embeddings_np, k)
+        # ids are kept sorted, so a binary search maps them back to document positions
+        positions = np.searchsorted(self.ids, ids)
+        if len(self.ids) == 0:
+            return distances, np.full_like(ids, -1)
+        # FAISS pads missing results with -1
+        clipped = np.minimum(positions, len(self.ids) - 1)
+        valid = (ids >= 0) & (positions < len(self.ids)) & (np.asarray(self.ids)[clipped] == ids)
+        return distances, np.where(valid, positions, -1)
 
-        # D: distances, I: indices of the nearest neighbors
-        distances, indices = self.index.search(query_embedding_np, k)
+    def search_batch(
+        self, query_embeddings: Union[np.ndarray, List[List[float]]], k: int = 3, with_pages: bool = False
+    ) -> List[List[Tuple]]:
+        """
+        Searches the vector store for several queries with a single FAISS call.
+
+        Returns one list of (document_text, similarity_score) tuples per query,
+        in the same order as `query_embeddings`. With `with_pages` the tuples
+        are (document_text, similarity_score, page, page_end).
+        """
+        if self.is_built and not self.documents:
+            return [[] for _ in range(len(query_embeddings))] # No documents to search
 
-        results = []
-        # FAISS returns distances, we often want similarity (e.g., 1 - distance if normalized)
-        # Here, lower L2 distance means higher similarity.
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.documents): # Ensure index is valid
-                results.append((self.documents[idx], distances[0][i]))
-        return results
+        distances, positions = self.search_positions(query_embeddings, k)
 
-    def save_index(self, path: str):
-        """Saves the FAISS index and documents to disk."""
+        all_results = []
+        # With the l2 metric lower distance means higher similarity; with ip/cosine
+        # FAISS returns similarities, higher is better.
+        for row_distances, row_positions in zip(distances, positions):
+            all_results.append([
+                (self.documents[pos], distance, *self.page_range(pos)) if with_pages else (self.documents[pos], distance)
+                for distance, pos in zip(row_distances, row_positions)
+                if pos >= 0
+            ])
+        return all_results
+
+    @staticmethod
+    def artifact_paths(path: str) -> Dict[str, str]:
+        """File names of the artifact set stored under the `path` prefix."""
+        return {
+            "index": f"{path}.faiss",
+            "embeddings": f"{path}.embeddings.npy",
+            "documents": f"{path}.docs.bin",
+            "offsets": f"{path}.offsets.npy",
+            "ids": f"{path}.ids.npy",
+            "pages": f"{path}.pages.npy",
+            "manifest": f"{path}.manifest.json",
+        }
+
+    def save_index(self, path: str, manifest: Optional[Dict[str, Any]] = None):
+        """
+        Saves the index as a memory-mappable artifact set:
+        the FAISS index, a raw float32 .npy embedding matrix, a UTF-8 documents
+        blob with an int64 offsets array, the FAISS ids of the documents, their
+        (page, page_end) ranges, and a JSON manifest. `manifest` adds
+        build settings (model_name, chunk_size, chunk_overlap, ...) to it.
+        """
         if self.index is None:
-            print("No index to save.")
+            logger.warning("No index to save.")
             return
 
-        # Save FAISS index
-        faiss.write_index(self.index, f"{path}.faiss")
-        # Save documents and embeddings
-        with open(f"{path}.pkl", 'wb') as f:
-            pickle.dump({"documents": self.documents, "chunk_embeddings": self.chunk_embeddings}, f)
-        print(f"Index and documents saved to {path}.faiss and {path}.pkl")
-
-    def load_index(self, path: str):
-        """Loads the FAISS index and documents from disk."""
-        if os.path.exists(f"{path}.faiss") and os.path.exists(f"{path}.pkl"):
-            self.index = faiss.read_index(f"{path}.faiss")
+        paths = self.artifact_paths(path)
+        encoded = [doc.encode("utf-8") for doc in self.documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(doc) for doc in encoded])
+
+        self.manifest = {
+            **(manifest or {}),
+            "format_version": INDEX_FORMAT_VERSION,
+            "index": self.index_config.build_params(),
+            "dimension": int(self.chunk_embeddings.shape[1]),
+            "count": len(encoded),
+            "corpus_hash": corpus_hash(self.documents),
+        }
+
+        # Each file is written next to its target and renamed into place; the
+        # manifest goes last so a partially written artifact is never accepted.
+        faiss.write_index(self.index, f"{paths['index']}.tmp")
+        os.replace(f"{paths['index']}.tmp", paths["index"])
+        with open(f"{paths['embeddings']}.tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.chunk_embeddings, dtype='float32'))
+        os.replace(f"{paths['embeddings']}.tmp", paths["embeddings"])
+        with open(f"{paths['documents']}.tmp", 'wb') as f:
+            for doc in encoded:
+                f.write(doc)
+        os.replace(f"{paths['documents']}.tmp", paths["documents"])
+        with open(f"{paths['offsets']}.tmp", 'wb') as f:
+            np.save(f, offsets)
+        os.replace(f"{paths['offsets']}.tmp", paths["offsets"])
+        with open(f"{paths['ids']}.tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.ids, dtype=np.int64))
+        os.replace(f"{paths['ids']}.tmp", paths["ids"])
+        with open(f"{paths['pages']}.tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.pages, dtype=np.int32))
+        os.replace(f"{paths['pages']}.tmp", paths["pages"])
+        with open(f"{paths['manifest']}.tmp", 'w', encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(f"{paths['manifest']}.tmp", paths["manifest"])
+        logger.info("Index and documents saved to %s.* (manifest: %s)", path, paths["manifest"])
+
+    @staticmethod
+    def check_manifest(manifest: Dict[str, Any], expected: Dict[str, Any]):
+        """Raises IndexManifestError if `manifest` disagrees with any key in `expected`."""
+        mismatches = {
+            key: (manifest.get(key), value)
+            for key, value in expected.items()
+            if manifest.get(key) != value
+        }
+        if mismatches:
+            details = ", ".join(f"{key}: saved={saved!r} expected={want!r}" for key, (saved, want) in mismatches.items())
+            raise IndexManifestError(f"Saved index does not match the current configuration ({details}).")
+
+    def load_index(self, path: str, expected_manifest: Optional[Dict[str, Any]] = None):
+        """
+        Loads the index from disk by memory-mapping its files.
+
+        The saved manifest must agree with this store's index_config and with
+        every key of `expected_manifest`, otherwise IndexManifestError is raised
+        and the store is left untouched. Legacy .faiss + .pkl artifacts (no
+        manifest, always flat L2) are only loaded when nothing else is expected.
+        """
+        paths = self.artifact_paths(path)
+        if os.path.exists(paths["manifest"]):
+            with open(paths["manifest"], 'r', encoding="utf-8") as f:
+                manifest = json.load(f)
+            # Checked first, so an artifact of an older format is reported as such
+            self.check_manifest(manifest, {
+                "format_version": INDEX_FORMAT_VERSION,
+                "index": self.index_config.build_params(),
+                **(expected_manifest or {}),
+            })
+            if not all(os.path.exists(p) for p in paths.values()):
+                raise IndexManifestError(f"Saved index at {path} is missing files.")
+
+            embeddings = np.load(paths["embeddings"], mmap_mode='r')
+            documents = MappedDocuments(paths["documents"], paths["offsets"])
+            ids = np.load(paths["ids"], mmap_mode='r')
+            pages = np.load(paths["pages"], mmap_mode='r')
+            if not len(documents) == len(embeddings) == len(ids) == len(pages) == manifest["count"]:
+                raise IndexManifestError(f"Saved index at {path} is inconsistent with its manifest.")
+
+            self.index, self.index_is_mapped = self._read_faiss_index(paths["index"])
+            self.set_search_params()
+            self.chunk_embeddings = embeddings
+            self.documents = documents
+            self.ids = ids
+            self.pages = pages
+            self.manifest = manifest
+            self.is_built = True
+            self.version += 1
+            logger.info("Index and documents memory-mapped from %s.* (%d chunks)", path, manifest["count"])
+        elif os.path.exists(f"{path}.faiss") and os.path.exists(f"{path}.pkl"):
+            if expected_manifest or (self.index_config.index_type, self.index_config.metric) != ("flat", "l2"):
+                raise IndexManifestError(f"Legacy index at {path}.pkl has no manifest and cannot be verified.")
             with open(f"{path}.pkl", 'rb') as f:
                 data = pickle.load(f)
-                self.documents = data["documents"]
-                self.chunk_embeddings = data["chunk_embeddings"]
-            self.is_built = True
-            print(f"Index and documents loaded from {path}.faiss and {path}.pkl")
+            self.clear()
+            # Older artifacts pickled the embeddings as a list of lists; the flat
+            # index is rebuilt from them so it carries ids like current artifacts
+            self.add_documents(data["documents"], np.ascontiguousarray(data["chunk_embeddings"], dtype='float32'))
+            self.build_index()
+            logger.info("Index and documents loaded from legacy %s.pkl", path)
         else:
-            print(f"Warning: Files for loading index not found at {path}.faiss or {path}.pkl. Starting fresh.")
-
+            logger.warning("Files for loading index not found at %s.*. Starting fresh.", path)
 
+    @staticmethod
+    def _read_faiss_index(index_path: str):
+        """
+        Reads a FAISS index memory-mapped where the installed FAISS supports it.
+        Returns (index, is_mapped).
+        """
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(index_path, flags), True
+        except RuntimeError:
+            return faiss.read_index(index_path), False
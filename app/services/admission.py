@@ -0,0 +1,245 @@
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, Optional
+
+from cachetools import TLRUCache
+
+from app.core.config import (
+    ADMISSION_RETRIEVAL_MAX_IN_FLIGHT,
+    ADMISSION_RETRIEVAL_MAX_QUEUE,
+    ADMISSION_LLM_MAX_IN_FLIGHT,
+    ADMISSION_LLM_MAX_QUEUE,
+    RATE_LIMIT_RPS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_CLIENTS,
+    REQUEST_DEADLINE,
+    TRUST_PROXY_HEADERS,
+)
+from app.utils.metrics import ADMISSION_REJECTED
+
+
+class AdmissionError(Exception):
+    """A request shed by admission control; rendered as `status_code` with a Retry-After header."""
+
+    status_code = 503
+    reason = "shed"  # Short label, e.g. for the per-question errors of /chat/batch
+
+    def __init__(self, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        # Retry-After takes whole seconds
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))} if self.retry_after is not None else {}
+
+
+class OverloadedError(AdmissionError):
+    status_code = 503
+    reason = "overloaded"
+
+
+class RateLimitedError(AdmissionError):
+    status_code = 429
+    reason = "rate limited"
+
+
+class DeadlineExceededError(AdmissionError):
+    status_code = 504
+    reason = "deadline exceeded"
+
+
+class Deadline:
+    """Absolute deadline of a request; `timeout` None means no deadline."""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires = time.monotonic() + timeout if timeout else None
+
+    @classmethod
+    def from_headers(cls, headers, default: float = REQUEST_DEADLINE) -> "Deadline":
+        """Deadline from the client's X-Request-Timeout header (seconds), else `default` (0 = none)."""
+        value = headers.get("x-request-timeout")
+        try:
+            timeout = float(value) if value is not None else default
+        except ValueError:
+            timeout = default
+        return cls(timeout if timeout > 0 else None)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.expires is None else self.expires - time.monotonic()
+
+    def check(self, needed: float, stage: str):
+        """Raises DeadlineExceededError if less than `needed` seconds are left for `stage`."""
+        remaining = self.remaining()
+        if remaining is not None and remaining < needed:
+            ADMISSION_REJECTED.labels(stage, "deadline").inc()
+            raise DeadlineExceededError(
+                f"Request deadline cannot be met: {max(remaining, 0.0):.2f}s left, {stage} needs about {needed:.2f}s."
+            )
+
+    async def run(self, awaitable: Awaitable, stage: str) -> Any:
+        """Awaits `awaitable`, giving up with DeadlineExceededError when the deadline passes."""
+        remaining = self.remaining()
+        if remaining is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, max(remaining, 0.0))
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTED.labels(stage, "deadline").inc()
+            raise DeadlineExceededError(f"Request deadline passed during {stage}.")
+
+
+class StageLimiter:
+    """
+    Bounds one pipeline stage: at most `max_in_flight` requests run in it and
+    at most `max_queue` more wait for a slot. Beyond that a request is shed
+    immediately with OverloadedError instead of queueing without bound, so
+    latency for admitted requests stays predictable under overload.
+    A `max_in_flight` of 0 disables the limit.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, smoothing: float = 0.1):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(0, max_queue)
+        self.smoothing = smoothing
+        self._semaphore = asyncio.Semaphore(max(1, max_in_flight))
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.service_seconds: Optional[float] = None  # Moving average of the time spent in the stage
+
+    def expected_seconds(self) -> float:
+        """Typical time a request spends in this stage once admitted (0 until measured)."""
+        return self.service_seconds or 0.0
+
+    def retry_after(self) -> float:
+        """Rough time until the current queue has drained."""
+        if not self.max_in_flight:
+            return 1.0
+        return (self.waiting + 1) / self.max_in_flight * max(self.expected_seconds(), 0.1)
+
+    @asynccontextmanager
+    async def admit(self, deadline: Optional[Deadline] = None):
+        """Holds a slot of the stage for the duration of the block, waiting in the bounded queue if needed."""
+        if self.max_in_flight > 0:
+            if self._semaphore.locked():
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    ADMISSION_REJECTED.labels(self.name, "overloaded").inc()
+                    raise OverloadedError(f"Server is over capacity ({self.name}); retry later.", self.retry_after())
+                remaining = deadline.remaining() if deadline is not None else None
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), None if remaining is None else max(remaining, 0.0))
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    ADMISSION_REJECTED.labels(self.name, "deadline").inc()
+                    raise DeadlineExceededError(f"Request deadline passed while queued for {self.name}.")
+                finally:
+                    self.waiting -= 1
+            else:
+                await self._semaphore.acquire()
+
+        self.admitted += 1
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.max_in_flight > 0:
+                self._semaphore.release()
+        # Only completed work feeds the service time; cancelled or failed calls would skew it
+        elapsed = time.monotonic() - start
+        self.service_seconds = elapsed if self.service_seconds is None else (
+            self.smoothing * elapsed + (1 - self.smoothing) * self.service_seconds
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "service_seconds": self.service_seconds,
+        }
+
+
+class ClientRateLimiter:
+    """
+    Per-client token buckets: each client gets `rate` requests per second
+    with bursts of up to `burst`. A request costing more than `burst` (a large
+    batch) is admitted on a full bucket and leaves it in debt, so the client
+    pays for it before its next request. Buckets are forgotten once they
+    would be full again, and at most `max_clients` are kept. A `rate` of 0
+    disables it.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_RPS, burst: float = RATE_LIMIT_BURST, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        # Each bucket expires when it has refilled, so forgetting it never forgives debt
+        self._buckets = TLRUCache(maxsize=max(1, max_clients), ttu=self._refilled_at, timer=time.monotonic)
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def _refilled_at(self, client_id: str, bucket, now: float) -> float:
+        tokens, updated = bucket
+        return updated + (self.burst - tokens) / self.rate if self.rate > 0 else now
+
+    def acquire(self, client_id: str, cost: float = 1.0):
+        """Takes `cost` tokens from the client's bucket or raises RateLimitedError."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        needed = min(cost, self.burst)
+        with self._lock:
+            tokens, updated = self._buckets.get(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < needed:
+                self._buckets[client_id] = (tokens, now)
+                self.limited += 1
+                ADMISSION_REJECTED.labels("client", "rate_limited").inc()
+                raise RateLimitedError("Rate limit exceeded; slow down.", (needed - tokens) / self.rate)
+            self._buckets[client_id] = (tokens - cost, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = len(self._buckets)
+        return {"rate": self.rate, "burst": self.burst, "clients": clients, "limited": self.limited}
+
+
+def client_id(request, trust_proxy_headers: bool = TRUST_PROXY_HEADERS) -> str:
+    """
+    Rate-limit key of a request: the peer address. Behind a trusted reverse
+    proxy, the X-Client-Id it sets or the address it appended last to
+    X-Forwarded-For instead; clients could otherwise pick a fresh key per request.
+    """
+    if trust_proxy_headers:
+        forwarded = request.headers.get("x-forwarded-for", "").rsplit(",", 1)[-1].strip()
+        key = request.headers.get("x-client-id") or forwarded
+        if key:
+            return key
+    return request.client.host if request.client else "unknown"
+
+
+# Shared limiters for the chat endpoints
+retrieval_limiter = StageLimiter("retrieval", ADMISSION_RETRIEVAL_MAX_IN_FLIGHT, ADMISSION_RETRIEVAL_MAX_QUEUE)
+llm_limiter = StageLimiter("llm", ADMISSION_LLM_MAX_IN_FLIGHT, ADMISSION_LLM_MAX_QUEUE)
+rate_limiter = ClientRateLimiter()
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {
+        "retrieval": retrieval_limiter.stats(),
+        "llm": llm_limiter.stats(),
+        "rate_limit": rate_limiter.stats(),
+    }
@@ -0,0 +1,184 @@
+import faiss
+import numpy as np
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+from app.core.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+)
+from app.services.embedding import embedding_model_id
+
+logger = logging.getLogger(__name__)
+
+
+def context_fingerprint(context_chunks: List[str]) -> str:
+    """Order-insensitive hash of a retrieved chunk set."""
+    digest = hashlib.sha1()
+    for chunk in sorted(context_chunks or []):
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers by question embedding.
+
+    A lookup hits when a stored question has cosine similarity >= `threshold`
+    with the new one AND was answered from the same retrieved chunk set.
+    Entries are kept in a small inner-product FAISS index over normalized
+    embeddings; the least recently used entry is evicted once `capacity` is reached.
+    The embeddings belong to `model_name` (default: embedding_model_id()), so a
+    saved cache is only loaded back for that same model.
+    """
+
+    def __init__(
+        self,
+        capacity: int = ANSWER_CACHE_SIZE,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        neighbours: int = 5,
+        model_name: Optional[str] = None,
+    ):
+        self.capacity = capacity
+        self.model_name = model_name or embedding_model_id()
+        self.threshold = threshold
+        self.neighbours = neighbours
+        self.index = None
+        self.entries = OrderedDict() # id -> {"question", "answer", "context", "embedding"}, LRU order
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: Union[np.ndarray, List[float]]) -> np.ndarray:
+        vector = np.ascontiguousarray(embedding, dtype='float32').reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, query_embedding: Union[np.ndarray, List[float]], context_chunks: List[str]) -> Optional[str]:
+        """Returns a stored answer for a near-duplicate question, or None."""
+        fingerprint = context_fingerprint(context_chunks)
+        vector = self._normalize(query_embedding)
+        with self._lock:
+            if self.index is not None and self.index.ntotal > 0 and self.index.d == vector.shape[1]:
+                scores, ids = self.index.search(vector, min(self.neighbours, self.index.ntotal))
+                for score, entry_id in zip(scores[0], ids[0]):
+                    if score < self.threshold:
+                        break # Results are sorted by decreasing similarity
+                    entry = self.entries.get(int(entry_id))
+                    if entry is not None and entry["context"] == fingerprint:
+                        self.entries.move_to_end(int(entry_id))
+                        self.hits += 1
+                        return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, question: str, query_embedding: Union[np.ndarray, List[float]], context_chunks: List[str], answer: str):
+        """Adds an answer to the cache, evicting the least recently used entry if full."""
+        if self.capacity <= 0:
+            return
+        vector = self._normalize(query_embedding)
+        with self._lock:
+            if self.index is not None and self.index.d != vector.shape[1]:
+                # Entries from another embedding space can never match this one's questions
+                logger.warning("Dropping %d cached answers with embedding dimension %d (now %d).", len(self.entries), self.index.d, vector.shape[1])
+                self.index = None
+                self.entries.clear()
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+            while len(self.entries) >= self.capacity:
+                evicted_id, _ = self.entries.popitem(last=False)
+                self.index.remove_ids(np.array([evicted_id], dtype='int64'))
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype='int64'))
+            self.entries[entry_id] = {
+                "question": question,
+                "answer": answer,
+                "context": context_fingerprint(context_chunks),
+                "embedding": vector[0],
+            }
+
+    def clear(self):
+        with self._lock:
+            self.index = None
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": "semantic_answers",
+                "size": len(self.entries),
+                "maxsize": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def save(self, path: str):
+        """
+        Saves the cached entries to `path` as a .npz file (no pickled objects,
+        so loading it never runs code) along with the embedding model and
+        dimension; the FAISS index is rebuilt on load.
+        """
+        with self._lock:
+            entries = list(self.entries.values())
+        matrix = np.vstack([entry["embedding"] for entry in entries]) if entries else np.empty((0, 0), dtype='float32')
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            model_name=np.array(self.model_name),
+            dimension=np.array(matrix.shape[1]),
+            questions=np.array([entry["question"] for entry in entries], dtype=str),
+            answers=np.array([entry["answer"] for entry in entries], dtype=str),
+            contexts=np.array([entry["context"] for entry in entries], dtype=str),
+            embeddings=matrix.astype('float32'),
+        )
+        os.replace(tmp_path, path)
+        logger.info("Answer cache with %d entries saved to %s", len(entries), path)
+
+    def load(self, path: str):
+        """
+        Loads entries saved by `save`, keeping the most recent ones up to
+        capacity. A file written for another embedding model or dimension (or
+        in an unreadable format) is discarded with a warning, since its
+        answers were matched in a different embedding space.
+        """
+        if not os.path.exists(path):
+            logger.warning("Answer cache file not found at %s. Starting empty.", path)
+            return
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                model_name = str(data["model_name"])
+                dimension = int(data["dimension"])
+                saved = list(zip(data["questions"].tolist(), data["answers"].tolist(), data["contexts"].tolist(), data["embeddings"]))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring answer cache at %s: unreadable (%s). Starting empty.", path, e)
+            return
+        if model_name != self.model_name:
+            logger.warning("Ignoring answer cache at %s: built with embedding model %s, not %s.", path, model_name, self.model_name)
+            return
+        self.clear()
+        with self._lock:
+            for question, answer, context, embedding in saved[-self.capacity:] if self.capacity > 0 else []:
+                vector = np.ascontiguousarray(embedding, dtype='float32').reshape(1, -1)
+                if self.index is None:
+                    self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+                entry_id = self._next_id
+                self._next_id += 1
+                self.index.add_with_ids(vector, np.array([entry_id], dtype='int64'))
+                self.entries[entry_id] = {"question": question, "answer": answer, "context": context, "embedding": vector[0]}
+        logger.info("Answer cache with %d entries loaded from %s", len(self.entries), path)
+
+
+# Global semantic answer cache used by the /chat endpoint (None when disabled)
+answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
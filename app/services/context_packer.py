@@ -0,0 +1,130 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MIN_OVERLAP,
+    CONTEXT_MAX_OVERLAP,
+    SESSION_HISTORY_TURNS,
+    SESSION_HISTORY_TOKEN_BUDGET,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough LLM token count without a tokenizer: about 4 characters per token
+    for ASCII text and 2 for other scripts such as Bangla.
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+
+def _overlap_length(left: str, right: str, min_overlap: int, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 if shorter than min_overlap)."""
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    start = max(0, len(left) - max_overlap)
+    pos = left.find(probe, start)
+    while pos != -1:
+        tail = left[pos:]
+        if right.startswith(tail):
+            return len(tail)
+        pos = left.find(probe, pos + 1)
+    return 0
+
+
+def merge_overlapping_chunks(
+    chunks: List[str],
+    min_overlap: int = CONTEXT_MIN_OVERLAP,
+    max_overlap: int = CONTEXT_MAX_OVERLAP,
+) -> List[str]:
+    """
+    Merges retrieved chunks that overlap (the end of one repeats the start of
+    another, as produced by chunk_text) back into contiguous spans, and drops
+    chunks fully contained in another. Spans keep the relevance order of
+    their best-ranked chunk.
+    """
+    spans = []  # [text, best_rank]
+    for rank, chunk in enumerate(chunks):
+        if not chunk:
+            continue
+        spans.append([chunk, rank])
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(spans)):
+            for j in range(len(spans)):
+                if i == j:
+                    continue
+                left, right = spans[i][0], spans[j][0]
+                if right in left:
+                    text = left
+                else:
+                    overlap = _overlap_length(left, right, min_overlap, max_overlap)
+                    if not overlap:
+                        continue
+                    text = left + right[overlap:]
+                spans[i] = [text, min(spans[i][1], spans[j][1])]
+                del spans[j]
+                merged = True
+                break
+            if merged:
+                break
+
+    spans.sort(key=lambda span: span[1])
+    return [text for text, _ in spans]
+
+
+def pack_context(
+    chunks: List[str],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    token_counter: Optional[Callable[[str], int]] = None,
+) -> List[str]:
+    """
+    Packing stage between retrieval and generation: merges overlapping chunks,
+    then keeps spans in relevance order while they fit in `token_budget`.
+    A first span larger than the whole budget is truncated rather than dropped.
+    """
+    count = token_counter or estimate_tokens
+    packed, used = [], 0
+    for span in merge_overlapping_chunks(chunks):
+        tokens = count(span)
+        if used + tokens <= token_budget:
+            packed.append(span)
+            used += tokens
+        elif not packed:
+            # Keep as much of the most relevant span as the budget allows
+            ratio = token_budget / max(tokens, 1)
+            packed.append(span[: int(len(span) * ratio)])
+            used = token_budget
+    return packed
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Text of a chat message in the {"role", "parts": [{"text"}]} format."""
+    return "".join(part.get("text", "") for part in message.get("parts", []))
+
+
+def pack_history(
+    messages: List[Dict[str, Any]],
+    max_turns: int = SESSION_HISTORY_TURNS,
+    token_budget: int = SESSION_HISTORY_TOKEN_BUDGET,
+    token_counter: Optional[Callable[[str], int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Windows chat history for the prompt: keeps the newest messages, at most
+    `max_turns` question/answer pairs, while they fit in `token_budget`.
+    Older messages are dropped whole, so the prompt never grows with the
+    length of the conversation.
+    """
+    count = token_counter or estimate_tokens
+    kept, used = [], 0
+    for message in reversed(messages[-2 * max_turns:] if max_turns > 0 else []):
+        tokens = count(message_text(message))
+        if used + tokens > token_budget:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    return kept
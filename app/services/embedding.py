@@ -1,20 +1,293 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import json
+import logging
 import numpy as np
-import torch
+import os
+import threading
+from typing import List, Optional
 
-embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+from app.core.config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_DIR,
+    EMBEDDING_QUANTIZATION,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_NUM_WORKERS,
+    EMBEDDING_NUM_THREADS,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_POOL_WORKERS,
+    EMBEDDING_POOL_START_TIMEOUT,
+)
+from app.services.embedding_pool import EmbeddingWorkerPool
+from app.utils.cache import QueryCache, normalize_query
 
-def get_text_embedding(text: str) -> list[float]:
-    """Generates a numerical embedding for a given text."""
-    # Ensure the model is loaded once
+logger = logging.getLogger(__name__)
+
+# Loaded on first use (see get_embedding_model) so importing this module stays cheap
+embedding_model = None
+_model_lock = threading.Lock()
+
+# Out-of-process embedding service; once started, all encoding goes through it (see start_embedding_pool)
+embedding_pool: Optional[EmbeddingWorkerPool] = None
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def embedding_model_id(backend: str = EMBEDDING_BACKEND) -> str:
+    """
+    Identifies the embedding model *and* backend in cache keys and index
+    manifests, since ONNX/int8 vectors drift slightly from the torch ones
+    (and int8 vectors also depend on the quantization target).
+    """
+    if backend == "torch":
+        return EMBEDDING_MODEL
+    if backend == "onnx-int8":
+        return f"{EMBEDDING_MODEL}#{backend}-{EMBEDDING_QUANTIZATION}"
+    return f"{EMBEDDING_MODEL}#{backend}"
+
+
+# Query embeddings keyed by (model id, normalized text)
+embedding_cache = QueryCache("embeddings", maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL)
+
+
+def onnx_model_dir(model_name: str = EMBEDDING_MODEL, root: str = EMBEDDING_ONNX_DIR) -> str:
+    """Directory holding the ONNX export of `model_name`, one per model so switching models never reuses another's export."""
+    return os.path.join(root, model_name.replace("/", "--"))
+
+
+def _exported_model(output_dir: str) -> Optional[str]:
+    """Model name recorded with the ONNX export in `output_dir`, or None if there is no complete export."""
+    try:
+        with open(os.path.join(output_dir, "export.json"), "r", encoding="utf-8") as f:
+            return json.load(f).get("model_name")
+    except (OSError, ValueError):
+        return None
+
+
+def export_onnx_model(output_dir: Optional[str] = None, quantize: bool = False, quantization: str = EMBEDDING_QUANTIZATION) -> str:
+    """
+    Exports the embedding model to ONNX under `output_dir` (default:
+    onnx_model_dir()) once and, with `quantize`, adds a dynamically
+    int8-quantized copy. The export records the model it was made from and is
+    redone if that is not EMBEDDING_MODEL. Returns the ONNX file name
+    relative to `output_dir`.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    output_dir = output_dir or onnx_model_dir()
+    onnx_file = "onnx/model.onnx"
+    if _exported_model(output_dir) != EMBEDDING_MODEL or not os.path.exists(os.path.join(output_dir, onnx_file)):
+        logger.info("Exporting %s to ONNX in %s...", EMBEDDING_MODEL, output_dir)
+        SentenceTransformer(EMBEDDING_MODEL, backend="onnx").save_pretrained(output_dir)
+        # Quantized copies of an earlier export are stale now
+        onnx_dir = os.path.join(output_dir, "onnx")
+        for name in os.listdir(onnx_dir) if os.path.isdir(onnx_dir) else []:
+            if name.startswith("model_qint8_"):
+                os.remove(os.path.join(onnx_dir, name))
+        # Written last, so an interrupted export is redone
+        with open(os.path.join(output_dir, "export.json"), "w", encoding="utf-8") as f:
+            json.dump({"model_name": EMBEDDING_MODEL}, f)
+    if not quantize:
+        return onnx_file
+
+    quantized_file = f"onnx/model_qint8_{quantization}.onnx"
+    if not os.path.exists(os.path.join(output_dir, quantized_file)):
+        logger.info("Quantizing ONNX model to int8 (%s)...", quantization)
+        model = SentenceTransformer(output_dir, backend="onnx")
+        export_dynamic_quantized_onnx_model(model, quantization, output_dir)
+    return quantized_file
+
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """Loads the SentenceTransformer for `backend` ("torch", "onnx" or "onnx-int8")."""
+    # Deferred import: sentence_transformers pulls in torch, which is slow to import
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(EMBEDDING_MODEL)
+    if backend in ("onnx", "onnx-int8"):
+        onnx_file = export_onnx_model(quantize=backend == "onnx-int8")
+        return SentenceTransformer(onnx_model_dir(), backend="onnx", model_kwargs={"file_name": onnx_file})
+    raise ValueError(f"Unknown embedding backend '{backend}'. Use one of: {', '.join(EMBEDDING_BACKENDS)}.")
+
+
+def get_embedding_model():
+    """Returns the shared SentenceTransformer, loading it once in a thread-safe way."""
     global embedding_model
     if embedding_model is None:
-        embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        with _model_lock:
+            if embedding_model is None:
+                embedding_model = load_embedding_model()
+    return embedding_model
+
+
+def start_embedding_pool(num_workers: int = EMBEDDING_POOL_WORKERS) -> EmbeddingWorkerPool:
+    """
+    Starts the embedding worker processes (once) and routes get_text_embeddings
+    and get_query_embeddings through them, so this process never loads the model.
+    """
+    global embedding_pool
+    if embedding_pool is None:
+        with _model_lock:
+            if embedding_pool is None:
+                pool = EmbeddingWorkerPool(num_workers=num_workers)
+                pool.start(timeout=EMBEDDING_POOL_START_TIMEOUT)
+                embedding_pool = pool
+    return embedding_pool
+
+
+def stop_embedding_pool():
+    global embedding_pool
+    pool, embedding_pool = embedding_pool, None
+    if pool is not None:
+        pool.stop()
+
+
+def embedding_pool_stats() -> Optional[dict]:
+    return embedding_pool.stats() if embedding_pool is not None else None
+
 
-    embedding = embedding_model.encode(text)
+def get_text_embedding(text: str) -> list[float]:
+    """Generates a numerical embedding for a given text."""
+    key = (embedding_model_id(), normalize_query(text))
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_text_embeddings([text], num_workers=1)[0]
+        embedding_cache.set(key, np.asarray(embedding, dtype='float32'))
     return embedding.tolist() # Convert numpy array to list for easier handling
 
 
+def _cached_query_embeddings(queries: List[str]):
+    """Cache lookups for `queries`: the cached rows (None when missing) and the missing keys with their positions."""
+    keys = [(embedding_model_id(), normalize_query(query)) for query in queries]
+    cached = [embedding_cache.get(key) for key in keys]
+
+    # Encode each distinct missing query once, even if it repeats within the batch
+    missing = {}
+    for i, embedding in enumerate(cached):
+        if embedding is None:
+            missing.setdefault(keys[i], []).append(i)
+    return cached, missing
+
+
+def _fill_query_embeddings(cached: list, missing: dict, encoded: np.ndarray) -> np.ndarray:
+    for (key, positions), embedding in zip(missing.items(), encoded):
+        embedding_cache.set(key, embedding)
+        for i in positions:
+            cached[i] = embedding
+    return np.ascontiguousarray(np.vstack(cached), dtype='float32')
+
+
+def get_query_embeddings(queries: List[str]) -> np.ndarray:
+    """
+    Embeds a batch of queries, encoding only those missing from the embedding cache.
+    Returns a float32 matrix of shape (len(queries), dimension).
+    """
+    if not queries:
+        return get_text_embeddings([])
+    cached, missing = _cached_query_embeddings(queries)
+    encoded = get_text_embeddings([queries[positions[0]] for positions in missing.values()], num_workers=1) if missing else []
+    return _fill_query_embeddings(cached, missing, encoded)
+
+
+async def get_query_embeddings_async(queries: List[str]) -> np.ndarray:
+    """
+    get_query_embeddings for the event loop: with the embedding pool running the
+    missing queries are submitted to it without tying up a thread, otherwise
+    they are encoded in the default executor.
+    """
+    pool = embedding_pool
+    if pool is None:
+        return await asyncio.get_running_loop().run_in_executor(None, get_query_embeddings, queries)
+    if not queries:
+        return await pool.embed_async([])
+    cached, missing = _cached_query_embeddings(queries)
+    encoded = await pool.embed_async([queries[positions[0]] for positions in missing.values()]) if missing else []
+    return _fill_query_embeddings(cached, missing, encoded)
+
+
+class TextEmbeddingWorkers:
+    """
+    Worker processes for a bulk embedding job such as one index build.
+
+    The `num_workers` processes each load their own copy of the model, which
+    costs far more than encoding a single batch, so they are started on the
+    first call to embed() and reused for every later batch until close().
+    With one worker, or while the embedding pool is running, embed() is a
+    plain get_text_embeddings call and no processes are started.
+    """
+
+    def __init__(self, num_workers: int = EMBEDDING_NUM_WORKERS, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self._model = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self.num_workers <= 1 or embedding_pool is not None or not texts:
+            return get_text_embeddings(texts, batch_size=self.batch_size, num_workers=1)
+        with self._lock:
+            if self._pool is None:
+                self._model = get_embedding_model()
+                logger.info("Starting %d embedding worker processes...", self.num_workers)
+                self._pool = self._model.start_multi_process_pool(target_devices=["cpu"] * self.num_workers)
+            embeddings = self._model.encode_multi_process(texts, self._pool, batch_size=self.batch_size)
+        return np.ascontiguousarray(embeddings, dtype='float32')
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            if pool is not None:
+                self._model.stop_multi_process_pool(pool)
+
+    def __enter__(self) -> "TextEmbeddingWorkers":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_text_embeddings(
+    texts: List[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    num_workers: int = EMBEDDING_NUM_WORKERS,
+) -> np.ndarray:
+    """
+    Generates embeddings for many texts at once.
+
+    Texts are encoded in batches of `batch_size`. With `num_workers > 1` the
+    batches are spread over that many worker processes, each holding its own
+    copy of the model; the processes only live for this call, so jobs that
+    embed in several calls should share a TextEmbeddingWorkers instead. When
+    the embedding pool is running the texts go to its long-lived workers
+    instead and both arguments are ignored. Returns a contiguous float32
+    matrix of shape (len(texts), dimension).
+    """
+    pool = embedding_pool
+    if pool is not None:
+        return pool.embed(texts)
+
+    if num_workers > 1 and texts:
+        with TextEmbeddingWorkers(num_workers, batch_size) as workers:
+            return workers.embed(texts)
+
+    model = get_embedding_model()
+
+    if not texts:
+        dimension = model.get_sentence_embedding_dimension()
+        return np.empty((0, dimension), dtype='float32')
+
+    if EMBEDDING_NUM_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBEDDING_NUM_THREADS)
+
+    embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+    return np.ascontiguousarray(embeddings, dtype='float32')
+
+
 # from sentence_transformers import SentenceTransformer
 
 # embedding_model = SentenceTransformer("BAAI/bge-m3")
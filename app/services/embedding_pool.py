@@ -0,0 +1,425 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import wait as wait_connections
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_POOL_WORKERS,
+    EMBEDDING_POOL_MAX_BATCH,
+    EMBEDDING_POOL_BATCH_WAIT_MS,
+    EMBEDDING_POOL_MAX_PENDING,
+    EMBEDDING_POOL_THREADS,
+    EMBEDDING_POOL_REQUEST_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingPoolError(RuntimeError):
+    """Raised when the worker pool cannot serve a request (not started, stopped or a worker failed)."""
+
+
+def _worker_main(worker_id: int, backend: str, requests, results, max_batch: int, batch_wait: float, num_threads: int):
+    """
+    Worker process: loads the model once, then repeatedly takes a request,
+    keeps taking more for up to `batch_wait` seconds (or until `max_batch`
+    texts), encodes them in one call and sends each request its rows back.
+    """
+    try:
+        if num_threads > 0:
+            import torch
+            torch.set_num_threads(num_threads)
+        # Imported here so only the worker processes load sentence_transformers
+        from app.services.embedding import load_embedding_model
+
+        model = load_embedding_model(backend)
+        results.send(("ready", model.get_sentence_embedding_dimension()))
+    except Exception as e:
+        results.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+
+    stopping = False
+    while not stopping:
+        request = requests.get()
+        if request is None:
+            return
+        batch = [request]
+        size = len(request[1])
+        deadline = time.monotonic() + batch_wait
+        while size < max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True  # Stop after this batch
+                break
+            batch.append(request)
+            size += len(request[1])
+
+        texts = [text for _, request_texts in batch for text in request_texts]
+        try:
+            embeddings = np.ascontiguousarray(
+                model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True), dtype='float32'
+            )
+        except Exception as e:
+            for request_id, _ in batch:
+                results.send(("error", request_id, f"{type(e).__name__}: {e}"))
+            continue
+        offset = 0
+        for request_id, request_texts in batch:
+            results.send(("result", request_id, embeddings[offset:offset + len(request_texts)]))
+            offset += len(request_texts)
+
+
+class EmbeddingWorkerPool:
+    """
+    Embedding service running in `num_workers` separate processes.
+
+    Each worker holds the model once and has its own request queue and result
+    pipe. Requests go to the ready worker with the least outstanding work,
+    and a worker coalesces requests that arrive within `batch_wait_ms` into one
+    encode call of up to `max_batch` texts. Large inputs are split into
+    `max_batch`-sized requests spread over the workers. At most `max_pending`
+    requests are queued or running, and submitting blocks beyond that, so
+    memory stays bounded under load.
+
+    The pool tracks which requests each worker holds. A worker that dies after
+    startup (OOM kill, segfault) is respawned and its requests are resubmitted
+    once; a request lost in two crashes fails instead of crashing workers
+    forever. Callers also give up after `request_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = EMBEDDING_POOL_WORKERS,
+        backend: str = EMBEDDING_BACKEND,
+        max_batch: int = EMBEDDING_POOL_MAX_BATCH,
+        batch_wait_ms: float = EMBEDDING_POOL_BATCH_WAIT_MS,
+        max_pending: int = EMBEDDING_POOL_MAX_PENDING,
+        threads_per_worker: int = EMBEDDING_POOL_THREADS,
+        request_timeout: float = EMBEDDING_POOL_REQUEST_TIMEOUT,
+    ):
+        self.num_workers = max(1, num_workers)
+        self.backend = backend
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.threads_per_worker = threads_per_worker
+        self.request_timeout = request_timeout
+        self.dimension: Optional[int] = None
+        self._ctx = multiprocessing.get_context("spawn")
+        # Per worker: process, request queue, result pipe and the ids of the requests it holds
+        self._processes: List = [None] * self.num_workers
+        self._requests: List = [None] * self.num_workers
+        self._results: List = [None] * self.num_workers
+        self._assigned: List[Set[int]] = [set() for _ in range(self.num_workers)]
+        self._ready_workers: Set[int] = set()
+        self._retired: Set[int] = set()  # Workers that failed to start; not respawned
+        self._listener: Optional[threading.Thread] = None
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        # request id -> [future, texts, worker, attempts]; a request leaves it when resolved or abandoned
+        self._pending: Dict[int, list] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = threading.Event()
+        self._running = False
+        self.restarts = 0
+        self.failure: Optional[str] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self, timeout: Optional[float] = None):
+        """Spawns the workers and waits until the first one has loaded the model."""
+        if self._running:
+            return
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+        self._running = True
+        self._listener = threading.Thread(target=self._listen, name="embedding-pool-results", daemon=True)
+        self._listener.start()
+        if not self._ready.wait(timeout):
+            self.stop()
+            raise EmbeddingPoolError("Embedding workers did not start in time.")
+        if self.failure and self.dimension is None:
+            self.stop()
+            raise EmbeddingPoolError(f"Embedding workers failed to start: {self.failure}")
+        logger.info("Embedding pool started with %d workers (%s backend).", self.num_workers, self.backend)
+
+    def _spawn(self, worker_id: int):
+        requests = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.backend, requests, writer, self.max_batch, self.batch_wait, self.threads_per_worker),
+            name=f"embedding-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        writer.close()  # Only the worker writes; the reader then sees EOF when it dies
+        self._processes[worker_id] = process
+        self._requests[worker_id] = requests
+        self._results[worker_id] = reader
+
+    def stop(self):
+        """Stops the workers and fails requests still pending."""
+        if not self._running:
+            return
+        self._running = False
+        for worker_id, process in enumerate(self._processes):
+            if process.is_alive():
+                self._requests[worker_id].put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._fail_pending("Embedding pool stopped.")
+        self._ready.set()
+
+    def _listen(self):
+        while self._running:
+            live = {self._results[i]: i for i in range(self.num_workers) if i not in self._retired}
+            if not live:
+                self.failure = self.failure or "All embedding workers exited."
+                self._fail_pending(self.failure)
+                self._ready.set()
+                return
+            for conn in wait_connections(list(live), timeout=0.5):
+                worker_id = live[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    if self._running:
+                        self._worker_exited(worker_id)
+                    continue
+                self._handle(worker_id, message)
+
+    def _handle(self, worker_id: int, message: tuple):
+        kind = message[0]
+        if kind == "ready":
+            self.dimension = message[1]
+            self._ready_workers.add(worker_id)
+            self._ready.set()
+            return
+        if kind == "failed":
+            logger.error("Embedding worker %d failed to start: %s", worker_id, message[1])
+            self.failure = message[1]
+            return  # The worker exits next; _worker_exited retires it
+        _, request_id, payload = message
+        with self._pending_lock:
+            self._assigned[worker_id].discard(request_id)
+            entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return  # Abandoned by a caller that timed out
+        self._slots.release()
+        if kind == "result":
+            entry[0].set_result(payload)
+        else:
+            entry[0].set_exception(EmbeddingPoolError(payload))
+
+    def _worker_exited(self, worker_id: int):
+        """Respawns a worker that died after startup and resubmits the requests it held."""
+        process = self._processes[worker_id]
+        process.join(timeout=1)
+        self._results[worker_id].close()
+        # Under the lock, so no request is dispatched to the dead worker's queue meanwhile
+        with self._pending_lock:
+            self._requests[worker_id].cancel_join_thread()
+            self._requests[worker_id].close()
+            lost, self._assigned[worker_id] = self._assigned[worker_id], set()
+            if worker_id in self._ready_workers:
+                self._ready_workers.discard(worker_id)
+                self._spawn(worker_id)
+                self.restarts += 1
+            else:
+                self._retired.add(worker_id)
+        if worker_id not in self._retired:
+            logger.error(
+                "Embedding worker %d exited (code %s) holding %d requests; respawned it.",
+                worker_id, process.exitcode, len(lost),
+            )
+        for request_id in lost:
+            self._retry(request_id)
+
+    def _retry(self, request_id: int):
+        """Resubmits a request lost with a crashed worker, or fails it if it was lost before."""
+        with self._pending_lock:
+            entry = self._pending.get(request_id)
+            if entry is None:
+                return
+            if entry[3] < 1 and len(self._retired) < self.num_workers:
+                entry[3] += 1
+                self._dispatch(request_id, entry)
+                return
+            del self._pending[request_id]
+        self._slots.release()
+        entry[0].set_exception(EmbeddingPoolError("Embedding workers crashed while encoding this request."))
+
+    def _dispatch(self, request_id: int, entry: list):
+        """Queues a request on the ready worker holding the fewest requests; needs _pending_lock."""
+        candidates = [i for i in self._ready_workers if i not in self._retired] or [
+            i for i in range(self.num_workers) if i not in self._retired
+        ]
+        worker_id = min(candidates, key=lambda i: len(self._assigned[i]))
+        entry[2] = worker_id
+        self._assigned[worker_id].add(request_id)
+        self._requests[worker_id].put((request_id, entry[1]))
+
+    def _fail_pending(self, reason: str):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            for assigned in self._assigned:
+                assigned.clear()
+        for entry in pending.values():
+            self._slots.release()
+            if not entry[0].done():
+                entry[0].set_exception(EmbeddingPoolError(reason))
+
+    def _abandon(self, futures: List[Future]):
+        """Drops the still-pending requests of `futures` (after a timeout), freeing their slots."""
+        futures = set(futures)
+        with self._pending_lock:
+            abandoned = [request_id for request_id, entry in self._pending.items() if entry[0] in futures]
+            for request_id in abandoned:
+                entry = self._pending.pop(request_id)
+                self._assigned[entry[2]].discard(request_id)
+        for _ in abandoned:
+            self._slots.release()
+
+    def _submit_one(self, texts: List[str]) -> Future:
+        """Queues one request; the caller holds a pending slot for it."""
+        future = Future()
+        # A running future cannot be cancelled (e.g. by a cancelled asyncio wrapper), so
+        # resolving it from the listener thread never fails; callers abandon it instead
+        future.set_running_or_notify_cancel()
+        request_id = next(self._ids)
+        with self._pending_lock:
+            if not self._running:
+                self._slots.release()
+                raise EmbeddingPoolError(self.failure or "Embedding pool is not running.")
+            entry = [future, list(texts), None, 0]
+            self._pending[request_id] = entry
+            self._dispatch(request_id, entry)
+        return future
+
+    def submit(self, texts: List[str], timeout: Optional[float] = None) -> List[Future]:
+        """
+        Queues `texts` in max_batch-sized requests, blocking while the pool is
+        saturated for at most `timeout` seconds (None waits indefinitely).
+        If queueing fails part-way, the requests already queued are abandoned.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = []
+        try:
+            for start in range(0, len(texts), self.max_batch):
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                if not self._slots.acquire(timeout=remaining):
+                    raise self._timeout_error(timeout)
+                futures.append(self._submit_one(texts[start:start + self.max_batch]))
+        except BaseException:
+            self._abandon(futures)
+            raise
+        return futures
+
+    async def _acquire_slot_async(self, deadline: float) -> bool:
+        """
+        Takes a pending slot without blocking the event loop; False once
+        `deadline` (time.monotonic) passes. Waits in short timed acquires on
+        the default executor, and a slot taken by an acquire whose waiter was
+        cancelled meanwhile is given back.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._slots.acquire(blocking=False):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            acquire = loop.run_in_executor(None, self._slots.acquire, True, min(remaining, 0.1))
+            try:
+                if await asyncio.shield(acquire):
+                    return True
+            except asyncio.CancelledError:
+                acquire.add_done_callback(
+                    lambda done: self._slots.release() if not done.cancelled() and done.result() else None
+                )
+                raise
+        return True
+
+    def _empty(self) -> np.ndarray:
+        return np.empty((0, self.dimension or 0), dtype='float32')
+
+    def _timeout_error(self, timeout: float) -> EmbeddingPoolError:
+        return EmbeddingPoolError(f"Embedding request timed out after {timeout:.1f}s.")
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Blocking embed through the pool; returns a float32 (len(texts), dimension)
+        matrix. Raises EmbeddingPoolError after `timeout` seconds (default: request_timeout).
+        """
+        if not texts:
+            return self._empty()
+        timeout = timeout or self.request_timeout
+        deadline = time.monotonic() + timeout
+        futures = self.submit(texts, timeout)
+        try:
+            parts = [future.result(timeout=max(deadline - time.monotonic(), 0.0)) for future in futures]
+        except FutureTimeoutError:
+            self._abandon(futures)
+            raise self._timeout_error(timeout)
+        return np.ascontiguousarray(np.vstack(parts), dtype='float32')
+
+    async def embed_async(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Event-loop friendly embed: waits for pool capacity and results without
+        blocking the loop. On timeout or cancellation every request it queued
+        is abandoned, so no pending slot outlives the call.
+        """
+        if not texts:
+            return self._empty()
+        timeout = timeout or self.request_timeout
+        deadline = time.monotonic() + timeout
+        futures = []
+        try:
+            for start in range(0, len(texts), self.max_batch):
+                if not await self._acquire_slot_async(deadline):
+                    raise self._timeout_error(timeout)
+                futures.append(self._submit_one(texts[start:start + self.max_batch]))
+            waiting = [asyncio.wrap_future(future) for future in futures]
+            _, not_done = await asyncio.wait(
+                waiting, timeout=max(deadline - time.monotonic(), 0.0), return_when=asyncio.FIRST_EXCEPTION
+            )
+            failed = next((w for w in waiting if w.done() and w.exception() is not None), None)
+            if failed is not None:
+                raise failed.exception()
+            if not_done:
+                raise self._timeout_error(timeout)
+            parts = [w.result() for w in waiting]
+        except BaseException:
+            self._abandon(futures)
+            raise
+        return np.ascontiguousarray(np.vstack(parts), dtype='float32')
+
+    def stats(self) -> Dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "workers": self.num_workers,
+            "alive": sum(process.is_alive() for process in self._processes if process is not None),
+            "pending_requests": pending,
+            "restarts": self.restarts,
+            "backend": self.backend,
+            "failure": self.failure,
+        }
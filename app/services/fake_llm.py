@@ -0,0 +1,21 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from app.core.config import FAKE_LLM_TOKEN_DELAY_MS
+
+# Canned answer streamed by the fake backend, one token at a time
+FAKE_ANSWER_TOKENS = ["This ", "is ", "a ", "canned ", "answer ", "from ", "the ", "local ", "fake ", "LLM."]
+
+
+async def fake_stream_answer(
+    prompt: str,
+    tokens: Optional[List[str]] = None,
+    token_delay_ms: float = FAKE_LLM_TOKEN_DELAY_MS,
+) -> AsyncIterator[str]:
+    """
+    Stands in for the LLM: streams `tokens` (default FAKE_ANSWER_TOKENS) with
+    a fixed delay between them, without any network access.
+    """
+    for token in tokens or FAKE_ANSWER_TOKENS:
+        await asyncio.sleep(token_delay_ms / 1000.0)
+        yield token
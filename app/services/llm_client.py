@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.core.config import (
+    GEMINI_API_KEY,
+    LLM_BACKEND,
+    LLM_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TIMEOUT,
+    LLM_COALESCE_REQUESTS,
+    LLM_STUB_URL,
+)
+from app.services.fake_llm import fake_stream_answer
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend:
+    """Interface of an upstream LLM. Backends are long-lived and shared by all requests."""
+
+    name = "base"
+
+    async def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether `error` is transient (rate limit, unavailable, timeout) and worth retrying."""
+        return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = LLM_MODEL, api_key: Optional[str] = GEMINI_API_KEY):
+        import google.generativeai as genai
+
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found. Please set it in your environment variables or a .env file.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _messages(prompt: str):
+        return [{"role": "user", "parts": [{"text": prompt}]}]
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(self._messages(prompt))
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(self._messages(prompt), stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def is_retryable(self, error: Exception) -> bool:
+        from google.api_core import exceptions as google_exceptions
+
+        retryable = (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )
+        return isinstance(error, retryable) or super().is_retryable(error)
+
+
+class FakeBackend(LLMBackend):
+    """In-process stand-in that streams canned tokens."""
+
+    name = "fake"
+
+    async def generate(self, prompt: str) -> str:
+        return "".join([token async for token in fake_stream_answer(prompt)])
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async for token in fake_stream_answer(prompt):
+            yield token
+
+
+class HTTPBackend(LLMBackend):
+    """
+    Talks to a local LLM stub server (see app/scripts/fake_llm_server.py):
+    POST {base_url}/generate -> {"text": ...}
+    POST {base_url}/stream   -> NDJSON lines {"text": ...}
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = LLM_STUB_URL):
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=None)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.client.post("/generate", json={"prompt": prompt})
+        response.raise_for_status()
+        return response.json()["text"]
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self.client.stream("POST", "/stream", json={"prompt": prompt}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)["text"]
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError) or super().is_retryable(error)
+
+
+class LLMClient:
+    """
+    Shared client in front of an LLMBackend.
+
+    - at most `max_concurrency` upstream calls run at once
+    - retryable errors are retried up to `max_retries` times with exponential
+      backoff and full jitter
+    - each attempt is bounded by `timeout` seconds
+    - concurrent `generate` calls with an identical prompt share one upstream
+      call, unless `coalesce` is off (e.g. for load tests)
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY,
+        retry_max_delay: float = LLM_RETRY_MAX_DELAY,
+        timeout: float = LLM_TIMEOUT,
+        coalesce: bool = LLM_COALESCE_REQUESTS,
+    ):
+        self.backend = backend
+        self.coalesce = coalesce
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.upstream_calls = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    async def _generate_with_retries(self, prompt: str) -> str:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.upstream_calls += 1
+                    return await asyncio.wait_for(self.backend.generate(prompt), self.timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.backend.is_retryable(e):
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.retries += 1
+                logger.warning("Retryable LLM error (%s: %s); retry %d/%d in %.2fs", type(e).__name__, e, attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
+
+    async def generate(self, prompt: str) -> str:
+        """Returns the full completion for `prompt`."""
+        if not self.coalesce:
+            return await self._generate_with_retries(prompt)
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_with_retries(prompt))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield the shared call so one caller giving up does not cancel it for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yields the completion piece by piece. Retries only happen before the
+        first piece is delivered; the timeout bounds the wait for each piece.
+        """
+        attempt = 0
+        while True:
+            delivered = False
+            try:
+                async with self._semaphore:
+                    self.upstream_calls += 1
+                    upstream = self.backend.stream(prompt)
+                    try:
+                        while True:
+                            try:
+                                token = await asyncio.wait_for(upstream.__anext__(), self.timeout)
+                            except StopAsyncIteration:
+                                return
+                            delivered = True
+                            yield token
+                    finally:
+                        await upstream.aclose()
+            except Exception as e:
+                if delivered or attempt >= self.max_retries or not self.backend.is_retryable(e):
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.retries += 1
+                logger.warning("Retryable LLM error (%s: %s); retry %d/%d in %.2fs", type(e).__name__, e, attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "backend": self.backend.name,
+            "upstream_calls": self.upstream_calls,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+# backend name -> factory; register new backends here
+LLM_BACKENDS = {
+    "gemini": GeminiBackend,
+    "fake": FakeBackend,
+    "http": HTTPBackend,
+}
+
+
+def create_llm_client(backend_name: str = LLM_BACKEND) -> LLMClient:
+    if backend_name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend_name}'. Available: {', '.join(LLM_BACKENDS)}.")
+    return LLMClient(LLM_BACKENDS[backend_name]())
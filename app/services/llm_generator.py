@@ -3,33 +3,58 @@
 
 
 
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional
+import logging
+import threading
+import time
 
+from app.services.llm_client import LLMClient, create_llm_client
+from app.services.context_packer import pack_context, pack_history, message_text, estimate_tokens
+from app.utils.metrics import span, PROMPT_TOKENS, LLM_TIME_TO_FIRST_TOKEN
 
-print(f"DEBUG: llm_model.py is running from: {os.path.abspath(__file__)}")
-# Load environment variables from .env file
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found. Please set it in your environment variables or a .env file.")
+# Long-lived client shared by all requests (backend selected by LLM_BACKEND).
+# Created on first use, so a missing GEMINI_API_KEY surfaces as a readiness
+# failure instead of breaking the import.
+llm_client = None
+_client_lock = threading.Lock()
 
-genai.configure(api_key=GEMINI_API_KEY)
 
-async def generate_answer_with_context(
-    question: str,
-    context_chunks: List[str],
-    chat_history: List[Dict[str, Any]] = None  # Will ignore for now
-) -> str:
-    model = genai.GenerativeModel('gemini-2.5-flash')
+def get_llm_client() -> LLMClient:
+    global llm_client
+    if llm_client is None:
+        with _client_lock:
+            if llm_client is None:
+                llm_client = create_llm_client()
+    return llm_client
 
-    context_text = "\n".join(context_chunks or [])
+FALLBACK_ANSWER = "Sorry, I am unable to generate an answer at this moment. Please try again later."
+
+def format_history(chat_history: Optional[List[Dict[str, Any]]]) -> str:
+    """Renders the windowed chat history (see pack_history) as "User:/Assistant:" lines."""
+    lines = []
+    for message in pack_history(chat_history or []):
+        speaker = "User" if message.get("role") == "user" else "Assistant"
+        lines.append(f"{speaker}: {message_text(message)}")
+    return "\n".join(lines)
+
+
+def build_rag_prompt(question: str, context_chunks: List[str], chat_history: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Builds the RAG prompt sent to the LLM from the question and retrieved chunks.
+    Overlapping chunks are merged and the context is capped at CONTEXT_TOKEN_BUDGET;
+    recent chat history, capped at SESSION_HISTORY_TOKEN_BUDGET, lets follow-up
+    questions refer to earlier turns.
+    """
+    context_text = "\n".join(pack_context(context_chunks or []))
+    history_text = format_history(chat_history)
+    history_section = f"""
+    Conversation so far (use it to resolve follow-up questions):
+    {history_text}
+""" if history_text else ""
 
-    
     rag_prompt = f"""
     You are an advanced multilingual AI assistant designed to help users understand complex ideas from educational documents.
       You are given contextual text extracted from an academic paper (e.g., high school Bangla 1st Paper). 
@@ -56,7 +81,7 @@ You must:
 - Provide a well-formed, thoughtful, focused answer, most preferable one or two word answer in the **same language** as the question.
 
 ---
-
+{history_section}
     Context:
     {context_text}
 
@@ -64,15 +89,62 @@ You must:
 
     Answer:
     """
+    return rag_prompt
+
+
+def _build_prompt(
+    question: str,
+    context_chunks: List[str],
+    chat_history: Optional[List[Dict[str, Any]]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> str:
+    with span("prompt_build", timings):
+        rag_prompt = build_rag_prompt(question, context_chunks, chat_history)
+    PROMPT_TOKENS.observe(estimate_tokens(rag_prompt))
+    return rag_prompt
 
-    # Ignore chat_history and send only current user message
-    messages = [{"role": "user", "parts": [{"text": rag_prompt}]}]
+
+async def generate_answer_with_context(
+    question: str,
+    context_chunks: List[str],
+    chat_history: List[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, float]] = None,
+    fallback: bool = True,
+) -> str:
+    """
+    Generates an answer from the retrieved context and the recent `chat_history`
+    ({"role", "parts"} messages, windowed by pack_history). If `timings` is given,
+    the seconds spent building the prompt and waiting for the LLM are added to it.
+    LLM errors return FALLBACK_ANSWER, or are raised if `fallback` is False.
+    """
+    rag_prompt = _build_prompt(question, context_chunks, chat_history, timings)
 
     try:
-        response = await model.generate_content_async(messages)
-        return response.text
+        with span("llm", timings):
+            return await get_llm_client().generate(rag_prompt)
     except Exception as e:
-        print(f"Error generating content from Gemini API: {e}")
-        return "Sorry, I am unable to generate an answer at this moment. Please try again later."
+        logger.error("Error generating content from LLM: %s", e)
+        if not fallback:
+            raise
+        return FALLBACK_ANSWER
 
 
+async def stream_answer_with_context(
+    question: str,
+    context_chunks: List[str],
+    chat_history: List[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Yields the answer text piece by piece as the LLM generates it.
+    Closing the generator early stops reading from the upstream stream.
+    """
+    rag_prompt = _build_prompt(question, context_chunks, chat_history)
+
+    start = time.perf_counter()
+    first = True
+    with span("llm_stream"):
+        async for token in get_llm_client().stream(rag_prompt):
+            if first:
+                LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start)
+                first = False
+            yield token
@@ -0,0 +1,130 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.core.config import RETRIEVAL_BATCH_WINDOW_MS, RETRIEVAL_MAX_BATCH_SIZE
+from app.services.retriever import RetrievedChunk, retrieve_relevant_chunks_batch
+from app.utils.metrics import RETRIEVAL_BATCH_SIZE
+
+
+class RetrievalScheduler:
+    """
+    Collects concurrent retrieval requests into micro-batches.
+
+    Questions arriving within `window_ms` of the first one (or until
+    `max_batch_size` is reached) are embedded in one forward pass and searched
+    with one multi-query FAISS call. The window only applies under
+    concurrency, i.e. when other questions queued up while the previous batch
+    ran; a lone question at low load is dispatched at once. The CPU-bound work
+    runs in a thread so the event loop keeps serving other requests.
+    """
+
+    def __init__(self, max_batch_size: int = RETRIEVAL_MAX_BATCH_SIZE, window_ms: float = RETRIEVAL_BATCH_WINDOW_MS):
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Starts the background batching task on the running event loop."""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the batching task and fails any requests still queued."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, _, _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Retrieval scheduler stopped."))
+
+    async def retrieve(
+        self,
+        query: str,
+        k: int = 3,
+        doc_ids: Optional[List[str]] = None,
+        timings: Optional[Dict[str, float]] = None,
+        with_sources: bool = False,
+    ) -> Union[List[str], List[RetrievedChunk]]:
+        """
+        Queues a question and waits for its top-k chunks, optionally only from
+        `doc_ids`; with `with_sources`, as RetrievedChunk tuples with their
+        document and page range. If `timings` is given it receives the seconds
+        this request spent queued and its batch spent embedding and searching.
+        """
+        if self._worker is None or self._worker.done():
+            self.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        future = loop.create_future()
+        await self._queue.put((query, k, doc_ids, timings, future))
+        chunks = await future
+        if timings is not None:
+            work = timings.get("embed", 0.0) + timings.get("search", 0.0)
+            timings["queue"] = max(0.0, loop.time() - start - work)
+        return chunks if with_sources else [chunk.text for chunk in chunks]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # Nothing else waiting: no point holding a lone request for the window
+            deadline = loop.time() + self.window if len(batch) > 1 else loop.time()
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[Tuple[str, int, Optional[List[str]], Optional[Dict[str, float]], asyncio.Future]]):
+        # Callers that gave up while waiting are dropped from the batch
+        batch = [item for item in batch if not item[4].done()]
+        if not batch:
+            return
+
+        # One batched retrieval per document scope
+        groups: Dict[Optional[Tuple[str, ...]], list] = {}
+        for item in batch:
+            doc_ids = item[2]
+            groups.setdefault(tuple(doc_ids) if doc_ids is not None else None, []).append(item)
+
+        loop = asyncio.get_running_loop()
+        for scope, items in groups.items():
+            queries = [query for query, _, _, _, _ in items]
+            max_k = max(k for _, k, _, _, _ in items)
+            doc_ids = list(scope) if scope is not None else None
+            batch_timings: Dict[str, float] = {}
+            RETRIEVAL_BATCH_SIZE.observe(len(items))
+            try:
+                results = await loop.run_in_executor(
+                    None, retrieve_relevant_chunks_batch, queries, max_k, doc_ids, batch_timings, True
+                )
+            except Exception as e:
+                for _, _, _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, k, _, timings, future), chunks in zip(items, results):
+                if timings is not None:
+                    timings.update(batch_timings)
+                if not future.done():
+                    future.set_result(chunks[:k])
+
+
+# Global scheduler used by the /chat endpoint
+retrieval_scheduler = RetrievalScheduler()
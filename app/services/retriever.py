@@ -1,72 +1,657 @@
-from typing import List
-from app.services.embedding import get_text_embedding
-from app.scripts.vector_store import InMemoryVectorStore
-from app.utils.data_preprocess import chunk_text, clean_text
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import (
+    RESULTS_CACHE_SIZE,
+    RESULTS_CACHE_TTL,
+    EMBEDDING_STREAM_BATCH_SIZE,
+    CORPUS_INDEX_DIR,
+    CORPUS_BUILD_WORKERS,
+    CORPUS_SEARCH_WORKERS,
+    CHUNKER,
+    CHUNK_SIZE_UNIT,
+)
+from app.services.embedding import TextEmbeddingWorkers, get_text_embeddings, get_query_embeddings, embedding_model_id
+from app.scripts.vector_store import InMemoryVectorStore, IndexManifestError, chunk_hash
+from app.scripts.chunk_cache import ChunkEmbeddingCache
+from app.utils.data_preprocess import PageChunk, iter_text_file_chunks, iter_text_file_sentence_chunks
+from app.services.context_packer import estimate_tokens
+from app.utils.cache import QueryCache, normalize_query
+from app.utils.metrics import span
 
+import glob
+import hashlib
+import heapq
+import logging
 import os
+import threading
+import time
+import numpy as np
 
-# Global instance of the vector store (used by main.py and elsewhere)
+logger = logging.getLogger(__name__)
+
+# Vector store of the default text file, loaded at startup; reloads replace it
+# in the corpus with a freshly built store instead of modifying it
 rag_vector_store = InMemoryVectorStore()
 
+# Serializes initialization when several threads (startup, warmup, first request) race
+_init_lock = threading.Lock()
 
-def initialize_retriever_from_text(text_path: str, chunk_size: int = 1000, chunk_overlap: int = 200, index_path: str = "rag_index"):
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _embed_batch(workers: TextEmbeddingWorkers, hashes: List[str], texts: List[str]):
+    with span("embed_corpus"):
+        return hashes, workers.embed(texts)
+
+
+def sync_index_with_chunks(
+    store: InMemoryVectorStore,
+    chunks: Iterable[Union[str, PageChunk]],
+    index_path: str,
+    manifest: dict,
+    stream_batch_size: int = EMBEDDING_STREAM_BATCH_SIZE,
+    chunk_cache_path: Optional[str] = None,
+    reuse_embeddings: bool = True,
+):
     """
-    Initializes the RAG retriever from a plain text file (already extracted),
-    chunks it, embeds the chunks, and stores the embeddings in a vector index.
+    Brings `store` in line with `chunks`, embedding only chunks whose content
+    hash is not in the persistent chunk embedding cache. Removed chunks are
+    dropped and new ones added to the built index in place (falling back to a
+    rebuild from cached embeddings when the backend cannot remove vectors),
+    then the index and cache are saved. PageChunk items also record their
+    page range in the store; a chunk whose text is unchanged but whose pages
+    moved is re-added from the cache with its new pages.
+
+    `chunks` may be a generator: uncached chunks are embedded on a background
+    thread in batches of `stream_batch_size` while the rest are still being
+    read, so embedding overlaps with reading and chunking the source. With
+    EMBEDDING_NUM_WORKERS > 1 the batches are spread over that many worker
+    processes, started once for the whole run.
+
+    The chunk embedding cache lives at `{index_path}.chunks.npz` unless
+    `chunk_cache_path` points elsewhere (e.g. shared by indexes over the same chunks).
+    With `reuse_embeddings` False the cache is ignored and overwritten, so
+    every chunk is embedded afresh.
     """
-    print("Initializing RAG retriever from text...")
+    cache = ChunkEmbeddingCache(chunk_cache_path or f"{index_path}.chunks.npz", embedding_model_id())
+    if reuse_embeddings:
+        cache.load()
+    if store.is_built and reuse_embeddings:
+        # Embeddings already in the loaded index never need recomputing
+        cache.add_many((chunk_hash(doc) for doc in store.documents), store.chunk_embeddings)
+
+    start = time.perf_counter()
+    chunk_list, hashes, pages = [], [], []
+    pending = {}  # hash -> chunk, waiting for the next batch
+    submitted = set()
+    futures = []
+    with TextEmbeddingWorkers() as workers, ThreadPoolExecutor(max_workers=1) as executor:
+        for chunk in chunks:
+            if isinstance(chunk, PageChunk):
+                chunk, page_range = chunk.text, (chunk.page, chunk.page_end)
+            else:
+                page_range = (None, None)
+            h = chunk_hash(chunk)
+            chunk_list.append(chunk)
+            hashes.append(h)
+            pages.append(page_range)
+            if h in cache or h in pending or h in submitted:
+                continue
+            pending[h] = chunk
+            if len(pending) >= stream_batch_size:
+                futures.append(executor.submit(_embed_batch, workers, list(pending.keys()), list(pending.values())))
+                submitted.update(pending)
+                pending = {}
+        if pending:
+            futures.append(executor.submit(_embed_batch, workers, list(pending.keys()), list(pending.values())))
+            submitted.update(pending)
+        for future in futures:
+            cache.add_many(*future.result())
+    chunks = chunk_list
+    logger.info("✅ Generated %d text chunks.", len(chunks))
+
+    if submitted:
+        elapsed = time.perf_counter() - start
+        throughput = len(submitted) / elapsed if elapsed > 0 else float("inf")
+        logger.info(
+            "✅ Embedded %d new or changed chunks (%d reused from cache) in %.2fs (%.1f chunks/sec).",
+            len(submitted), len(chunks) - len(submitted), elapsed, throughput,
+        )
+    else:
+        logger.info("✅ All %d chunk embeddings reused from cache.", len(chunks))
+
+    if store.supports_in_place_update:
+        # Multiset diff between the indexed chunks and the new ones, by content hash and page range
+        keys = list(zip(hashes, pages))
+        wanted = Counter(keys)
+        remove_ids = []
+        for position, (doc_id, doc) in enumerate(zip(store.ids, store.documents)):
+            key = (chunk_hash(doc), store.page_range(position))
+            if wanted[key] > 0:
+                wanted[key] -= 1
+            else:
+                remove_ids.append(int(doc_id))
+        added_hashes, added_chunks, added_pages = [], [], []
+        for key, chunk in zip(keys, chunks):
+            if wanted[key] > 0:
+                wanted[key] -= 1
+                added_hashes.append(key[0])
+                added_chunks.append(chunk)
+                added_pages.append(key[1])
+        added_embeddings = cache.matrix(added_hashes) if added_hashes else np.empty((0, store.chunk_embeddings.shape[1]), dtype='float32')
+        store.update_documents(remove_ids, added_chunks, added_embeddings, added_pages)
+    else:
+        store.clear()
+        store.add_documents(chunks, cache.matrix(hashes), pages)
+        store.build_index()
+
+    store.save_index(index_path, manifest=manifest)
+    cache.retain(hashes)
+    cache.save()
+
+
+def build_store_from_text(
+    store: InMemoryVectorStore,
+    text_path: str,
+    index_path: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    chunk_cache_path: Optional[str] = None,
+    chunker: str = CHUNKER,
+    size_unit: str = CHUNK_SIZE_UNIT,
+    rebuild: bool = False,
+):
+    """
+    Loads `store` from the index saved at `index_path`, or builds it from a
+    plain text file (already extracted): chunks it with `chunker`
+    ("recursive" or "sentence", sized in `size_unit`), embeds the chunks, and
+    stores the embeddings in a vector index.
+
+    A saved index is served as-is only if it was built from the same source
+    file (by SHA-256); otherwise it is updated incrementally, re-embedding
+    only the chunks that changed. With `rebuild`, the saved index and chunk
+    embedding cache are ignored and the index is rebuilt from scratch (e.g.
+    to recover from a corrupt index).
+    """
+    # Build settings recorded in the index manifest; a saved index built with
+    # different settings (e.g. another embedding model) is never served.
+    build_manifest = {"model_name": embedding_model_id(), "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+    if chunker != "recursive":
+        build_manifest.update(chunker=chunker, chunk_size_unit=size_unit)
 
     # Load existing index if available
-    rag_vector_store.load_index(index_path)
+    if rebuild:
+        store.clear()
+    else:
+        try:
+            store.load_index(index_path, expected_manifest=build_manifest)
+        except IndexManifestError as e:
+            logger.warning("⚠️ Ignoring saved index: %s", e)
+
+    try:
+        source_hash = _file_sha256(text_path)
+    except FileNotFoundError:
+        logger.error("❌ Text file not found at %s.", text_path)
+        raise
+
+    manifest = store.manifest or {}
+    if store.is_built and store.documents and manifest.get("source_hash") == source_hash:
+        logger.info("✅ Index for '%s' loaded from saved index.", text_path)
+        return
+
+    if rebuild:
+        logger.info("Rebuilding the index for '%s' from scratch...", text_path)
+    elif store.is_built:
+        logger.info("Source text changed since the index was built. Updating index incrementally...")
+    else:
+        logger.info("Index not found or empty. Building new index from text...")
+
+    try:
+        # ✅ Read, clean and chunk the text as a stream; chunks are embedded as they arrive
+        if chunker == "sentence":
+            length_function = estimate_tokens if size_unit == "tokens" else len
+            chunks = iter_text_file_sentence_chunks(
+                text_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function
+            )
+        elif chunker == "recursive":
+            chunks = iter_text_file_chunks(text_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        else:
+            raise ValueError(f"Unknown chunker '{chunker}'. Use 'recursive' or 'sentence'.")
+        sync_index_with_chunks(
+            store, chunks, index_path, {**build_manifest, "source_hash": source_hash},
+            chunk_cache_path=chunk_cache_path, reuse_embeddings=not rebuild,
+        )
+
+        logger.info("✅ Index for '%s' built and saved.", text_path)
+
+    except Exception as e:
+        logger.error("❌ Error while building the index for '%s': %s", text_path, e)
+        raise
+
+
+class RetrievedChunk(NamedTuple):
+    """A search result: the chunk text, its document id and page range (None where the chunker does not track pages)."""
+    text: str
+    document: str
+    page: Optional[int] = None
+    page_end: Optional[int] = None
+
+    def source(self) -> Dict[str, Any]:
+        return {"document": self.document, "page": self.page, "page_end": self.page_end}
+
+
+class UnknownDocumentError(ValueError):
+    """Raised when a request scopes retrieval to documents the corpus does not hold."""
+
+
+def document_id(text_path: str) -> str:
+    """Corpus id of a text file: its file name without extension."""
+    return os.path.splitext(os.path.basename(text_path))[0]
+
+
+def _source_fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    """Cheap change check for a source file: (mtime in ns, size), or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CorpusManager:
+    """
+    Holds one vector store shard per document (or collection of documents).
+
+    Shards are built and saved independently, so adding or rebuilding one
+    book never touches the others' indexes. A query is embedded once and the
+    selected shards (all by default) are searched concurrently; the per-shard
+    top-k lists are merged by score into one top-k list.
+
+    Serving shards are never modified: a (re)build always goes into a new
+    store, and the shard dict is swapped in one assignment once the store is
+    ready. A search holds on to the dict it started with, so it finishes on
+    the old snapshot while a reload is in progress.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = CORPUS_INDEX_DIR,
+        build_workers: int = CORPUS_BUILD_WORKERS,
+        search_workers: int = CORPUS_SEARCH_WORKERS,
+    ):
+        self.index_dir = index_dir
+        self.build_workers = max(1, build_workers)
+        # Replaced (never mutated) on change, so concurrent searches see a consistent set of shards
+        self.shards: Dict[str, InMemoryVectorStore] = {}
+        self.sources: Dict[str, str] = {}
+        self.directory: Optional[str] = None  # Set by add_directory; reloads rescan it for added/removed files
+        self.generation = 0  # Bumped on every swap of the shard set
+        self.last_reload: Optional[Dict] = None
+        self._index_paths: Dict[str, str] = {}
+        self._build_kwargs: Dict[str, Dict] = {}
+        self._fingerprints: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._doc_locks: Dict[str, threading.Lock] = {}
+        self._search_pool = ThreadPoolExecutor(max_workers=max(1, search_workers), thread_name_prefix="shard-search")
 
-    if not rag_vector_store.is_built or not rag_vector_store.documents:
-        print("Index not found or empty. Building new index from text...")
+    def index_path(self, doc_id: str) -> str:
+        return os.path.join(self.index_dir, doc_id)
 
+    def _doc_lock(self, doc_id: str) -> threading.Lock:
+        # Two builds of one document would write the same artifact files
+        with self._lock:
+            return self._doc_locks.setdefault(doc_id, threading.Lock())
+
+    def _build(
+        self,
+        doc_id: str,
+        text_path: str,
+        index_path: Optional[str] = None,
+        store: Optional[InMemoryVectorStore] = None,
+        rebuild: bool = False,
+        **build_kwargs,
+    ) -> InMemoryVectorStore:
+        index_path = index_path or self._index_paths.get(doc_id) or self.index_path(doc_id)
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        store = store if store is not None else InMemoryVectorStore()
+        fingerprint = _source_fingerprint(text_path)
+        with self._doc_lock(doc_id):
+            build_store_from_text(store, text_path, index_path, rebuild=rebuild, **build_kwargs)
+        with self._lock:
+            self._index_paths[doc_id] = index_path
+            self._build_kwargs[doc_id] = build_kwargs
+            self._fingerprints[doc_id] = fingerprint
+        return store
+
+    def _swap(self, stores: Dict[str, InMemoryVectorStore], sources: Dict[str, str], removed: Iterable[str] = ()):
+        """Publishes new shards (and drops `removed` ones) in one atomic replacement of the shard dict."""
+        removed = set(removed)
+        with self._lock:
+            self.shards = {**{key: store for key, store in self.shards.items() if key not in removed}, **stores}
+            self.sources = {**{key: path for key, path in self.sources.items() if key not in removed}, **sources}
+            self.generation += 1
+
+    def add_document(
+        self,
+        doc_id: str,
+        text_path: str,
+        index_path: Optional[str] = None,
+        store: Optional[InMemoryVectorStore] = None,
+        **build_kwargs,
+    ) -> InMemoryVectorStore:
+        """
+        Loads or builds the shard for one document and (re)registers it under
+        `doc_id`. A rebuilt shard replaces the old one only once it is ready.
+        """
+        store = self._build(doc_id, text_path, index_path=index_path, store=store, **build_kwargs)
+        self._swap({doc_id: store}, {doc_id: text_path})
+        return store
+
+    def add_documents(self, documents: Dict[str, str], **build_kwargs) -> Dict[str, Exception]:
+        """
+        Builds the shards for {doc_id: text_path} in parallel. A document that
+        fails is reported and skipped; the failures are returned by id.
+        """
+        failures = {}
+        with ThreadPoolExecutor(max_workers=min(self.build_workers, max(1, len(documents)))) as executor:
+            futures = {
+                doc_id: executor.submit(self.add_document, doc_id, text_path, **build_kwargs)
+                for doc_id, text_path in documents.items()
+            }
+            for doc_id, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("❌ Skipping document '%s': %s", doc_id, e)
+                    failures[doc_id] = e
+        logger.info("✅ Corpus ready: %d documents.", len(self.shards))
+        return failures
+
+    def _scan_directory(self) -> Dict[str, str]:
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.txt")))
+        return {document_id(path): path for path in paths}
+
+    def add_directory(self, directory: str, **build_kwargs) -> Dict[str, Exception]:
+        """Adds every .txt file in `directory` as its own document."""
+        self.directory = directory
+        documents = self._scan_directory()
+        if not documents:
+            raise FileNotFoundError(f"No .txt files found in corpus directory {directory}")
+        return self.add_documents(documents, **build_kwargs)
+
+    def remove_document(self, doc_id: str):
+        self._swap({}, {}, removed=[doc_id])
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def _reload_plan(self, doc_ids: Optional[List[str]], force: bool) -> Tuple[Dict[str, str], List[str]]:
+        """The documents to rebuild ({doc_id: text_path}) and the ones to drop."""
+        documents, removed = dict(self.sources), []
+        if self.directory and doc_ids is None:
+            documents = self._scan_directory()
+            removed = [doc_id for doc_id in self.sources if doc_id not in documents]
+        if doc_ids is not None:
+            unknown = [doc_id for doc_id in doc_ids if doc_id not in documents]
+            if unknown:
+                raise UnknownDocumentError(f"Unknown documents: {', '.join(unknown)}")
+            documents = {doc_id: documents[doc_id] for doc_id in doc_ids}
+        changed = {
+            doc_id: path for doc_id, path in documents.items()
+            if force or doc_id not in self.shards or self._fingerprints.get(doc_id) != _source_fingerprint(path)
+        }
+        return changed, removed
+
+    def _reload(self, doc_ids: Optional[List[str]], force: bool) -> Dict:
+        changed, removed = self._reload_plan(doc_ids, force)
+        if not changed and not removed:
+            return {"rebuilt": [], "removed": [], "failures": {}, "generation": self.generation}
+
+        start = time.time()
+        self.last_reload = {"state": "running", "started": start, "documents": sorted(changed), "removed": removed}
+        logger.info("Reloading corpus: rebuilding %d documents, removing %d.", len(changed), len(removed))
+        stores, failures = {}, {}
+        with ThreadPoolExecutor(max_workers=min(self.build_workers, max(1, len(changed)))) as executor:
+            futures = {
+                doc_id: executor.submit(self._build, doc_id, path, rebuild=force, **self._build_kwargs.get(doc_id, {}))
+                for doc_id, path in changed.items()
+            }
+            for doc_id, future in futures.items():
+                try:
+                    stores[doc_id] = future.result()
+                except Exception as e:
+                    # The old shard (if any) keeps serving
+                    logger.error("❌ Reload of document '%s' failed: %s", doc_id, e)
+                    failures[doc_id] = f"{type(e).__name__}: {e}"
+
+        self._swap(stores, {doc_id: changed[doc_id] for doc_id in stores}, removed)
+        result = {
+            "rebuilt": sorted(stores),
+            "removed": removed,
+            "failures": failures,
+            "generation": self.generation,
+        }
+        self.last_reload = {
+            **result, "state": "failed" if failures else "done", "started": start, "seconds": round(time.time() - start, 3),
+        }
+        logger.info("✅ Corpus reloaded in %.1fs (generation %d).", time.time() - start, self.generation)
+        return result
+
+    def reload(self, doc_ids: Optional[List[str]] = None, force: bool = False, wait: bool = True) -> Optional[Dict]:
+        """
+        Rebuilds the shards whose source file changed (only `doc_ids` if
+        given) into new stores while the current ones keep serving, then
+        swaps them in together. With `force` every selected shard is rebuilt
+        from scratch, re-chunked and re-embedded without its saved index or
+        chunk embedding cache. In directory mode new files are added and
+        deleted ones dropped. Returns a summary, or None if another reload is
+        running and `wait` is False.
+        """
+        if not self._reload_lock.acquire(blocking=wait):
+            return None
         try:
-            with open(text_path, "r", encoding="utf-8") as file:
-                full_text = file.read()
-
-            # ✅ Clean text before chunking
-            cleaned_text = clean_text(full_text)
-            print(cleaned_text)
-            chunks = chunk_text(cleaned_text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-            print(f"✅ Generated {len(chunks)} text chunks.")
-
-            embeddings = []
-            print("⏳ Generating embeddings for each chunk...")
-            for i, chunk in enumerate(chunks):
-                embeddings.append(get_text_embedding(chunk))
-                if (i + 1) % 100 == 0:
-                    print(f"Processed {i+1} embeddings...")
-
-            rag_vector_store.add_documents(chunks, embeddings)
-            rag_vector_store.build_index()
-            rag_vector_store.save_index(index_path)
-
-            print("✅ RAG retriever initialized and index saved.")
-
-        except FileNotFoundError:
-            print(f"❌ Error: Text file not found at {text_path}.")
-            raise
-        except Exception as e:
-            print(f"❌ Error during retriever initialization: {e}")
+            return self._reload(doc_ids, force)
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, doc_ids: Optional[List[str]] = None, force: bool = False) -> bool:
+        """Starts reload() on a background thread; False if a reload is already running."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._reload_plan(doc_ids, force)  # Fail fast on unknown documents
+        except Exception:
+            self._reload_lock.release()
             raise
-    else:
-        print("✅ RAG retriever loaded from saved index.")
 
+        def run():
+            try:
+                self._reload(doc_ids, force)
+            except Exception as e:
+                logger.exception("Corpus reload failed: %s", e)
+                self.last_reload = {"state": "failed", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=run, name="corpus-reload", daemon=True).start()
+        return True
+
+    @property
+    def document_ids(self) -> List[str]:
+        return sorted(self.shards)
+
+    @property
+    def is_built(self) -> bool:
+        return any(store.is_built for store in self.shards.values())
+
+    @property
+    def version(self) -> Tuple:
+        """Changes whenever a shard is added, removed or its contents change."""
+        return tuple(sorted((doc_id, id(store), store.version) for doc_id, store in self.shards.items()))
+
+    def select(self, doc_ids: Optional[List[str]] = None) -> Dict[str, InMemoryVectorStore]:
+        """The built shards to search: all of them, or those in `doc_ids`."""
+        shards = self.shards
+        if doc_ids is None:
+            return {doc_id: store for doc_id, store in shards.items() if store.is_built}
+        unknown = [doc_id for doc_id in doc_ids if doc_id not in shards]
+        if unknown:
+            raise UnknownDocumentError(f"Unknown documents: {', '.join(unknown)}")
+        return {doc_id: shards[doc_id] for doc_id in dict.fromkeys(doc_ids) if shards[doc_id].is_built}
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 3,
+        doc_ids: Optional[List[str]] = None,
+    ) -> List[List[Tuple[RetrievedChunk, float]]]:
+        """
+        Searches the selected shards concurrently and merges their results.
+        Returns one list of (chunk, score) tuples per query, best first.
+        """
+        shards = self.select(doc_ids)
+        if not shards:
+            return [[] for _ in range(len(query_embeddings))]
 
-def retrieve_relevant_chunks(query: str, k: int = 3) -> List[str]:
+        if len(shards) == 1:
+            (doc_id, store), = shards.items()
+            per_shard = {doc_id: store.search_batch(query_embeddings, k=k, with_pages=True)}
+        else:
+            futures = {
+                doc_id: self._search_pool.submit(store.search_batch, query_embeddings, k, True)
+                for doc_id, store in shards.items()
+            }
+            per_shard = {doc_id: future.result() for doc_id, future in futures.items()}
+
+        # All shards share the index configuration, so their scores are comparable
+        higher_is_better = next(iter(shards.values())).index_config.metric != "l2"
+        pick = heapq.nlargest if higher_is_better else heapq.nsmallest
+        merged = []
+        for i in range(len(query_embeddings)):
+            candidates = [
+                (RetrievedChunk(text, doc_id, page, page_end), float(score))
+                for doc_id, results in per_shard.items()
+                for text, score, page, page_end in results[i]
+            ]
+            merged.append(pick(k, candidates, key=lambda candidate: candidate[1]))
+        return merged
+
+    def stats(self) -> List[Dict]:
+        return [
+            {"id": doc_id, "chunks": len(store.documents), "source": self.sources.get(doc_id)}
+            for doc_id, store in sorted(self.shards.items())
+        ]
+
+
+# Global corpus; the default single text file is registered as a shard backed by rag_vector_store
+corpus = CorpusManager()
+
+# Top-k results keyed by (model id, normalized query, k, document scope); cleared whenever the corpus changes
+results_cache = QueryCache("retrieval_results", maxsize=RESULTS_CACHE_SIZE, ttl=RESULTS_CACHE_TTL)
+_results_cache_version = corpus.version
+
+
+def _sync_results_cache():
+    """Drops cached results that were computed against an older index."""
+    global _results_cache_version
+    version = corpus.version
+    if _results_cache_version != version:
+        results_cache.clear()
+        _results_cache_version = version
+
+
+def initialize_retriever_from_text(text_path: str, chunk_size: int = 1000, chunk_overlap: int = 200, index_path: str = "rag_index"):
+    """
+    Initializes the RAG retriever from a plain text file (already extracted):
+    builds (or loads) rag_vector_store and registers it in the corpus under
+    the file's document id.
+    """
+    logger.info("Initializing RAG retriever from text...")
+    corpus.add_document(
+        document_id(text_path), text_path, index_path=index_path, store=rag_vector_store,
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+    )
+    logger.info("✅ RAG retriever initialized.")
+
+
+def ensure_retriever_initialized(text_path: str, index_path: str = "rag_index", **kwargs):
+    """Thread-safe, idempotent wrapper around initialize_retriever_from_text."""
+    with _init_lock:
+        if document_id(text_path) in corpus.shards:
+            return
+        initialize_retriever_from_text(text_path=text_path, index_path=index_path, **kwargs)
+
+
+def warmup():
+    """Runs a dummy encode and search so the first real request does not pay for lazy loading."""
+    query_embeddings = get_text_embeddings(["warmup"], num_workers=1)
+    if corpus.is_built:
+        corpus.search_batch(query_embeddings, k=1)
+
+
+def retrieve_relevant_chunks(query: str, k: int = 3, doc_ids: Optional[List[str]] = None) -> List[str]:
     """
     Retrieves the most relevant text chunks from the knowledge base for a given query.
+    `doc_ids` restricts the search to those documents (all by default).
     """
-    if not rag_vector_store.is_built:
-        print("⚠️ Warning: Retriever not initialized. Please call `initialize_retriever_from_text()` first.")
-        return []
+    return retrieve_relevant_chunks_batch([query], k=k, doc_ids=doc_ids)[0]
+
 
-    query_embedding = get_text_embedding(query)
-    results = rag_vector_store.search(query_embedding, k=k)
+def retrieve_relevant_chunks_batch(
+    queries: List[str],
+    k: int = 3,
+    doc_ids: Optional[List[str]] = None,
+    timings: Optional[Dict[str, float]] = None,
+    with_sources: bool = False,
+) -> Union[List[List[str]], List[List[RetrievedChunk]]]:
+    """
+    Retrieves the top-k chunks for several queries at once: one batched
+    embedding pass and one multi-query FAISS search per selected shard.
+    Queries already in the results cache skip both. With `with_sources` the
+    chunks are RetrievedChunk tuples carrying their document and page range
+    instead of plain texts.
+
+    If `timings` is given, the seconds spent embedding and searching are
+    added to it under "embed" and "search".
+    """
+    if not corpus.is_built:
+        logger.warning("⚠️ Retriever not initialized. Please call `initialize_retriever_from_text()` first.")
+        return [[] for _ in queries]
 
-    relevant_texts = [doc_text for doc_text, _ in results]
-    return relevant_texts
+    corpus.select(doc_ids)  # Fail fast on unknown documents
+    _sync_results_cache()
+    scope = tuple(sorted(set(doc_ids))) if doc_ids is not None else None
+    keys = [(embedding_model_id(), normalize_query(query), k, scope) for query in queries]
+    relevant_chunks = [results_cache.get(key) for key in keys]
 
+    missing = {}
+    for i, chunks in enumerate(relevant_chunks):
+        if chunks is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        version = corpus.version
+        with span("embed", timings):
+            query_embeddings = get_query_embeddings([queries[positions[0]] for positions in missing.values()])
+        with span("search", timings):
+            results = corpus.search_batch(query_embeddings, k=k, doc_ids=doc_ids)
+        # Results from a snapshot swapped out mid-search are returned but not cached
+        cacheable = corpus.version == version
+        for (key, positions), query_results in zip(missing.items(), results):
+            chunks = [chunk for chunk, _ in query_results]
+            if cacheable:
+                results_cache.set(key, chunks)
+            for i in positions:
+                relevant_chunks[i] = chunks
 
+    if with_sources:
+        return [list(chunks) for chunks in relevant_chunks]
+    return [[chunk.text for chunk in chunks] for chunks in relevant_chunks]
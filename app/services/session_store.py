@@ -0,0 +1,197 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.config import (
+    SESSION_STORE_SIZE,
+    SESSION_TTL,
+    SESSION_STORE_PATH,
+    SESSION_HISTORY_TURNS,
+    SESSION_REUSE_TURNS,
+    SESSION_REUSE_THRESHOLD,
+)
+from app.utils.cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """
+    One conversation: its recent turns, each a dict with the question, the
+    answer, the retrieved chunks and their sources (document and page range),
+    the document scope and (for the most recent
+    turns only) the question embedding used to decide retrieval reuse.
+    """
+
+    def __init__(self, session_id: str, turns: Optional[List[Dict[str, Any]]] = None, updated: Optional[float] = None):
+        self.id = session_id
+        self.turns = turns or []
+        self.updated = updated or time.time()
+        self.lock = threading.Lock()
+
+    def messages(self) -> List[Dict[str, Any]]:
+        """History in the {"role", "parts"} chat message format."""
+        messages = []
+        for turn in self.turns:
+            messages.append({"role": "user", "parts": [{"text": turn["question"]}]})
+            messages.append({"role": "model", "parts": [{"text": turn["answer"]}]})
+        return messages
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "turns": self.turns, "updated": self.updated}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChatSession":
+        return cls(data["id"], data["turns"], data["updated"])
+
+
+class SessionStore:
+    """
+    Server-side chat sessions keyed by session id.
+
+    Sessions live in a bounded LRU cache and expire `ttl` seconds after their
+    last turn. Each keeps only its last `max_turns` turns, and only the last
+    `reuse_turns` keep a question embedding, so memory per session is
+    bounded too. With `path`, sessions are also written through to a local
+    SQLite file, so they survive restarts and eviction from memory.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = SESSION_STORE_SIZE,
+        ttl: float = SESSION_TTL,
+        path: Optional[str] = SESSION_STORE_PATH,
+        max_turns: int = SESSION_HISTORY_TURNS,
+        reuse_turns: int = SESSION_REUSE_TURNS,
+    ):
+        self.ttl = ttl
+        self.max_turns = max(1, max_turns)
+        self.reuse_turns = reuse_turns
+        self._cache = QueryCache("sessions", maxsize=maxsize, ttl=ttl)
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, updated REAL NOT NULL, data TEXT NOT NULL)"
+                )
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Deletes persisted sessions past their TTL; returns how many were removed."""
+        if self._db is None:
+            return 0
+        with self._db_lock, self._db:
+            removed = self._db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl,)).rowcount
+        if removed:
+            logger.info("Removed %d expired chat sessions from the session store.", removed)
+        return removed
+
+    def _load(self, session_id: str) -> Optional[ChatSession]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated >= ?", (session_id, time.time() - self.ttl)
+            ).fetchone()
+        return ChatSession.from_dict(json.loads(row[0])) if row else None
+
+    def _persist(self, session: ChatSession):
+        if self._db is None:
+            return
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        with self._db_lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, updated, data) VALUES (?, ?, ?)", (session.id, session.updated, data)
+            )
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """The session, from memory or the persistent store, or None if unknown or expired."""
+        session = self._cache.get(session_id)
+        if session is None:
+            session = self._load(session_id)
+            if session is not None:
+                self._cache.set(session_id, session)
+        return session
+
+    def create(self) -> ChatSession:
+        """A new empty session under a random, unguessable id (never one chosen by a client)."""
+        session = ChatSession(uuid.uuid4().hex)
+        self._cache.set(session.id, session)
+        self._persist(session)
+        return session
+
+    def append_turn(
+        self,
+        session: ChatSession,
+        question: str,
+        answer: str,
+        context_chunks: List[str],
+        documents: Optional[List[str]] = None,
+        query_embedding: Optional[Union[np.ndarray, List[float]]] = None,
+        sources: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """Records a finished turn, dropping the oldest turns and embeddings beyond the limits."""
+        with session.lock:
+            session.turns.append({
+                "question": question,
+                "answer": answer,
+                "context": list(context_chunks),
+                "sources": list(sources) if sources else None,
+                "documents": sorted(documents) if documents else None,
+                "embedding": None if query_embedding is None else np.asarray(query_embedding, dtype='float32').tolist(),
+            })
+            del session.turns[:-self.max_turns]
+            for turn in session.turns[:-self.reuse_turns] if self.reuse_turns > 0 else session.turns:
+                turn["embedding"] = None
+            session.updated = time.time()
+            self._cache.set(session.id, session)  # Also restarts the TTL
+            self._persist(session)
+
+    def reusable_context(
+        self,
+        session: ChatSession,
+        query_embedding: Union[np.ndarray, List[float]],
+        documents: Optional[List[str]] = None,
+        threshold: float = SESSION_REUSE_THRESHOLD,
+    ) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+        """
+        Retrieved chunks (and their sources) of the most recent turn whose
+        question is at least `threshold` cosine-similar to the new one, over
+        the same documents. Such follow-ups are answered from the same
+        context, skipping retrieval.
+        """
+        query = np.asarray(query_embedding, dtype='float32')
+        query_norm = np.linalg.norm(query)
+        scope = sorted(documents) if documents else None
+        with session.lock:
+            for turn in reversed(session.turns):
+                if turn["embedding"] is None:
+                    break
+                if turn["documents"] != scope or not turn["context"]:
+                    continue
+                previous = np.asarray(turn["embedding"], dtype='float32')
+                similarity = float(query @ previous) / max(float(query_norm * np.linalg.norm(previous)), 1e-12)
+                if similarity >= threshold:
+                    return list(turn["context"]), list(turn.get("sources") or [])
+        return None
+
+    def delete(self, session_id: str):
+        self._cache.delete(session_id)
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Global session store used by the chat endpoints
+session_store = SessionStore()
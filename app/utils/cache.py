@@ -0,0 +1,83 @@
+import threading
+import unicodedata
+from typing import Any, Dict, Hashable
+
+from cachetools import TTLCache
+
+
+def normalize_query(text: str) -> str:
+    """Normalizes a query for use as a cache key (Unicode NFC, case, whitespace)."""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split()).casefold()
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that counts capacity evictions."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+
+class QueryCache:
+    """
+    Bounded, thread-safe LRU cache with per-entry TTL and hit/miss counters.
+
+    A `maxsize` of 0 disables the cache: every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self._cache = _CountingTTLCache(maxsize=max(maxsize, 1), ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if self.maxsize > 0:
+                try:
+                    value = self._cache[key]
+                except KeyError:
+                    pass
+                else:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._cache[key] = value
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self._cache.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
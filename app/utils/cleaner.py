@@ -6,31 +6,39 @@
 #     return text.strip()
 import torch
 
-print("Torch version:", torch.__version__)
-print("CUDA available:", torch.cuda.is_available())
-print("GPU name:", torch.cuda.get_device_name(0) if torch.cuda.is_available() else "No GPU ")
-
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import easyocr
+import glob
+import hashlib
+import json
 import os
+import multiprocessing
+from typing import List, Optional, Tuple
 from PIL import Image # Keep PIL for potential image processing if needed
 import numpy as np # Import numpy for array conversion
 
 # Set path to your Poppler bin (change if needed). This is for pdf2image.
 POPPLER_PATH = r"C:\Users\Asif\VSCODE\poppler-24.02.0\Library\bin"
 
-# Initialize EasyOCR reader once.
+# EasyOCR reader, created once per process on first use (see get_reader).
 # Note: You're getting "Neither CUDA nor MPS are available - defaulting to CPU."
 # This means easyocr is running on CPU. If you have an NVIDIA GPU,
 # ensure you've installed the CUDA-enabled version of PyTorch for speed.
 # For now, running on CPU is fine, but expect it to be slower for many pages.
-try:
-    reader = easyocr.Reader(['bn', 'en'], gpu=True) # Keep gpu=True if you *intend* to use GPU, it will fallback to CPU if not found
-    print("EasyOCR reader initialized with Bengali and English language models.")
-except Exception as e:
-    print(f"Error initializing EasyOCR reader: {e}")
-    print("Please ensure EasyOCR and PyTorch are correctly installed. Check GPU settings if 'gpu=True'.")
-    exit()
+reader = None
+
+def get_reader(gpu: bool = True):
+    """Initializes the EasyOCR reader for Bengali and English once per process."""
+    global reader
+    if reader is None:
+        try:
+            reader = easyocr.Reader(['bn', 'en'], gpu=gpu) # Keep gpu=True if you *intend* to use GPU, it will fallback to CPU if not found
+            print("EasyOCR reader initialized with Bengali and English language models.")
+        except Exception as e:
+            print(f"Error initializing EasyOCR reader: {e}")
+            print("Please ensure EasyOCR and PyTorch are correctly installed. Check GPU settings if 'gpu=True'.")
+            raise
+    return reader
 
 def extract_text_from_pdf_with_easyocr(pdf_path: str, dpi: int = 300) -> str:
     """
@@ -62,7 +70,7 @@ def extract_text_from_pdf_with_easyocr(pdf_path: str, dpi: int = 300) -> str:
             image_np = np.array(page)
 
             # Perform OCR on the image. detail=0 returns only the text.
-            results = reader.readtext(image_np, detail=0) # Pass the NumPy array
+            results = get_reader().readtext(image_np, detail=0) # Pass the NumPy array
 
             # Join the detected text lines for the current page
             page_text = "\n".join(results)
@@ -75,20 +83,184 @@ def extract_text_from_pdf_with_easyocr(pdf_path: str, dpi: int = 300) -> str:
 
     return full_text
 
+def _page_checkpoint_path(checkpoint_dir: str, page_number: int) -> str:
+    return os.path.join(checkpoint_dir, f"page_{page_number:05d}.txt")
+
+
+def _checkpoint_manifest(pdf_path: str, dpi: int, page_count: int) -> dict:
+    """What the page checkpoints were made from; pages OCRed from another PDF or DPI must not be reused."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"pdf_sha256": digest.hexdigest(), "dpi": dpi, "pages": page_count}
+
+
+def _prepare_checkpoint_dir(checkpoint_dir: str, manifest: dict):
+    """
+    Makes `checkpoint_dir` hold checkpoints for `manifest` only: page files
+    left by a run with a different manifest (or without one) are deleted
+    before the manifest is written.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest_path = os.path.join(checkpoint_dir, "checkpoint.json")
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = None
+    if saved == manifest:
+        return
+    stale = glob.glob(os.path.join(checkpoint_dir, "page_*.txt")) + glob.glob(os.path.join(checkpoint_dir, "page_*.txt.tmp"))
+    if stale:
+        print(f"Checkpoints in '{checkpoint_dir}' are from another PDF or DPI; discarding {len(stale)} page files.")
+    for path in stale:
+        os.remove(path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def _init_ocr_worker(gpu: bool):
+    # Each worker process loads its own EasyOCR models once
+    get_reader(gpu=gpu)
+
+
+def _ocr_page_window(pdf_path: str, first_page: int, last_page: int, dpi: int, checkpoint_dir: str) -> List[int]:
+    """
+    Renders pages first_page..last_page (1-based, inclusive), OCRs them and
+    writes one checkpoint file per page. Only this window's images are in memory.
+    """
+    pages = convert_from_path(
+        pdf_path, poppler_path=POPPLER_PATH, dpi=dpi, first_page=first_page, last_page=last_page
+    )
+    done = []
+    for page_number, page in zip(range(first_page, last_page + 1), pages):
+        results = get_reader().readtext(np.array(page), detail=0)
+        page.close()
+        # Write to a temp file first so an interrupted write never looks like a finished page
+        path = _page_checkpoint_path(checkpoint_dir, page_number)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(results))
+        os.replace(tmp_path, path)
+        done.append(page_number)
+    return done
+
+
+def _pending_windows(pending: List[int], window_size: int) -> List[Tuple[int, int]]:
+    """Groups pending page numbers into contiguous (first, last) ranges of at most window_size pages."""
+    windows = []
+    for page_number in pending:
+        if windows and windows[-1][1] == page_number - 1 and page_number - windows[-1][0] < window_size:
+            windows[-1] = (windows[-1][0], page_number)
+        else:
+            windows.append((page_number, page_number))
+    return windows
+
+
+def extract_text_from_pdf_parallel(
+    pdf_path: str,
+    checkpoint_dir: str,
+    dpi: int = 300,
+    window_size: int = 4,
+    num_workers: Optional[int] = None,
+    gpu: bool = False,
+) -> str:
+    """
+    Resumable, memory-bounded variant of extract_text_from_pdf_with_easyocr.
+
+    Pages are rendered in windows of `window_size` pages and OCRed in a pool
+    of `num_workers` processes, so at most num_workers * window_size page
+    images are in memory at once. Each page's text is checkpointed to
+    `checkpoint_dir`; rerunning with the same directory skips finished pages.
+    The directory records the PDF (by SHA-256), DPI and page count its
+    checkpoints belong to, and is cleared when any of them differ.
+
+    Args:
+        pdf_path (str): The path to the input PDF file.
+        checkpoint_dir (str): Directory for the per-page checkpoint files.
+        dpi (int): The DPI to render PDF pages as images.
+        window_size (int): Pages rendered per task.
+        num_workers (int): OCR processes (default: CPU count).
+        gpu (bool): Let every worker use the GPU. Usually only worth it with one worker.
+
+    Returns:
+        str: The full extracted text, in page order and in the same format as
+             extract_text_from_pdf_with_easyocr.
+    """
+    if not os.path.exists(pdf_path):
+        return f"Error: PDF file not found at '{pdf_path}'"
+
+    page_count = pdfinfo_from_path(pdf_path, poppler_path=POPPLER_PATH)["Pages"]
+    _prepare_checkpoint_dir(checkpoint_dir, _checkpoint_manifest(pdf_path, dpi, page_count))
+    pending = [n for n in range(1, page_count + 1) if not os.path.exists(_page_checkpoint_path(checkpoint_dir, n))]
+    print(f"'{os.path.basename(pdf_path)}': {page_count} pages, {page_count - len(pending)} already checkpointed.")
+
+    errors = []
+    if pending:
+        windows = _pending_windows(pending, max(1, window_size))
+        num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(windows)))
+        # spawn keeps torch/CUDA state out of the forked workers
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(num_workers, initializer=_init_ocr_worker, initargs=(gpu,)) as pool:
+            tasks = [
+                (first, last, pool.apply_async(_ocr_page_window, (pdf_path, first, last, dpi, checkpoint_dir)))
+                for first, last in windows
+            ]
+            finished = page_count - len(pending)
+            for first, last, task in tasks:
+                try:
+                    finished += len(task.get())
+                    print(f"OCR progress: {finished}/{page_count} pages")
+                except Exception as e:
+                    errors.append(f"pages {first}-{last}: {e}")
+                    print(f"Error during OCR of pages {first}-{last}: {e}")
+
+    parts = []
+    for page_number in range(1, page_count + 1):
+        path = _page_checkpoint_path(checkpoint_dir, page_number)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            parts.append(f"\n--- Page {page_number} ---\n{f.read()}")
+    for error in errors:
+        parts.append(f"\nAn error occurred during PDF conversion or OCR for '{pdf_path}' ({error}). Rerun to resume.")
+    return "".join(parts)
+
 # === Run the extraction ===
 if __name__ == "__main__":
+    import argparse
+
+    print("Torch version:", torch.__version__)
+    print("CUDA available:", torch.cuda.is_available())
+    print("GPU name:", torch.cuda.get_device_name(0) if torch.cuda.is_available() else "No GPU ")
+
+    parser = argparse.ArgumentParser(description="Extract text from a PDF with EasyOCR.")
     # Define the path to your PDF file
-    pdf_file = r"C:\Users\Asif\VSCODE\Multilingual_AI_Assistant_RAG\app\data\HSC26-Bangla1st-Paper.pdf"
+    parser.add_argument("pdf_file", nargs="?", default=r"C:\Users\Asif\VSCODE\Multilingual_AI_Assistant_RAG\app\data\HSC26-Bangla1st-Paper.pdf")
+    parser.add_argument("--output", default="extracted_text_from_HSC26_Bangla1st-Paper.txt")
+    parser.add_argument("--dpi", type=int, default=300) # You can adjust DPI here
+    parser.add_argument("--checkpoint-dir", help="Use the parallel, resumable pipeline with checkpoints in this directory.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--window-size", type=int, default=4)
+    parser.add_argument("--gpu", action="store_true", help="Use the GPU in every OCR worker.")
+    args = parser.parse_args()
 
-    # Extract text using the EasyOCR function
-    text = extract_text_from_pdf_with_easyocr(pdf_file, dpi=300) # You can adjust DPI here
+    if args.checkpoint_dir:
+        text = extract_text_from_pdf_parallel(
+            args.pdf_file, args.checkpoint_dir, dpi=args.dpi,
+            window_size=args.window_size, num_workers=args.workers, gpu=args.gpu,
+        )
+    else:
+        # Extract text using the EasyOCR function
+        text = extract_text_from_pdf_with_easyocr(args.pdf_file, dpi=args.dpi)
 
     # Print the first 1000 characters of the extracted text
     print("\n--- Extracted Text (First 1000 characters) ---")
     print(text[:1000])
 
     # Optionally, save the full extracted text to a file
-    output_txt_file = "extracted_text_from_HSC26_Bangla1st-Paper.txt"
+    output_txt_file = args.output
     try:
         with open(output_txt_file, "w", encoding="utf-8") as f:
             f.write(text)
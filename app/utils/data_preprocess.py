@@ -1,6 +1,34 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import os
 import re # For regular expressions for cleaning
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+_SPACES = re.compile(r'[ \t]+')
+
+def clean_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Line-by-line version of clean_text: yields the cleaned lines of `lines`
+    (without newlines). "\n".join() of the output equals clean_text() of the
+    joined input, but only one line is held at a time.
+    """
+    started = False
+    blank_lines = 0  # Whitespace-only lines, emitted only if more text follows
+    for line in lines:
+        if not line:
+            # Consecutive newlines collapse into one
+            continue
+        # Replace multiple spaces/tabs with a single space and strip the line
+        line = _SPACES.sub(' ', line).strip()
+        if not line:
+            blank_lines += 1
+            continue
+        if started:
+            for _ in range(blank_lines):
+                yield ""
+        blank_lines = 0
+        started = True
+        yield line
+
 
 def clean_text(text: str) -> str:
     """
@@ -11,16 +39,14 @@ def clean_text(text: str) -> str:
     """
     if not text:
         return ""
-    # Replace multiple newlines with a single newline
-    text = re.sub(r'\n+', '\n', text)
-    # Replace multiple spaces/tabs with a single space
-    text = re.sub(r'[ \t]+', ' ', text)
-    # Remove leading/trailing whitespace from each line
-    text = "\n".join([line.strip() for line in text.split('\n')])
-    # Remove any leading/trailing whitespace from the whole text
-    text = text.strip()
-    print(text)
-    return text
+    return "\n".join(clean_lines(text.split('\n')))
+
+
+def read_lines(path: str) -> Iterator[str]:
+    """Yields the lines of a UTF-8 text file without their newlines, reading incrementally."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
 
 
 def chunk_text(text: str, chunk_size: int = 2000, chunk_overlap: int = 400) -> list[str]:
@@ -35,6 +61,230 @@ def chunk_text(text: str, chunk_size: int = 2000, chunk_overlap: int = 400) -> l
     return chunks
 
 
+def iter_chunks(
+    lines: Iterable[str],
+    chunk_size: int = 2000,
+    chunk_overlap: int = 400,
+    window_chunks: int = 16,
+) -> Iterator[str]:
+    """
+    Streaming version of chunk_text over an iterable of (cleaned) lines.
+
+    Lines are buffered until about `window_chunks` chunks worth of text is
+    available, then the buffer is split and its chunks are yielded up to the
+    last one that starts on a line boundary. Splitting resumes from that
+    chunk's preceding newline, which is where the splitter's own state is at
+    that point, so the chunks (and their overlap) match chunk_text on the
+    whole text.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+    )
+    window = max(2, window_chunks) * chunk_size
+    parts, buffered = [], 0
+    for line in lines:
+        if parts:
+            parts.append("\n")
+            buffered += 1
+        parts.append(line)
+        buffered += len(line)
+        if buffered < window:
+            continue
+        buffer = "".join(parts)
+        chunks = text_splitter.split_text(buffer)
+        # Start offsets of the chunks, found the same way as the splitter's add_start_index
+        starts, index, previous_len = [], 0, 0
+        for chunk in chunks:
+            index = buffer.find(chunk, max(0, index + previous_len - chunk_overlap))
+            starts.append(index)
+            previous_len = len(chunk)
+        resume = next((i for i in range(len(chunks) - 1, 0, -1) if starts[i] > 0 and buffer[starts[i] - 1] == "\n"), None)
+        if resume is None:
+            continue
+        yield from chunks[:resume]
+        carry = buffer[starts[resume] - 1:]
+        parts, buffered = [carry], len(carry)
+
+    if parts:
+        yield from text_splitter.split_text("".join(parts))
+
+
+def iter_text_file_chunks(path: str, chunk_size: int = 2000, chunk_overlap: int = 400) -> Iterator[str]:
+    """Reads, cleans and chunks a text file as a stream, keeping only a small window in memory."""
+    return iter_chunks(clean_lines(read_lines(path)), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+# Page markers written by the OCR step (see cleaner.py), e.g. "--- Page 12 ---"
+_PAGE_MARKER = re.compile(r'^--- Page (\d+) ---$')
+# Sentence-ending marks: the danda/double danda (EasyOCR often reads the danda as "|"), ".", "?" and "!"
+_SENTENCE_END = re.compile(r'([।॥|.?!])')
+_DANDAS = "।॥|"
+_SENTENCE_FINAL = re.compile(r'[।॥|.?!]$')
+
+
+class PageChunk(NamedTuple):
+    text: str
+    page: Optional[int]  # Page the chunk starts on (None before the first page marker)
+    page_end: Optional[int]  # Page it ends on; equals `page` unless chunks may span pages
 
 
+def _iter_pages(lines: Iterable[str]) -> Iterator[Tuple[Optional[int], str]]:
+    """Groups lines into (page number, page text) using the OCR page markers."""
+    page, buffer = None, []
+    for line in lines:
+        match = _PAGE_MARKER.match(line) if line.startswith("--- Page ") else None
+        if match:
+            if buffer:
+                yield page, "\n".join(buffer)
+            page, buffer = int(match.group(1)), []
+        else:
+            buffer.append(line)
+    if buffer:
+        yield page, "\n".join(buffer)
 
+
+def _split_sentences(text: str) -> Iterator[str]:
+    """
+    Splits text after each danda, and after ".", "?" or "!" when followed by
+    whitespace (so "3.5" or "Dr.X" stay whole). Runs of marks stay together.
+    """
+    parts = _SENTENCE_END.split(text)  # text, mark, text, mark, ..., text
+    last = len(parts) - 1
+    sentence = ""
+    for i in range(0, last, 2):
+        sentence += parts[i] + parts[i + 1]
+        following = parts[i + 2]
+        if following and (parts[i + 1] in _DANDAS or following[0].isspace()):
+            yield sentence
+            sentence = ""
+    sentence += parts[last]
+    if sentence:
+        yield sentence
+
+
+def _split_oversized(text: str, limit: int, length_function: Callable[[str], int]) -> List[str]:
+    """Splits a sentence longer than `limit` at line breaks, then spaces, then anywhere."""
+    for separator in ("\n", " "):
+        pieces = [piece for piece in text.split(separator) if piece.strip()]
+        if len(pieces) > 1:
+            break
+    else:
+        # A single unbreakable run (rare): cut it into limit-sized slices
+        step = max(1, len(text) * limit // max(length_function(text), 1))
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    separator_size = length_function(" ")
+    units, current, current_size = [], [], 0
+    for piece in pieces:
+        piece_size = length_function(piece)
+        if current and current_size + separator_size + piece_size > limit:
+            units.append(" ".join(current))
+            current, current_size = [], 0
+        if piece_size > limit:
+            units.extend(_split_oversized(piece, limit, length_function))
+            continue
+        current_size += (separator_size if current else 0) + piece_size
+        current.append(piece)
+    if current:
+        units.append(" ".join(current))
+    return units
+
+
+def _iter_sentences(
+    lines: Iterable[str], limit: int, length_function: Callable[[str], int]
+) -> Iterator[Tuple[Optional[int], str, int]]:
+    """(page, sentence, size) with whitespace collapsed; sentences over `limit` are split further."""
+    for page, page_text in _iter_pages(lines):
+        for sentence in _split_sentences(page_text):
+            unit = " ".join(sentence.split())
+            if not unit:
+                continue
+            size = length_function(unit)
+            if size <= limit:
+                yield page, unit, size
+                continue
+            for piece in _split_oversized(sentence, limit, length_function):
+                piece = " ".join(piece.split())
+                if piece:
+                    yield page, piece, length_function(piece)
+
+
+def iter_sentence_chunks(
+    lines: Iterable[str],
+    chunk_size: int = 2000,
+    chunk_overlap: int = 400,
+    length_function: Callable[[str], int] = len,
+    respect_pages: bool = True,
+) -> Iterator[PageChunk]:
+    """
+    Sentence- and page-aware alternative to chunk_text for our Bangla/English
+    OCR text, streamed over (cleaned) lines.
+
+    Sentences (ending in ।, ॥, | or in ., ?, ! before whitespace) are packed
+    whole into chunks of at most `chunk_size`, measured by `length_function`
+    (len for characters, or e.g. context_packer.estimate_tokens for tokens).
+    The overlap is made of whole trailing sentences of the previous chunk,
+    up to `chunk_overlap`, so no chunk starts or ends mid-sentence; only a
+    sentence longer than chunk_size is split (at line breaks, then spaces).
+    With `respect_pages`, no chunk crosses a "--- Page N ---" marker.
+    """
+    separator_size = length_function(" ")
+    window: List[Tuple[Optional[int], str, int]] = []  # (page, sentence, size)
+    size = 0
+
+    def chunk() -> PageChunk:
+        return PageChunk(" ".join(text for _, text, _ in window), window[0][0], window[-1][0])
+
+    for page, sentence, sentence_size in _iter_sentences(lines, chunk_size, length_function):
+        if window and respect_pages and page != window[-1][0]:
+            yield chunk()
+            window, size = [], 0
+        elif window and size + separator_size + sentence_size > chunk_size:
+            yield chunk()
+            # Carry whole trailing sentences that fit in the overlap and leave room for this one
+            kept, kept_size = [], 0
+            for entry in reversed(window):
+                entry_size = entry[2] + (separator_size if kept else 0)
+                if kept_size + entry_size > chunk_overlap or kept_size + entry_size + separator_size + sentence_size > chunk_size:
+                    break
+                kept.append(entry)
+                kept_size += entry_size
+            kept.reverse()
+            window, size = kept, kept_size
+        size += (separator_size if window else 0) + sentence_size
+        window.append((page, sentence, sentence_size))
+    if window:
+        yield chunk()
+
+
+def sentence_chunk_text(
+    text: str,
+    chunk_size: int = 2000,
+    chunk_overlap: int = 400,
+    length_function: Callable[[str], int] = len,
+    respect_pages: bool = True,
+) -> List[PageChunk]:
+    """Sentence- and page-aware chunks of `text` with their page numbers (see iter_sentence_chunks)."""
+    return list(iter_sentence_chunks(
+        text.split("\n"), chunk_size, chunk_overlap, length_function=length_function, respect_pages=respect_pages
+    ))
+
+
+def is_sentence_final(chunk: str) -> bool:
+    """True if the chunk ends at a sentence boundary."""
+    return bool(_SENTENCE_FINAL.search(chunk.rstrip()))
+
+
+def iter_text_file_sentence_chunks(
+    path: str,
+    chunk_size: int = 2000,
+    chunk_overlap: int = 400,
+    length_function: Callable[[str], int] = len,
+) -> Iterator[PageChunk]:
+    """Reads, cleans and sentence-chunks a text file as a stream, one page in memory at a time."""
+    return iter_sentence_chunks(
+        clean_lines(read_lines(path)), chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function
+    )
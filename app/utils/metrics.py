@@ -0,0 +1,109 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) covering sub-millisecond FAISS searches up to slow LLM calls
+_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each pipeline stage.", ["stage"], buckets=_SECONDS_BUCKETS
+)
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Exceptions raised in each pipeline stage.", ["stage"])
+HTTP_REQUESTS = Counter("rag_http_requests_total", "HTTP requests by route and status.", ["method", "path", "status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "HTTP request latency by route.", ["method", "path"], buckets=_SECONDS_BUCKETS
+)
+RETRIEVED_CHUNKS = Histogram(
+    "rag_retrieved_chunks", "Chunks retrieved per question.", buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34)
+)
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens", "Estimated tokens per LLM prompt.", buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+RETRIEVAL_BATCH_SIZE = Histogram(
+    "rag_retrieval_batch_size", "Questions per micro-batched retrieval.", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "rag_llm_time_to_first_token_seconds", "Streaming LLM latency until the first token.", buckets=_SECONDS_BUCKETS
+)
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total", "Requests shed by admission control, by stage and reason.", ["stage", "reason"]
+)
+
+
+@contextmanager
+def span(stage: str, timings: Optional[Dict[str, float]] = None):
+    """
+    Times a pipeline stage into rag_stage_seconds and counts its exceptions.
+    If `timings` is given, the elapsed seconds are also added to timings[stage].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        logger.debug("%s took %.2f ms", stage, elapsed * 1000.0)
+
+
+class CacheStatsCollector:
+    """
+    Exports the hit/miss/eviction counters the caches already keep, read at
+    scrape time so lookups pay nothing extra. `get_stats` returns the stats()
+    dicts of the caches to export.
+    """
+
+    def __init__(self, get_stats: Callable[[], List[Dict[str, Any]]]):
+        self.get_stats = get_stats
+
+    def collect(self):
+        hits = CounterMetricFamily("rag_cache_hits", "Cache hits.", labels=["cache"])
+        misses = CounterMetricFamily("rag_cache_misses", "Cache misses.", labels=["cache"])
+        evictions = CounterMetricFamily("rag_cache_evictions", "Entries evicted to stay within capacity.", labels=["cache"])
+        size = GaugeMetricFamily("rag_cache_entries", "Entries currently cached.", labels=["cache"])
+        for stats in self.get_stats():
+            hits.add_metric([stats["name"]], stats["hits"])
+            misses.add_metric([stats["name"]], stats["misses"])
+            if "evictions" in stats:
+                evictions.add_metric([stats["name"]], stats["evictions"])
+            size.add_metric([stats["name"]], stats["size"])
+        yield from (hits, misses, evictions, size)
+
+
+class LLMStatsCollector:
+    """Exports the shared LLM client's upstream call, retry and coalescing counters."""
+
+    def __init__(self, get_stats: Callable[[], Optional[Dict[str, Any]]]):
+        self.get_stats = get_stats
+
+    def collect(self):
+        stats = self.get_stats()
+        if stats is None:
+            return
+        backend = [stats["backend"]]
+        for key, help_text in (
+            ("upstream_calls", "Calls made to the LLM backend, retries included."),
+            ("retries", "LLM calls retried after a transient error."),
+            ("coalesced", "Requests that shared an identical in-flight LLM call."),
+        ):
+            metric = CounterMetricFamily(f"rag_llm_{key}", help_text, labels=["backend"])
+            metric.add_metric(backend, stats[key])
+            yield metric
+        in_flight = GaugeMetricFamily("rag_llm_in_flight", "Distinct LLM generations in flight.", labels=["backend"])
+        in_flight.add_metric(backend, stats["in_flight"])
+        yield in_flight
+
+
+def render_metrics():
+    """Body and content type of the Prometheus text exposition."""
+    return generate_latest(), CONTENT_TYPE_LATEST
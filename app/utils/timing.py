@@ -0,0 +1,40 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """Records how long named phases take (e.g. module imports and startup steps)."""
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - start
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = {name: round(seconds, 4) for name, seconds in self.phases.items()}
+        return {"phases": phases, "since_start_seconds": round(time.perf_counter() - self.created, 4)}
+
+    def print_report(self, title: str = "Startup timing"):
+        report = self.report()
+        lines = [f"{title} ({report['since_start_seconds']:.2f}s since process start):"]
+        lines += [f"  {name:<40} {seconds:8.3f}s" for name, seconds in report["phases"].items()]
+        logger.info("\n".join(lines))
+
+
+# Shared timer for import-time and startup phases
+startup_timer = PhaseTimer()
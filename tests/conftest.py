@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Settings read at import time by app.core.config: serve answers from the local
+# fake LLM and skip the startup warmup, so the tests never touch the network
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY_MS", "0")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services import admission
+from app.services.admission import ClientRateLimiter, RateLimitedError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    # Patched before the limiter is created, so its bucket cache expires on the same clock
+    monkeypatch.setattr(admission.time, "monotonic", fake)
+    return fake
+
+
+def test_burst_then_limited(clock):
+    limiter = ClientRateLimiter(rate=1.0, burst=3, max_clients=10)
+    for _ in range(3):
+        limiter.acquire("a")
+    with pytest.raises(RateLimitedError) as excinfo:
+        limiter.acquire("a")
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+    limiter.acquire("b")  # other clients have their own bucket
+    assert limiter.limited == 1
+
+
+def test_refill(clock):
+    limiter = ClientRateLimiter(rate=2.0, burst=2, max_clients=10)
+    limiter.acquire("a", 2)
+    clock.now += 0.5
+    limiter.acquire("a")
+    with pytest.raises(RateLimitedError):
+        limiter.acquire("a")
+
+
+def test_large_batch_leaves_bucket_in_debt(clock):
+    limiter = ClientRateLimiter(rate=1.0, burst=5, max_clients=10)
+    limiter.acquire("a", 20)  # admitted on a full bucket
+    clock.now += 10
+    with pytest.raises(RateLimitedError) as excinfo:
+        limiter.acquire("a")  # still 5 tokens short
+    assert excinfo.value.retry_after == pytest.approx(6.0)
+    clock.now += 6
+    limiter.acquire("a")
+
+
+def test_zero_rate_disables_limit(clock):
+    limiter = ClientRateLimiter(rate=0, burst=1, max_clients=10)
+    for _ in range(100):
+        limiter.acquire("a")
+    assert limiter.stats()["limited"] == 0
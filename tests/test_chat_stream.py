@@ -0,0 +1,69 @@
+import hashlib
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import embedding
+from app.services.fake_llm import FAKE_ANSWER_TOKENS
+from app.services.retriever import corpus
+
+
+class HashEmbeddingModel:
+    """Deterministic stand-in for the SentenceTransformer: a vector derived from each text's hash."""
+
+    dimension = 16
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        rows = [
+            np.frombuffer(hashlib.sha256(text.encode("utf-8")).digest()[:self.dimension], dtype=np.uint8)
+            for text in texts
+        ]
+        return np.asarray(rows, dtype="float32").reshape(len(texts), self.dimension)
+
+
+def _events(body: str):
+    events = []
+    for message in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding, "embedding_model", HashEmbeddingModel())
+    text_path = tmp_path / "story.txt"
+    text_path.write_text("--- Page 1 ---\nঅনুপমের বয়স সাতাশ।\n--- Page 2 ---\nকল্যাণীর বাবা শম্ভুনাথ সেন।\n", encoding="utf-8")
+    corpus.add_document("story", str(text_path), index_path=str(tmp_path / "index" / "story"), chunk_size=200, chunk_overlap=0)
+    # No context manager: the startup event would try to load the default corpus
+    yield TestClient(app)
+    corpus.remove_document("story")
+
+
+def test_chat_stream_with_fake_llm(client):
+    response = client.post("/chat/stream", json={"question": "অনুপমের বয়স কত?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "context"
+    assert kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"}
+
+    context = events[0][1]
+    assert context["retrieved_context"]
+    assert all(source["document"] == "story" for source in context["sources"])
+    assert "".join(data["text"] for kind, data in events if kind == "token") == "".join(FAKE_ANSWER_TOKENS)
+    assert events[-1][1] == {"cached": False}
+
+
+def test_chat_stream_unknown_document(client):
+    response = client.post("/chat/stream", json={"question": "কে?", "documents": ["missing"]})
+    assert response.status_code == 404
@@ -0,0 +1,27 @@
+from app.services.context_packer import estimate_tokens, merge_overlapping_chunks, pack_context
+
+
+def test_pack_context_stays_within_budget():
+    chunks = [f"chunk {i} " + "শব্দ " * (20 + 7 * i) for i in range(10)]
+    for budget in (10, 50, 120, 400):
+        packed = pack_context(chunks, token_budget=budget)
+        assert packed
+        assert sum(estimate_tokens(span) for span in packed) <= budget
+
+
+def test_pack_context_keeps_relevance_order():
+    chunks = ["first " * 10, "second " * 10, "third " * 10]
+    assert pack_context(chunks, token_budget=1000) == chunks
+
+
+def test_pack_context_truncates_oversized_first_span():
+    packed = pack_context(["x" * 4000, "short"], token_budget=100)
+    assert len(packed) == 1
+    assert estimate_tokens(packed[0]) <= 100
+
+
+def test_merge_overlapping_chunks():
+    left = "The quick brown fox jumps over the lazy dog"
+    right = "over the lazy dog and runs away"
+    assert merge_overlapping_chunks([left, right], min_overlap=5) == ["The quick brown fox jumps over the lazy dog and runs away"]
+    assert merge_overlapping_chunks([left, "brown fox"], min_overlap=5) == [left]
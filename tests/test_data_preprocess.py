@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from app.utils.data_preprocess import chunk_text, clean_text, iter_chunks, sentence_chunk_text
+
+
+def _sample_text(lines: int = 400, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = ["অনুপম", "কল্যাণী", "মামা", "বিবাহ", "the", "story", "is", "told", "by", "Anupam"]
+    out = []
+    for i in range(lines):
+        if i % 50 == 0:
+            out.append(f"--- Page {i // 50 + 1} ---")
+        out.append(" ".join(rng.choice(words) for _ in range(rng.randint(0, 30))) + rng.choice(["।", ".", "", "?"]))
+    return "\n".join(out)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap,window_chunks", [(200, 40, 2), (500, 100, 4), (1000, 200, 16)])
+def test_iter_chunks_matches_chunk_text(chunk_size, chunk_overlap, window_chunks):
+    text = _sample_text()
+    streamed = list(iter_chunks(text.split("\n"), chunk_size, chunk_overlap, window_chunks=window_chunks))
+    assert streamed == chunk_text(text, chunk_size, chunk_overlap)
+
+
+def test_iter_chunks_empty_input():
+    assert list(iter_chunks([])) == chunk_text("")
+
+
+def test_sentence_chunks_track_pages():
+    text = clean_text("--- Page 3 ---\nপ্রথম বাক্য। দ্বিতীয় বাক্য।\n--- Page 4 ---\nThird sentence. Fourth one.")
+    chunks = sentence_chunk_text(text, chunk_size=200, chunk_overlap=0)
+    assert [(chunk.page, chunk.page_end) for chunk in chunks] == [(3, 3), (4, 4)]
+    assert chunks[0].text == "প্রথম বাক্য। দ্বিতীয় বাক্য।"
+
+
+def test_sentence_chunks_stay_within_chunk_size():
+    chunks = sentence_chunk_text(_sample_text(), chunk_size=300, chunk_overlap=60)
+    assert chunks
+    assert all(len(chunk.text) <= 300 for chunk in chunks)
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.scripts.vector_store import IndexConfig, IndexManifestError, InMemoryVectorStore
+
+
+def _store(count: int = 20, dimension: int = 8) -> InMemoryVectorStore:
+    rng = np.random.default_rng(0)
+    store = InMemoryVectorStore(IndexConfig(index_type="flat", metric="l2"))
+    chunks = [f"chunk {i}" for i in range(count)]
+    pages = [(i // 5 + 1, i // 5 + 1) for i in range(count)]
+    store.add_documents(chunks, rng.standard_normal((count, dimension)).astype("float32"), pages=pages)
+    store.build_index()
+    return store
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "index")
+    saved = _store()
+    saved.save_index(path, manifest={"model_name": "model-a", "chunk_size": 1000})
+
+    loaded = InMemoryVectorStore(IndexConfig(index_type="flat", metric="l2"))
+    loaded.load_index(path, expected_manifest={"model_name": "model-a", "chunk_size": 1000})
+    assert loaded.is_built
+    assert list(loaded.documents) == list(saved.documents)
+    assert loaded.page_range(7) == (2, 2)
+    query = np.asarray(saved.chunk_embeddings[3])
+    assert loaded.search(query.tolist(), k=1)[0][0] == "chunk 3"
+
+
+@pytest.mark.parametrize("expected", [{"model_name": "model-b"}, {"chunk_size": 500}])
+def test_load_index_rejects_mismatched_manifest(tmp_path, expected):
+    path = str(tmp_path / "index")
+    _store().save_index(path, manifest={"model_name": "model-a", "chunk_size": 1000})
+
+    store = InMemoryVectorStore(IndexConfig(index_type="flat", metric="l2"))
+    with pytest.raises(IndexManifestError):
+        store.load_index(path, expected_manifest=expected)
+    assert not store.is_built
+    assert store.documents == []
+
+
+def test_load_index_rejects_other_index_config(tmp_path):
+    path = str(tmp_path / "index")
+    _store().save_index(path)
+    with pytest.raises(IndexManifestError):
+        InMemoryVectorStore(IndexConfig(index_type="flat", metric="ip")).load_index(path)
+
+
+def test_load_index_rejects_older_format(tmp_path):
+    path = str(tmp_path / "index")
+    store = _store()
+    store.save_index(path)
+    manifest_path = store.artifact_paths(path)["manifest"]
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["format_version"] -= 1
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(IndexManifestError, match="format_version"):
+        InMemoryVectorStore(IndexConfig(index_type="flat", metric="l2")).load_index(path)
+
+
+def test_update_documents_keeps_page_ranges():
+    store = _store(count=4)
+    removed = [int(store.ids[1])]
+    store.update_documents(removed, ["new chunk"], np.ones((1, 8), dtype="float32"), pages=[(9, 10)])
+    assert "chunk 1" not in list(store.documents)
+    position = list(store.documents).index("new chunk")
+    assert store.page_range(position) == (9, 10)
+    assert store.page_range(list(store.documents).index("chunk 2")) == (1, 1)